@@ -26,6 +26,7 @@ python manage.py collectstatic --noinput --settings=djangoproj.production_settin
 # Run migrations
 echo "🗄️ Running database migrations..."
 python manage.py migrate --settings=djangoproj.production_settings
+python manage.py createcachetable --settings=djangoproj.production_settings
 
 # Populate database with sample data
 echo "🚗 Populating database with sample data..."
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the djangoapp read-path serialization.
+
+Compares building model instances and copying attributes into dicts (the
+previous view code) with the values_list() projections in
+djangoapp/serializers.py, on a throwaway test database.
+
+Usage (from the server directory):
+    python benchmarks/bench_serialization.py [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoproj.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from djangoapp import serializers  # noqa: E402
+from djangoapp.models import Dealer, Review  # noqa: E402
+
+
+def instance_reviews(dealer_id):
+    """The pre-projection implementation of get_dealer_reviews."""
+    dealer = Dealer.objects.get(id=dealer_id)
+    reviews_list = []
+    for review in Review.objects.filter(dealer=dealer):
+        reviews_list.append({
+            "id": review.id,
+            "name": review.name,
+            "review": review.review,
+            "purchase": review.purchase,
+            "purchase_date": review.purchase_date.isoformat()
+            if review.purchase_date else None,
+            "car_make": review.car_make,
+            "car_model": review.car_model,
+            "car_year": review.car_year,
+            "sentiment": review.sentiment
+        })
+    return reviews_list
+
+
+def projected_reviews(dealer_id):
+    rows = serializers.REVIEW.apply(
+        Review.objects.filter(dealer_id=dealer_id)).order_by('id')
+    return serializers.REVIEW.to_dicts(rows)
+
+
+def instance_dealers():
+    return [{
+        "id": dealer.id,
+        "full_name": dealer.full_name,
+        "city": dealer.city,
+        "state": dealer.state,
+        "address": dealer.address,
+        "zip": dealer.zip,
+        "short_name": dealer.short_name or dealer.full_name
+    } for dealer in Dealer.objects.all()]
+
+
+def projected_dealers():
+    return serializers.DEALER.to_dicts(
+        serializers.DEALER.apply(Dealer.objects.all()))
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(label, old, new, rows):
+    old_us = old / rows * 1e6
+    new_us = new / rows * 1e6
+    print(f"{label:<10} instances: {old_us:7.2f} us/row   "
+          f"values_list: {new_us:7.2f} us/row   "
+          f"speedup: {old / new:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        dealer = Dealer.objects.create(
+            full_name="Benchmark Dealership", city="Austin", state="Texas",
+            address="1 Main St", zip="73301"
+        )
+        Dealer.objects.bulk_create([
+            Dealer(full_name=f"Dealer {i}", city="Austin", state="Texas",
+                   address=f"{i} Main St", zip="73301",
+                   short_name=f"D{i}" if i % 2 else None)
+            for i in range(args.rows)
+        ], batch_size=1000)
+        Review.objects.bulk_create([
+            Review(dealer=dealer, name=f"Reviewer {i}",
+                   review="Great cars and friendly staff " * 3,
+                   purchase=True, purchase_date="2020-07-11",
+                   car_make="Audi", car_model="A6", car_year=2010,
+                   sentiment="positive")
+            for i in range(args.rows)
+        ], batch_size=1000)
+
+        assert instance_reviews(dealer.id) == [
+            dict(row, purchase_date=row["purchase_date"].isoformat())
+            for row in projected_reviews(dealer.id)
+        ]
+
+        print(f"{args.rows} rows, best of {args.repeat}")
+        report("reviews",
+               best_of(lambda: instance_reviews(dealer.id), args.repeat),
+               best_of(lambda: projected_reviews(dealer.id), args.repeat),
+               args.rows)
+        report("dealers",
+               best_of(instance_dealers, args.repeat),
+               best_of(projected_dealers, args.repeat),
+               args.rows + 1)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
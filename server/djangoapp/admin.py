@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import CarMake, CarModel, Dealer, Review
+from . import search
+from .models import (CarMake, CarModel, Dealer, DealerStats, Review,
+                     SentimentJob)
 
 
 # Register your models here.
@@ -40,9 +42,36 @@ class ReviewAdmin(admin.ModelAdmin):
     search_fields = ['name', 'review', 'dealer__full_name']
     readonly_fields = ['sentiment']  # Make sentiment read-only
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains over every review;
+        # dealer names are matched on the (small) dealer table
+        if not search_term.strip():
+            return queryset, False
+        dealers = Dealer.objects.filter(full_name__icontains=search_term)
+        matches = search.filter_reviews(queryset, search_term)
+        return (matches | queryset.filter(dealer__in=dealers)), False
+
+
+# SentimentJobAdmin class
+class SentimentJobAdmin(admin.ModelAdmin):
+    list_display = ['review', 'status', 'attempts', 'run_after',
+                    'created_at']
+    list_filter = ['status']
+    readonly_fields = ['review', 'locked_by', 'locked_until', 'last_error']
+
+
+# DealerStatsAdmin class; the counters are maintained automatically
+class DealerStatsAdmin(admin.ModelAdmin):
+    list_display = ['dealer', 'review_count', 'positive_count',
+                    'neutral_count', 'negative_count', 'pending_count',
+                    'purchase_count', 'latest_review_at']
+    readonly_fields = list_display
+
 
 # Register models here
 admin.site.register(CarMake, CarMakeAdmin)
 admin.site.register(CarModel, CarModelAdmin)
 admin.site.register(Dealer, DealerAdmin)
 admin.site.register(Review, ReviewAdmin)
+admin.site.register(SentimentJob, SentimentJobAdmin)
+admin.site.register(DealerStats, DealerStatsAdmin)
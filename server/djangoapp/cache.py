@@ -0,0 +1,129 @@
+"""Response caching helpers for the djangoapp JSON endpoints.
+
+Cached entries are keyed by a per-table *generation* number. Writes bump the
+generation (see ``signals.py``), which makes every previously cached key
+unreachable without having to enumerate and delete them.
+
+The counters live in their own cache (the 'generations' alias in settings),
+which must be shared by every worker process: a write handled by one
+worker has to reach the cached responses, ETags and in-memory indexes of
+all the others. Cached values themselves may stay per-process, since
+their keys carry the shared generation.
+"""
+import threading
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+# How long a rebuild may hold the cross-process lock, and how often waiters
+# poll the cache for the rebuilt value while another process holds it.
+BUILD_LOCK_TIMEOUT = 10
+BUILD_POLL_INTERVAL = 0.05
+
+# Striped in-process locks so concurrent misses for the same key in one
+# worker wait for a single rebuild instead of all running the builder.
+_LOCK_STRIPES = [threading.Lock() for _ in range(64)]
+
+
+def get_cache():
+    return caches[getattr(settings, 'DJANGOAPP_CACHE_ALIAS', 'default')]
+
+
+def get_generation_cache():
+    return caches[getattr(settings, 'DJANGOAPP_GENERATION_CACHE_ALIAS',
+                          'default')]
+
+
+def generations_are_shared():
+    """False if the generation counters are private to this process."""
+    return not isinstance(get_generation_cache(), LocMemCache)
+
+
+def _generation_key(name):
+    return f"djangoapp:generation:{name}"
+
+
+def get_generation(name):
+    cache = get_generation_cache()
+    key = _generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        # Seed from the clock rather than 0 so an evicted counter can never
+        # come back with a value that was already used for older entries.
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key, 0)
+    return generation
+
+
+def _modified_key(name):
+    return f"djangoapp:modified:{name}"
+
+
+def get_last_modified(name):
+    """Unix time of the last ``bump_generation(name)`` (or first read)."""
+    cache = get_generation_cache()
+    key = _modified_key(name)
+    modified = cache.get(key)
+    if modified is None:
+        # Unknown (never bumped or evicted): treat the data as changed now
+        cache.add(key, int(time.time()), None)
+        modified = cache.get(key, int(time.time()))
+    return modified
+
+
+def bump_generation(name):
+    cache = get_generation_cache()
+    key = _generation_key(name)
+    cache.set(_modified_key(name), int(time.time()), None)
+    # A fresh value rather than incr(): not every shared backend (e.g. the
+    # file cache) increments atomically across processes, and two racing
+    # bumps that both landed on "old + 1" could hide the second write.
+    generation = max(time.time_ns(), (cache.get(key) or 0) + 1)
+    cache.set(key, generation, None)
+    return generation
+
+
+def versioned_key(name, *parts):
+    """Build a cache key for ``name`` scoped to its current generation."""
+    suffix = ":".join(quote(str(part), safe='') for part in parts)
+    return f"djangoapp:{name}:{get_generation(name)}:{suffix}"
+
+
+def get_or_build(key, builder, timeout=None):
+    """Return the cached value for ``key``, building it at most once.
+
+    On a miss only one caller rebuilds the value: threads in this process
+    serialize on a striped lock, and other processes are held off by an
+    ``add``-based lock in the shared cache and wait for the stored result.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _LOCK_STRIPES[hash(key) % len(_LOCK_STRIPES)]:
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, 1, BUILD_LOCK_TIMEOUT):
+            try:
+                value = builder()
+                cache.set(key, value, timeout)
+            finally:
+                cache.delete(lock_key)
+            return value
+
+        # Another process is rebuilding this key; wait for its result.
+        deadline = time.monotonic() + BUILD_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(BUILD_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return builder()
@@ -0,0 +1,185 @@
+"""Faceted search over the car catalog.
+
+The catalog is small and changes rarely, so it is held as an in-memory
+columnar snapshot: one list per attribute, rows in id order, plus a bitmap
+(a Python int, bit *i* = row *i*) per facet value. A query ANDs together
+the bitmaps of its filters, and each facet count is one AND plus a
+popcount, instead of a GROUP BY round trip per dimension.
+
+Facet counts follow the usual convention: a dimension's counts apply every
+filter except its own, so the other values of a dimension that is being
+filtered on are still offered with the number of cars they would give.
+
+The snapshot is tagged with the 'cars' cache generation (bumped by
+``signals.py`` and the bulk loaders, in the generation cache shared by all
+worker processes) and rebuilt lazily after a change in any of them.
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+from .cache import get_generation
+from .models import CarModel
+
+# Dimensions filtered on exact (case-insensitive) values and counted per
+# value; also the names of their query parameters
+FACETS = ('car_make', 'type', 'year', 'fuel_type', 'transmission')
+
+COLUMNS = {
+    'id': 'id',
+    'name': 'name',
+    'car_make': 'car_make__name',
+    'type': 'type',
+    'year': 'year',
+    'fuel_type': 'fuel_type',
+    'transmission': 'transmission',
+    'price': 'price',
+    'dealer_id': 'dealer_id',
+}
+
+
+def _value_key(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+def _rows(bitmap):
+    """Row numbers of the set bits of ``bitmap``, ascending."""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+class Snapshot:
+    def __init__(self, rows):
+        self.size = len(rows)
+        self.columns = {name: [row[i] for row in rows]
+                        for i, name in enumerate(COLUMNS)}
+        self.all = (1 << self.size) - 1
+        # facet -> normalized value -> bitmap, and the label shown for it
+        self.bitmaps = {}
+        self.labels = {}
+        for facet in FACETS:
+            bitmaps = defaultdict(int)
+            labels = {}
+            for row, value in enumerate(self.columns[facet]):
+                if value is None:
+                    continue
+                key = _value_key(value)
+                bitmaps[key] |= 1 << row
+                labels.setdefault(key, value)
+            self.bitmaps[facet] = dict(bitmaps)
+            self.labels[facet] = labels
+        # Rows with a price, sorted by it, for price ranges
+        priced = sorted((price, row) for row, price
+                        in enumerate(self.columns['price'])
+                        if price is not None)
+        self.prices = [float(price) for price, _ in priced]
+        self.price_rows = [row for _, row in priced]
+
+    def _any_of(self, facet, values):
+        bitmaps = self.bitmaps[facet]
+        bitmap = 0
+        for value in values:
+            bitmap |= bitmaps.get(_value_key(value), 0)
+        return bitmap
+
+    def _year_range(self, low, high):
+        bitmap = 0
+        for year, rows in self.bitmaps['year'].items():
+            if (low is None or year >= low) and (high is None
+                                                 or year <= high):
+                bitmap |= rows
+        return bitmap
+
+    def _price_range(self, low, high):
+        start = 0 if low is None else bisect.bisect_left(self.prices, low)
+        stop = (len(self.prices) if high is None
+                else bisect.bisect_right(self.prices, high))
+        bitmap = 0
+        for row in self.price_rows[start:stop]:
+            bitmap |= 1 << row
+        return bitmap
+
+    def search(self, filters):
+        """Return ``(bitmap of matches, facet counts)`` for ``filters``.
+
+        ``filters`` may hold a list of values per facet, plus
+        ``year_min``/``year_max`` and ``price_min``/``price_max``.
+        """
+        masks = {facet: self._any_of(facet, filters[facet])
+                 for facet in FACETS if filters.get(facet)}
+        year_min, year_max = filters.get('year_min'), filters.get('year_max')
+        if year_min is not None or year_max is not None:
+            masks['year'] = masks.get('year', self.all) & self._year_range(
+                year_min, year_max)
+        price_min = filters.get('price_min')
+        price_max = filters.get('price_max')
+        if price_min is not None or price_max is not None:
+            masks['price'] = self._price_range(price_min, price_max)
+
+        matches = self.all
+        for mask in masks.values():
+            matches &= mask
+        facets = {}
+        for facet in FACETS:
+            others = self.all
+            for name, mask in masks.items():
+                if name != facet:
+                    others &= mask
+            counts = {self.labels[facet][key]: (others & bitmap).bit_count()
+                      for key, bitmap in self.bitmaps[facet].items()}
+            facets[facet] = {label: count for label, count
+                             in sorted(counts.items(), key=_facet_order)
+                             if count}
+        return matches, facets
+
+    def price_bounds(self, bitmap):
+        """Cheapest and dearest price among the rows of ``bitmap``."""
+        positions = range(len(self.price_rows))
+        bounds = []
+        for order in (positions, reversed(positions)):
+            bounds.append(next((self.prices[i] for i in order
+                                if bitmap >> self.price_rows[i] & 1), None))
+        return {"min": bounds[0], "max": bounds[1]}
+
+    def cars(self, bitmap, after_id=None, limit=None):
+        """Dicts of the matching cars in id order, after ``after_id``."""
+        ids = self.columns['id']
+        start = 0 if after_id is None else bisect.bisect_right(ids, after_id)
+        bitmap >>= start
+        cars = []
+        for offset in _rows(bitmap):
+            if limit is not None and len(cars) == limit:
+                break
+            row = start + offset
+            car = {name: column[row] for name, column
+                   in self.columns.items()}
+            if car['price'] is not None:
+                car['price'] = float(car['price'])
+            cars.append(car)
+        return cars
+
+
+def _facet_order(item):
+    label, count = item
+    return (-count, str(label))
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    """The catalog snapshot for the current 'cars' generation."""
+    global _snapshot
+    generation = get_generation('cars')
+    snapshot = _snapshot
+    if snapshot is not None and snapshot[0] == generation:
+        return snapshot[1]
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot[0] != generation:
+            rows = list(CarModel.objects.order_by('id')
+                        .values_list(*COLUMNS.values()))
+            _snapshot = (generation, Snapshot(rows))
+        return _snapshot[1]
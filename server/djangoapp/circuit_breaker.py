@@ -0,0 +1,163 @@
+"""Circuit breakers for the backend microservices.
+
+A breaker watches the outcome of calls to one backend over a sliding time
+window. When enough calls were made and too many of them failed it
+*opens*: calls fail at once with ``CircuitOpenError`` instead of waiting
+for a connect or read timeout. After ``reset_timeout`` seconds it lets a
+few trial calls through (*half-open*); a success closes it again, a
+failure re-opens it.
+
+``CircuitOpenError`` is a ``requests`` ``ConnectionError``, so callers that
+already fall back when a service is unreachable fail fast to the same
+fallback. State is per process and shared by all of its threads.
+"""
+import threading
+import time
+from collections import deque
+
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a backend whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, window=30, minimum_calls=10,
+                 reset_timeout=15, half_open_calls=1, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.window = window
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._state = CLOSED
+        self._opened_at = None
+        self._trials = 0
+        # (time, failed) for each call in the window, oldest first
+        self._outcomes = deque()
+        self._failures = 0
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] <= now - self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._trials = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(self.clock())
+
+    def _current_state(self, now):
+        if (self._state == OPEN
+                and now - self._opened_at >= self.reset_timeout):
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    def allow(self):
+        """Return True if a call may go through now."""
+        with self._lock:
+            state = self._current_state(self.clock())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            now = self.clock()
+            if self._current_state(now) == HALF_OPEN:
+                self._reset()
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = self.clock()
+            if self._current_state(now) == HALF_OPEN:
+                self._open(now)
+                return
+            self._outcomes.append((now, True))
+            self._failures += 1
+            self._trim(now)
+            calls = len(self._outcomes)
+            if (calls >= self.minimum_calls
+                    and self._failures / calls >= self.failure_rate):
+                self._open(now)
+
+    def call(self, func, *args, is_failure=None, **kwargs):
+        """Call ``func`` through the breaker.
+
+        Exceptions count as failures; so do results for which
+        ``is_failure(result)`` is true (e.g. 5xx responses).
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            now = self.clock()
+            state = self._current_state(now)
+            self._trim(now)
+            calls = len(self._outcomes)
+            retry_in = None
+            if state == OPEN:
+                retry_in = round(
+                    self.reset_timeout - (now - self._opened_at), 1)
+            return {
+                "state": state,
+                "calls": calls,
+                "failures": self._failures,
+                "failure_rate": (round(self._failures / calls, 3)
+                                 if calls else 0.0),
+                "retry_in_seconds": retry_in,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **options):
+    """Return the process-wide breaker called ``name``, creating it once."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **options)
+        return _breakers[name]
+
+
+def all_breakers():
+    with _breakers_lock:
+        return dict(_breakers)
@@ -0,0 +1,66 @@
+"""Conditional GET (ETag / Last-Modified) for the read endpoints.
+
+Validators come from the per-table generation counters in ``cache.py``,
+which every write to those tables bumps, so checking ``If-None-Match`` or
+``If-Modified-Since`` costs a few cache reads and no database queries: a
+304 is returned before the view, its queries and its serialization run.
+
+The counters must live in a cache shared by all workers (see CACHES in
+settings.py). If they are in a per-process LocMemCache, a worker would keep
+answering 304 after another worker's write, so validation is turned off.
+"""
+from functools import wraps
+
+from django.utils.cache import (add_never_cache_headers,
+                                get_conditional_response, patch_cache_control)
+from django.utils.http import http_date, quote_etag
+
+from .cache import (generations_are_shared, get_generation,
+                    get_last_modified)
+
+# Bump when the JSON shape of the endpoints changes, to retire old ETags
+ETAG_VERSION = 1
+
+
+def data_etag(tables):
+    generations = ".".join(str(get_generation(table)) for table in tables)
+    return quote_etag(f"v{ETAG_VERSION}-{generations}")
+
+
+def uncacheable(response):
+    """Mark a response that is not derived from the versioned tables.
+
+    Used for remote-service fallbacks and errors; such responses get no
+    validators and must not be reused by the client.
+    """
+    add_never_cache_headers(response)
+    return response
+
+
+def conditional_on(*tables):
+    """Serve 304s for GETs whose data in ``tables`` has not changed."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or not generations_are_shared()):
+                return view(request, *args, **kwargs)
+            etag = data_etag(tables)
+            last_modified = max(get_last_modified(table) for table in tables)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            cache_control = response.get('Cache-Control', '')
+            if (response.status_code == 200
+                    and 'no-store' not in cache_control):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault(
+                    'Last-Modified', http_date(last_modified))
+                # Let clients keep the body but revalidate before reuse
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,161 @@
+"""Per-dealer review aggregates (``DealerStats``).
+
+Counters are adjusted in place with ``F()`` updates as reviews are created,
+changed and deleted (see ``signals.py``) and when sentiment workers label
+pending reviews, so reading a dealer's aggregates is one primary-key lookup
+instead of a scan of its reviews. Bulk writes that bypass signals rebuild
+the affected dealers with ``rebuild``, and ``manage.py
+rebuild_dealer_stats`` recomputes everything if counters ever drift.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Dealer, DealerStats, Review
+
+# Review.sentiment -> DealerStats counter
+SENTIMENT_FIELDS = {
+    'positive': 'positive_count',
+    'neutral': 'neutral_count',
+    'negative': 'negative_count',
+    'pending': 'pending_count',
+}
+
+
+def review_state(review):
+    """The fields of ``review`` that the aggregates depend on."""
+    return {'dealer_id': review.dealer_id, 'sentiment': review.sentiment,
+            'purchase': review.purchase, 'created_at': review.created_at}
+
+
+def _deltas(state, sign):
+    deltas = Counter(review_count=sign)
+    field = SENTIMENT_FIELDS.get(state['sentiment'])
+    if field:
+        deltas[field] += sign
+    if state['purchase']:
+        deltas['purchase_count'] += sign
+    return deltas
+
+
+def _apply(dealer_id, deltas, latest=None):
+    """Add ``deltas`` to a dealer's counters; False if it has no row."""
+    changes = {field: F(field) + delta
+               for field, delta in deltas.items() if delta}
+    if latest is not None:
+        changes['latest_review_at'] = Greatest(
+            Coalesce(F('latest_review_at'), Value(latest)), Value(latest))
+    if not changes:
+        return True
+    return bool(DealerStats.objects.filter(dealer_id=dealer_id)
+                .update(**changes))
+
+
+def review_saved(review, previous=None):
+    """Count a created review, or move it from its ``previous`` state."""
+    current = review_state(review)
+    dealer_id = current['dealer_id']
+    deltas = _deltas(current, 1)
+    moved = previous is not None and previous['dealer_id'] != dealer_id
+    if previous is not None and not moved:
+        deltas.subtract(_deltas(previous, 1))
+    latest = None
+    if previous is None or moved or (
+            current['created_at'] != previous['created_at']):
+        latest = current['created_at']
+    if not _apply(dealer_id, deltas, latest):
+        # First review of the dealer (or its row was lost): count them all
+        rebuild([dealer_id])
+    if moved:
+        review_deleted(previous)
+    elif latest is not None and previous is not None:
+        # created_at may have moved back in time
+        _refresh_latest(dealer_id)
+
+
+def review_deleted(state):
+    """Uncount a deleted review given its ``review_state``."""
+    # A missing row is left missing: the dealer itself may be being deleted
+    if _apply(state['dealer_id'], _deltas(state, -1)):
+        _refresh_latest(state['dealer_id'])
+
+
+def sentiments_changed(changes):
+    """Move reviews between sentiment counters.
+
+    ``changes`` is an iterable of ``(dealer_id, old, new)`` sentiments for
+    reviews updated in bulk (which sends no signals).
+    """
+    by_dealer = {}
+    for dealer_id, old, new in changes:
+        deltas = by_dealer.setdefault(dealer_id, Counter())
+        if old in SENTIMENT_FIELDS:
+            deltas[SENTIMENT_FIELDS[old]] -= 1
+        if new in SENTIMENT_FIELDS:
+            deltas[SENTIMENT_FIELDS[new]] += 1
+    missing = [dealer_id for dealer_id, deltas in by_dealer.items()
+               if not _apply(dealer_id, deltas)]
+    if missing:
+        rebuild(missing)
+
+
+def _refresh_latest(dealer_id):
+    latest = Review.objects.filter(dealer_id=dealer_id).aggregate(
+        latest=Max('created_at'))['latest']
+    DealerStats.objects.filter(dealer_id=dealer_id).update(
+        latest_review_at=latest)
+
+
+def rebuild(dealer_ids=None):
+    """Recompute the stats of ``dealer_ids`` (all dealers by default).
+
+    Returns the number of dealers written.
+    """
+    dealers = Dealer.objects.all()
+    if dealer_ids is not None:
+        dealers = dealers.filter(id__in=list(dealer_ids))
+    counts = {field: Count('review', filter=Q(review__sentiment=sentiment))
+              for sentiment, field in SENTIMENT_FIELDS.items()}
+    rows = dealers.order_by().values('id').annotate(
+        review_count=Count('review'),
+        purchase_count=Count('review', filter=Q(review__purchase=True)),
+        latest_review_at=Max('review__created_at'),
+        **counts,
+    )
+    stats = [DealerStats(dealer_id=row.pop('id'), **row) for row in rows]
+    fields = ['review_count', 'purchase_count', 'latest_review_at',
+              *SENTIMENT_FIELDS.values()]
+    try:
+        with transaction.atomic():
+            DealerStats.objects.bulk_create(
+                stats, update_conflicts=True, unique_fields=['dealer'],
+                update_fields=fields)
+    except IntegrityError:
+        # The dealer was deleted concurrently; nothing left to count
+        pass
+    return len(stats)
+
+
+def get_stats(dealer_id):
+    """The aggregates of one dealer as a JSON-ready dict, or None."""
+    row = DealerStats.objects.filter(dealer_id=dealer_id).values().first()
+    if row is None:
+        if not Dealer.objects.filter(id=dealer_id).exists():
+            return None
+        rebuild([dealer_id])
+        row = DealerStats.objects.filter(dealer_id=dealer_id).values().first()
+    return to_dict(row)
+
+
+def to_dict(row):
+    count = row['review_count']
+    return {
+        "review_count": count,
+        "sentiments": {sentiment: row[field]
+                       for sentiment, field in SENTIMENT_FIELDS.items()},
+        "purchase_ratio": (round(row['purchase_count'] / count, 3)
+                           if count else None),
+        "latest_review_at": row['latest_review_at'],
+    }
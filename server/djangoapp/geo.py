@@ -0,0 +1,149 @@
+"""Dealer coordinates and nearest-dealer queries.
+
+Coordinates come from an offline zip-code centroid table
+(``settings.ZIP_CENTROIDS_FILE``, a ``zip,lat,long`` CSV). Zips missing
+from it fall back to the mean centroid of the known zips that share their
+first three digits (the USPS sectional center), which is usually within a
+few dozen miles.
+
+``nearest`` answers k-nearest / radius queries from an in-memory KD-tree
+over the dealers' positions on the unit sphere, so straight-line (chord)
+distance orders points the same way as great-circle distance. The tree is
+rebuilt lazily after any Dealer change: it is tagged with the 'dealers'
+cache generation, which ``signals.py`` and the bulk loaders bump in the
+generation cache shared by all worker processes.
+"""
+import csv
+import functools
+import heapq
+import math
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+from .cache import get_generation
+from .models import Dealer
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+@functools.lru_cache(maxsize=None)
+def zip_centroids():
+    """``(by_zip, by_prefix)`` dicts of ``(lat, long)`` from the CSV."""
+    by_zip = {}
+    with open(settings.ZIP_CENTROIDS_FILE, newline='') as source:
+        for row in csv.DictReader(source):
+            by_zip[row['zip']] = (float(row['lat']), float(row['long']))
+    sums = defaultdict(lambda: [0.0, 0.0, 0])
+    for code, (lat, long) in by_zip.items():
+        total = sums[code[:3]]
+        total[0] += lat
+        total[1] += long
+        total[2] += 1
+    by_prefix = {prefix: (lat / count, long / count)
+                 for prefix, (lat, long, count) in sums.items()}
+    return by_zip, by_prefix
+
+
+def locate_zip(code):
+    """``(lat, long)`` of a zip code, or None if it cannot be placed."""
+    code = str(code or '').strip()[:5]
+    if len(code) != 5 or not code.isdigit():
+        return None
+    by_zip, by_prefix = zip_centroids()
+    return by_zip.get(code) or by_prefix.get(code[:3])
+
+
+def _unit_vector(lat, long):
+    lat, long = math.radians(lat), math.radians(long)
+    return (math.cos(lat) * math.cos(long), math.cos(lat) * math.sin(long),
+            math.sin(lat))
+
+
+def _chord(miles):
+    angle = min(miles / EARTH_RADIUS_MILES, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+def _miles(chord):
+    return 2 * math.asin(min(chord / 2, 1.0)) * EARTH_RADIUS_MILES
+
+
+class KDTree:
+    """A static 3-d tree of ``(point, item)`` pairs."""
+
+    def __init__(self, entries):
+        self.size = len(entries)
+        self.root = self._build(list(entries), 0)
+
+    def _build(self, entries, depth):
+        if not entries:
+            return None
+        axis = depth % 3
+        entries.sort(key=lambda entry: entry[0][axis])
+        middle = len(entries) // 2
+        return (entries[middle], axis,
+                self._build(entries[:middle], depth + 1),
+                self._build(entries[middle + 1:], depth + 1))
+
+    def nearest(self, point, k, max_distance=math.inf):
+        """Up to ``k`` ``(distance, item)`` pairs, closest first."""
+        # Max-heap of the best k so far, as (-squared distance, order, item)
+        best = []
+        limit = max_distance ** 2
+        order = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            (position, item), axis, left, right = node
+            squared = sum((a - b) ** 2 for a, b in zip(position, point))
+            if squared <= limit:
+                order += 1
+                if len(best) < k:
+                    heapq.heappush(best, (-squared, order, item))
+                elif squared < -best[0][0]:
+                    heapq.heapreplace(best, (-squared, order, item))
+                if len(best) == k:
+                    limit = min(limit, -best[0][0])
+            offset = point[axis] - position[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            # Visit the far side only if the splitting plane is in range;
+            # pushed first so the near side is searched first
+            if offset ** 2 <= limit:
+                stack.append(far)
+            stack.append(near)
+        return [(math.sqrt(-squared), item)
+                for squared, _, item in sorted(best, reverse=True)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def dealer_index():
+    """The KD-tree of dealer ids for the current 'dealers' generation."""
+    global _index
+    generation = get_generation('dealers')
+    index = _index
+    if index is not None and index[0] == generation:
+        return index[1]
+    with _index_lock:
+        if _index is None or _index[0] != generation:
+            rows = Dealer.objects.filter(
+                lat__isnull=False, long__isnull=False
+            ).values_list('id', 'lat', 'long')
+            tree = KDTree([(_unit_vector(lat, long), dealer_id)
+                           for dealer_id, lat, long in rows])
+            _index = (generation, tree)
+        return _index[1]
+
+
+def nearest(lat, long, k, radius=None):
+    """``(dealer_id, miles)`` of the ``k`` dealers closest to a point."""
+    max_distance = math.inf if radius is None else _chord(radius)
+    matches = dealer_index().nearest(_unit_vector(lat, long), k,
+                                     max_distance)
+    return [(dealer_id, _miles(chord)) for chord, dealer_id in matches]
@@ -0,0 +1,72 @@
+"""Shared HTTP clients for the backend microservices.
+
+Each ``ServiceClient`` owns one ``requests.Session`` whose connection pool
+keeps TCP (and TLS) connections alive between calls, so the dealer and
+sentiment services are not re-dialled on every request. Idempotent calls
+are retried a bounded number of times with jittered exponential backoff.
+An optional circuit breaker makes calls to a failing service fail fast.
+"""
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Methods that are safe to repeat after a dropped connection or a 5xx
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RETRY_STATUSES = (502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """urllib3 ``Retry`` with "full jitter" backoff.
+
+    Sleeps a random time between 0 and the exponential backoff, so workers
+    that failed together do not retry in lock step.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+def is_server_error(response):
+    return response.status_code >= 500
+
+
+class ServiceClient:
+    def __init__(self, base_url, connect_timeout=3.05, read_timeout=5,
+                 retries=2, backoff_factor=0.2, pool_size=10, breaker=None):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker
+        retry = JitteredRetry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url(self, path):
+        return self.base_url + path
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        send = getattr(self.session, method)
+        if self.breaker is None:
+            return send(self.url(path), **kwargs)
+        # Connection errors, timeouts and 5xx responses count as failures
+        return self.breaker.call(send, self.url(path),
+                                 is_failure=is_server_error, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('get', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('post', path, **kwargs)
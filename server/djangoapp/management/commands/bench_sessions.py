@@ -0,0 +1,89 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+STOCK_MIDDLEWARE = 'django.contrib.sessions.middleware.SessionMiddleware'
+THROTTLED_MIDDLEWARE = 'djangoapp.sessions.ThrottledSessionMiddleware'
+
+
+def _middleware(session_middleware):
+    return [session_middleware if 'Session' in name else name
+            for name in settings.MIDDLEWARE]
+
+
+CONFIGS = [
+    ("db, save every request", {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': True,
+        'MIDDLEWARE': _middleware(STOCK_MIDDLEWARE),
+    }),
+    ("db, throttled", {
+        'SESSION_ENGINE': 'djangoapp.sessions.db',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+        'MIDDLEWARE': _middleware(THROTTLED_MIDDLEWARE),
+    }),
+    ("cached_db, throttled", {
+        'SESSION_ENGINE': 'djangoapp.sessions.cached_db',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+        'MIDDLEWARE': _middleware(THROTTLED_MIDDLEWARE),
+    }),
+]
+
+
+class SessionQueryCounter:
+    def __init__(self):
+        self.reads = self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql:
+            if sql.lstrip().upper().startswith('SELECT'):
+                self.reads += 1
+            else:
+                self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ("Compare django_session reads and writes per 1k logged-in API "
+            "requests with and without session write throttling (runs "
+            "against a throwaway test database)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--path', default='/djangoapp/get_dealers/')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            User.objects.create_user(username='bench', password='bench')
+            self.stdout.write(f"{'configuration':<24} {'writes/1k':>10} "
+                              f"{'reads/1k':>9} {'req/s':>8}")
+            for name, overrides in CONFIGS:
+                with override_settings(**overrides):
+                    self.run_config(name, options['requests'],
+                                    options['path'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_config(self, name, requests, path):
+        client = Client()
+        client.login(username='bench', password='bench')
+        counter = SessionQueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(path)
+            elapsed = time.perf_counter() - start
+        per_1k = 1000 / requests
+        self.stdout.write(f"{name:<24} {counter.writes * per_1k:>10.0f} "
+                          f"{counter.reads * per_1k:>9.0f} "
+                          f"{requests / elapsed:>8.0f}")
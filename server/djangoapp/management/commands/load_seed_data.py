@@ -0,0 +1,51 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from djangoapp import seed
+
+DATASETS = ['dealers', 'reviews', 'cars']
+
+
+class Command(BaseCommand):
+    help = ("Bulk load dealerships.json, reviews.json and car_records.json "
+            "into the database (safe to rerun)")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir', type=Path,
+            default=Path(settings.BASE_DIR) / 'database' / 'data',
+            help="directory holding the seed JSON files")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="rows per bulk INSERT")
+        parser.add_argument('--only', choices=DATASETS, action='append',
+                            help="load just this dataset (repeatable)")
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir']
+        batch_size = options['batch_size']
+        datasets = options['only'] or DATASETS
+        with transaction.atomic():
+            if 'dealers' in datasets:
+                self.timed('dealers', seed.load_dealers,
+                           data_dir / 'dealerships.json', batch_size)
+            if 'reviews' in datasets:
+                self.timed('reviews', seed.load_reviews,
+                           data_dir / 'reviews.json', batch_size)
+            if 'cars' in datasets:
+                self.timed('cars', seed.load_cars,
+                           data_dir / 'car_records.json', batch_size)
+
+    def timed(self, name, loader, path, batch_size):
+        start = time.perf_counter()
+        result = loader(path, batch_size)
+        elapsed = time.perf_counter() - start
+        rows, skipped = result if isinstance(result, tuple) else (result, 0)
+        message = (f"{name}: {rows} rows in {elapsed:.2f}s "
+                   f"({rows / elapsed if elapsed else 0:,.0f} rows/s)")
+        if skipped:
+            message += f", {skipped} skipped (unknown dealer)"
+        self.stdout.write(message)
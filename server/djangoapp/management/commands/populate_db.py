@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from djangoapp.populate import seed_catalog
+
+
+class Command(BaseCommand):
+    help = ("Seed the car catalog if it is empty (idempotent and safe to "
+            "run from several instances at once)")
+
+    def handle(self, *args, **options):
+        if seed_catalog():
+            self.stdout.write("Seeded the car catalog")
+        else:
+            self.stdout.write("Car catalog already present; nothing to do")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from djangoapp.dealer_stats import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Recompute every dealer's review aggregates (DealerStats) from "
+            "the reviews, e.g. after raw SQL writes")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dealer_ids', nargs='*', type=int,
+                            help="only rebuild these dealers")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild(options['dealer_ids'] or None)
+        self.stdout.write(f"Rebuilt stats for {count} dealers")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from djangoapp import sentiment_jobs
+
+
+class Command(BaseCommand):
+    help = ("Show the backlog of reviews awaiting sentiment analysis, "
+            "process it, or requeue dead jobs")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drain', action='store_true',
+                            help="process every due job, then exit")
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help="retry jobs that ran out of attempts")
+        parser.add_argument('--batch-size', type=int,
+                            help="jobs per sentiment batch call")
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = sentiment_jobs.requeue_dead()
+            self.stdout.write(f"Requeued {count} dead job(s)")
+        if options['drain']:
+            count = sentiment_jobs.drain(options['batch_size'])
+            self.stdout.write(f"Processed {count} job(s)")
+        for name, value in sentiment_jobs.backlog().items():
+            self.stdout.write(f"{name}: {value}")
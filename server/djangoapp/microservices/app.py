@@ -1,18 +1,50 @@
-from flask import Flask
-from nltk.sentiment import SentimentIntensityAnalyzer
+from flask import Flask, jsonify, request
 import json
+import logging
 import os
-import nltk
+import threading
+
+from scoring import classify, get_analyzer, get_batch_scorer
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger("sentiment")
 
 app = Flask("Sentiment Analyzer")
 
-# Download required NLTK data
-try:
-    nltk.data.find('vader_lexicon')
-except Exception:
-    nltk.download('vader_lexicon')
+# Load the VADER lexicon and batch scorer at startup (downloads the lexicon
+# if missing). Under gunicorn's preload_app this runs once, before forking.
+get_analyzer()
+get_batch_scorer()
+
+# Largest number of texts accepted by one /analyze/batch call
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+# Requests a worker process handles at once (0 = no limit; gunicorn.conf.py
+# defaults it to the worker's thread count). Extra requests wait up to
+# MAX_QUEUE_WAIT seconds for a slot, then get a 503.
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 0))
+MAX_QUEUE_WAIT = float(os.environ.get('MAX_QUEUE_WAIT', 1))
+_slots = (threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+          if MAX_CONCURRENT_REQUESTS > 0 else None)
+
 
-sia = SentimentIntensityAnalyzer()
+@app.before_request
+def acquire_slot():
+    if _slots is None:
+        return None
+    if not _slots.acquire(timeout=MAX_QUEUE_WAIT):
+        logger.warning("Rejecting request: %d requests already in flight",
+                       MAX_CONCURRENT_REQUESTS)
+        return jsonify({"error": "Server busy, retry later"}), 503, {
+            "Retry-After": "1"}
+    request.environ['sentiment.slot'] = True
+    return None
+
+
+@app.teardown_request
+def release_slot(exc):
+    if request.environ.pop('sentiment.slot', False):
+        _slots.release()
 
 
 @app.get('/')
@@ -23,23 +55,26 @@ def home():
 
 @app.get('/analyze/<input_txt>')
 def analyze_sentiment(input_txt):
-
-    scores = sia.polarity_scores(input_txt)
-    print(scores)
-    pos = float(scores['pos'])
-    neg = float(scores['neg'])
-    neu = float(scores['neu'])
-    res = "positive"
-    print("pos neg nue ", pos, neg, neu)
-    if (neg > pos and neg > neu):
-        res = "negative"
-    elif (neu > neg and neu > pos):
-        res = "neutral"
-    res = json.dumps({"sentiment": res})
-    print(res)
+    res = json.dumps({"sentiment": classify(input_txt)})
+    logger.debug(res)
     return res
 
 
+@app.post('/analyze/batch')
+def analyze_batch():
+    # Accept either a JSON list of strings or {"texts": [...]}
+    texts = request.get_json(silent=True)
+    if isinstance(texts, dict):
+        texts = texts.get('texts')
+    if not isinstance(texts, list):
+        return jsonify({"error": "Expected a JSON list of strings"}), 400
+    if len(texts) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} texts per "
+                                 "batch"}), 413
+    labels = get_batch_scorer().classify(texts)
+    return jsonify([{"sentiment": label} for label in labels])
+
+
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
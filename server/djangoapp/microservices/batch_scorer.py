@@ -0,0 +1,291 @@
+"""Vectorized VADER scoring for /analyze/batch.
+
+``BatchScorer.classify`` labels a whole list of texts with the same
+pos/neg/neu rule as ``scoring.classify``. Texts are tokenized exactly like
+VADER's ``SentiText``; lexicon valences are then looked up through a
+precomputed vocabulary index, and the ALL-CAPS, booster/dampener,
+negation, "never so/this", "least" and "but" rules and the pos/neg/neu
+proportions are computed with NumPy over the whole batch.
+
+Texts containing a multi-word idiom or booster ("kind of", "sort of",
+"cut the mustard", ...) or that are very long, and batches too small to
+amortize the NumPy overhead, go through
+``SentimentIntensityAnalyzer.polarity_scores`` instead, so every label is
+identical to the per-text path.
+"""
+import string
+from itertools import chain
+
+import numpy as np
+
+from scoring import has_text, label_from_scores
+
+PUNCTUATION = string.punctuation
+PUNCTUATION_TABLE = str.maketrans('', '', PUNCTUATION)
+
+# Longer texts are scored per-text to bound the padded batch matrix
+MAX_VECTOR_TOKENS = 256
+# Below this many texts NumPy's fixed overhead outweighs the per-text loop
+MIN_VECTOR_BATCH = 4
+
+# Python's round() is correctly rounded while np.round is not; values this
+# close to a rounding midpoint are re-rounded with round() to match VADER.
+ROUNDING_GUARD = 1e-6
+
+
+class BatchScorer:
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        constants = analyzer.constants
+        self.c_incr = constants.C_INCR
+        self.n_scalar = constants.N_SCALAR
+        self.punc_list = frozenset(constants.PUNC_LIST)
+        self.negate = frozenset(constants.NEGATE)
+
+        # Vocabulary index: word -> row of the valence array
+        words = list(analyzer.lexicon)
+        self.vocab = {word: index for index, word in enumerate(words)}
+        self.valences = np.array([analyzer.lexicon[word] for word in words],
+                                 dtype=np.float64)
+
+        self.booster = {word: value for word, value
+                        in constants.BOOSTER_DICT.items() if ' ' not in word}
+        # Multi-word idioms and boosters ("kind of", "sort of", ...) are not
+        # modelled; texts containing one are scored per-text.
+        self.special_phrases = tuple(
+            phrase for phrase in chain(constants.SPECIAL_CASE_IDIOMS,
+                                       constants.BOOSTER_DICT)
+            if ' ' in phrase
+        )
+
+    def tokenize(self, text):
+        """Split ``text`` like ``SentiText.words_and_emoticons``.
+
+        A token loses its leading (or trailing) punctuation only when the
+        rest is one of the punctuation-free words of the text and the
+        stripped run is in VADER's punctuation list.
+        """
+        words_only = {word for word in text.translate(PUNCTUATION_TABLE)
+                      .split() if len(word) > 1}
+        tokens = []
+        for token in text.split():
+            if len(token) <= 1:
+                continue
+            if token not in words_only:
+                rest = token.lstrip(PUNCTUATION)
+                if (rest != token and rest in words_only
+                        and token[:len(token) - len(rest)] in self.punc_list):
+                    token = rest
+                else:
+                    rest = token.rstrip(PUNCTUATION)
+                    if (rest != token and rest in words_only
+                            and token[len(rest):] in self.punc_list):
+                        token = rest
+            tokens.append(token)
+        return tokens
+
+    def punctuation_amplifier(self, text):
+        ep_count = min(text.count("!"), 4)
+        qm_count = text.count("?")
+        qm_amplifier = 0
+        if qm_count > 1:
+            qm_amplifier = qm_count * 0.18 if qm_count <= 3 else 0.96
+        return ep_count * 0.292 + qm_amplifier
+
+    def classify(self, texts):
+        # Missing, non-string and blank texts are neutral (see has_text)
+        labels = ["neutral"] * len(texts)
+        rows = [index for index, text in enumerate(texts) if has_text(text)]
+        for index, label in zip(rows, self._classify(
+                [texts[index] for index in rows])):
+            labels[index] = label
+        return labels
+
+    def _classify(self, texts):
+        if len(texts) < MIN_VECTOR_BATCH:
+            return [label_from_scores(self.analyzer.polarity_scores(text))
+                    for text in texts]
+        labels = [None] * len(texts)
+        vector_rows = []
+        vector_tokens = []
+        for index, text in enumerate(texts):
+            tokens = self.tokenize(text)
+            joined = ' '.join(tokens).lower()
+            if (len(tokens) > MAX_VECTOR_TOKENS
+                    or any(phrase in joined
+                           for phrase in self.special_phrases)):
+                labels[index] = label_from_scores(
+                    self.analyzer.polarity_scores(text))
+            else:
+                vector_rows.append(index)
+                vector_tokens.append(tokens)
+
+        if vector_rows:
+            vector_labels = self._classify_tokens(
+                [texts[index] for index in vector_rows], vector_tokens)
+            for index, label in zip(vector_rows, vector_labels):
+                labels[index] = label
+        return labels
+
+    def _token_features(self, tokens):
+        """Per-token lookups, computed once per distinct token string."""
+        negate = self.negate
+        booster = self.booster
+        vocab_get = self.vocab.get
+        lowered = [token.lower() for token in tokens]
+        return {
+            "lex_id": np.array([vocab_get(word, -1) for word in lowered],
+                               dtype=np.int64),
+            "booster": np.array([booster.get(word, 0.0) for word in lowered],
+                                dtype=np.float64),
+            "is_booster": np.array([word in booster for word in lowered],
+                                   dtype=bool),
+            "is_upper": np.array([token.isupper() for token in tokens],
+                                 dtype=bool),
+            "negated": np.array([word in negate or "n't" in word
+                                 for word in lowered], dtype=bool),
+            "so_this": np.array([token in ("so", "this") for token in tokens],
+                                dtype=bool),
+            "never": np.array([token == "never" for token in tokens],
+                              dtype=bool),
+            "least": np.array([word == "least" for word in lowered],
+                              dtype=bool),
+            "at_very": np.array([word in ("at", "very") for word in lowered],
+                                dtype=bool),
+            "but": np.array([word == "but" for word in lowered], dtype=bool),
+        }
+
+    def _classify_tokens(self, texts, token_lists):
+        n_texts = len(texts)
+        lengths = np.fromiter((len(tokens) for tokens in token_lists),
+                              dtype=np.int64, count=n_texts)
+        width = max(int(lengths.max()), 1)
+        flat = list(chain.from_iterable(token_lists))
+        n_flat = len(flat)
+        starts = np.zeros(n_texts, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        row = np.repeat(np.arange(n_texts), lengths)
+        position = np.arange(n_flat) - starts[row]
+
+        # Intern the tokens and look each distinct one up only once
+        interned = {}
+        token_id = np.fromiter(
+            (interned.setdefault(token, len(interned)) for token in flat),
+            dtype=np.int64, count=n_flat)
+        features = {name: values[token_id] for name, values
+                    in self._token_features(list(interned)).items()}
+        lex_id = features["lex_id"]
+        is_booster = features["is_booster"]
+        is_upper = features["is_upper"]
+        in_lex = lex_id >= 0
+        # Boosters score 0 themselves and only modify the word after them
+        scored = in_lex & ~is_booster
+
+        # VADER evaluates the context of a repeated token at its first
+        # occurrence in the text, so gather context from there.
+        keys = row * max(len(interned), 1) + token_id
+        _, first_flat, inverse = np.unique(keys, return_index=True,
+                                           return_inverse=True)
+        context = first_flat[inverse.reshape(-1)]
+        context_position = position[context]
+
+        def before(distance):
+            return np.where(context_position >= distance,
+                            context - distance, 0)
+
+        # Some, but not all, tokens of the text are in ALL CAPS
+        upper_count = np.bincount(row, weights=is_upper, minlength=n_texts)
+        cap_diff = (upper_count > 0) & (upper_count < lengths)
+
+        valence = np.where(scored, self.valences[lex_id], 0.0)
+        caps = scored & is_upper & cap_diff[row]
+        valence = np.where(caps & (valence > 0), valence + self.c_incr,
+                           np.where(caps, valence - self.c_incr, valence))
+
+        # Up to three words before: booster/dampener scalars (damped with
+        # distance), then "never so/this", "so/this" and negation.
+        so_this = features["so_this"]
+        never = features["never"]
+        negated = features["negated"]
+        for distance, damping in ((1, None), (2, 0.95), (3, 0.9)):
+            word = before(distance)
+            applies = (scored & (context_position >= distance)
+                       & ~in_lex[word])
+            boosted = applies & is_booster[word]
+            scalar = np.where(valence < 0, -features["booster"][word],
+                              features["booster"][word])
+            caps = boosted & is_upper[word] & cap_diff[row]
+            scalar = np.where(caps & (valence > 0), scalar + self.c_incr,
+                              np.where(caps, scalar - self.c_incr, scalar))
+            if damping is not None:
+                scalar = np.where(scalar != 0, scalar * damping, scalar)
+            valence = np.where(boosted, valence + scalar, valence)
+
+            if distance == 1:
+                special = np.zeros(n_flat, dtype=bool)
+            elif distance == 2:
+                special = applies & never[word] & so_this[before(1)]
+                valence = np.where(special, valence * 1.5, valence)
+            else:
+                special = applies & (
+                    (never[word] & so_this[before(2)]) | so_this[before(1)])
+                valence = np.where(special, valence * 1.25, valence)
+            negation = applies & ~special & negated[word]
+            valence = np.where(negation, valence * self.n_scalar, valence)
+
+        # "least" before a word negates it, unless it is "at/very least"
+        previous = before(1)
+        least = scored & (context_position >= 1) & features["least"][previous]
+        least &= (context_position == 1) | ~features["at_very"][before(2)]
+        valence = np.where(least, valence * self.n_scalar, valence)
+
+        # Words before the first "but" count half, words after it 1.5x
+        is_but = features["but"]
+        but_position = np.full(n_texts, width, dtype=np.int64)
+        np.minimum.at(but_position, row[is_but], position[is_but])
+        has_but = (but_position < width)[row]
+        but_at = but_position[row]
+        valence = np.where(has_but & (position < but_at), valence * 0.5,
+                           np.where(has_but & (position > but_at),
+                                    valence * 1.5, valence))
+
+        # Pad to a (texts x tokens) matrix; cumsum adds left to right like
+        # VADER's loop, so the float sums are bit-identical.
+        matrix = np.zeros((n_texts, width), dtype=np.float64)
+        matrix[row, position] = valence
+        filled = np.zeros((n_texts, width), dtype=bool)
+        filled[row, position] = True
+        pos_sum = np.cumsum(np.where(matrix > 0, matrix + 1, 0.0),
+                            axis=1)[:, -1]
+        neg_sum = np.cumsum(np.where(matrix < 0, matrix - 1, 0.0),
+                            axis=1)[:, -1]
+        neu_count = np.count_nonzero(filled & (matrix == 0), axis=1)
+
+        amplifier = np.fromiter(
+            (self.punctuation_amplifier(text) for text in texts),
+            dtype=np.float64, count=n_texts)
+        abs_neg = np.abs(neg_sum)
+        more_pos = pos_sum > abs_neg
+        more_neg = pos_sum < abs_neg
+        pos_sum = np.where(more_pos, pos_sum + amplifier, pos_sum)
+        neg_sum = np.where(more_neg, neg_sum - amplifier, neg_sum)
+
+        total = pos_sum + np.abs(neg_sum) + neu_count
+        safe_total = np.where(total == 0, 1.0, total)
+        pos = self._round3(np.abs(pos_sum / safe_total))
+        neg = self._round3(np.abs(neg_sum / safe_total))
+        neu = self._round3(np.abs(neu_count / safe_total))
+
+        labels = np.full(n_texts, "positive", dtype=object)
+        labels[(neu > neg) & (neu > pos)] = "neutral"
+        labels[(neg > pos) & (neg > neu)] = "negative"
+        return labels.tolist()
+
+    @staticmethod
+    def _round3(values):
+        rounded = np.round(values, 3)
+        scaled = values * 1000
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) < ROUNDING_GUARD
+        for index in np.flatnonzero(near_half):
+            rounded[index] = round(float(values[index]), 3)
+        return rounded
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized batch scorer against per-text VADER.
+
+Scores synthetic review texts at several batch sizes with both
+scoring.classify (one polarity_scores call per text, as /analyze/<text>
+does) and BatchScorer.classify (as /analyze/batch does), checks that every
+label agrees, and reports throughput.
+
+Usage (from this directory):
+    python bench_batch_scorer.py [--sizes 1 100 10000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+
+from scoring import classify, get_analyzer, get_batch_scorer
+
+FILLER = (
+    "the car was a and I it this to we my service dealer staff price "
+    "financing test drive warranty sedan suv trade in paperwork not don't "
+    "no wasn't very but so really"
+).split()
+PUNCTUATION = ["", "", "", "", ",", ".", "!", "?", "!!"]
+
+
+def make_texts(count, seed=42):
+    rng = random.Random(seed)
+    lexicon = list(get_analyzer().lexicon)
+    texts = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(4, 30)):
+            word = rng.choice(lexicon if rng.random() < 0.25 else FILLER)
+            if rng.random() < 0.03:
+                word = word.upper()
+            words.append(word + rng.choice(PUNCTUATION))
+        texts.append(" ".join(words))
+    return texts
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1, 100, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    scorer = get_batch_scorer()
+    print(f"{'batch':>7} {'per-text/s':>12} {'batch/s':>12} {'speedup':>8}")
+    for size in args.sizes:
+        texts = make_texts(size)
+        per_text, expected = best_of(
+            lambda: [classify(text) for text in texts], args.repeat)
+        batched, labels = best_of(lambda: scorer.classify(texts),
+                                  args.repeat)
+        mismatches = sum(a != b for a, b in zip(expected, labels))
+        if mismatches:
+            raise SystemExit(f"{mismatches} labels differ at size {size}")
+        print(f"{size:>7} {size / per_text:>12,.0f} {size / batched:>12,.0f} "
+              f"{per_text / batched:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Compile the shipped VADER lexicon into sentiment/vader_lexicon.pickle.
+
+scoring.get_analyzer unpickles this artifact instead of locating and
+parsing sentiment/vader_lexicon.zip on every cold start. The artifact
+records the SHA-256 of the zip it was built from and is ignored if the zip
+changes, so rerun this script (the Docker and Render builds do) after
+updating the lexicon.
+
+Usage (from this directory):
+    python build_lexicon.py [--output PATH]
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import zipfile
+
+from scoring import (ARTIFACT_FORMAT, LEXICON_ARTIFACT, LEXICON_SOURCE,
+                     load_lexicon_artifact, source_digest)
+
+LEXICON_MEMBER = 'vader_lexicon/vader_lexicon.txt'
+
+
+def parse_lexicon(path=LEXICON_SOURCE):
+    """Parse the zip like ``SentimentIntensityAnalyzer.make_lex_dict``."""
+    with zipfile.ZipFile(path) as archive:
+        text = archive.read(LEXICON_MEMBER).decode('utf-8')
+    lexicon = {}
+    for line in text.split('\n'):
+        word, measure = line.strip().split('\t')[0:2]
+        lexicon[word] = float(measure)
+    return lexicon
+
+
+def build(output=LEXICON_ARTIFACT):
+    data = {
+        'format': ARTIFACT_FORMAT,
+        'source_sha256': source_digest(),
+        'lexicon': parse_lexicon(),
+    }
+    # Write atomically so a running service never reads a partial file
+    directory = os.path.dirname(output) or '.'
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as artifact:
+        pickle.dump(data, artifact, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, output)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--output', default=LEXICON_ARTIFACT)
+    args = parser.parse_args()
+
+    data = build(args.output)
+    if load_lexicon_artifact(args.output) != data['lexicon']:
+        raise SystemExit(f"{args.output} did not load back correctly")
+    print(f"Wrote {len(data['lexicon'])} words to {args.output} "
+          f"({os.path.getsize(args.output):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Gunicorn settings for the sentiment analyzer.
+
+Run from this directory with:
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (``preload_app``), which loads the
+VADER lexicon and the batch scorer before the workers are forked, so all
+workers share those pages copy-on-write instead of each building its own.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get(
+    'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Each worker serves this many requests at once in threads
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+# Admission control, so overload sheds requests instead of piling them up:
+# at most `backlog` connections wait to be accepted, a gthread worker keeps
+# at most worker_connections open, and app.py runs at most
+# MAX_CONCURRENT_REQUESTS requests per worker, answering 503 to any that
+# wait MAX_QUEUE_WAIT seconds for a slot.
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 64))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS',
+                                        threads * 4))
+os.environ.setdefault('MAX_CONCURRENT_REQUESTS', str(threads))
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+errorlog = '-'
+# Per-request access logs are off unless asked for
+accesslog = '-' if os.environ.get('ACCESS_LOG') else None
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Load-test GET /analyze/<text> under gunicorn at several worker counts.
+
+For each worker count a gunicorn server is started from gunicorn.conf.py on
+a free local port, hammered by --concurrency keep-alive client threads for
+--duration seconds, then stopped. Requests/sec and latency percentiles are
+printed per worker count. Pass --url to test an already running server
+instead.
+
+Usage (from this directory):
+    python loadtest.py [--workers 1 2 4] [--concurrency 16] [--duration 10]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TEXTS = [
+    "Fantastic services",
+    "The car was delivered late and the staff were rude",
+    "Great price, friendly salesperson and a smooth test drive",
+    "Not bad at all",
+    "Financing paperwork took forever but the sedan is lovely",
+    "Terrible experience, I would never buy here again",
+    "The SUV is fine",
+    "Absolutely love my new car!!",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"Server on port {port} did not start")
+
+
+def start_server(workers, threads):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS=str(threads), LOG_LEVEL="warning")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "app:app"],
+        cwd=SERVICE_DIR, env=env)
+    try:
+        wait_until_ready("127.0.0.1", port)
+    except BaseException:
+        process.terminate()
+        raise
+    return process, port
+
+
+def client(host, port, deadline, latencies, errors, offset):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    paths = ["/analyze/" + quote(text) for text in TEXTS]
+    count = offset
+    while time.monotonic() < deadline:
+        path = paths[count % len(paths)]
+        count += 1
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+        except (OSError, http.client.HTTPException) as err:
+            errors.append(type(err).__name__)
+            conn.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run_load(host, port, concurrency, duration):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=client,
+                         args=(host, port, deadline, latencies, errors, n))
+        for n in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    print(f"{label:>8} {len(ordered) / elapsed:>10,.0f} "
+          f"{percentile(ordered, 0.50) * 1000:>9.1f} "
+          f"{percentile(ordered, 0.99) * 1000:>9.1f} {len(errors):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=1,
+                        help="gunicorn threads per worker")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--url', help="test this running server instead")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7}")
+    if args.url:
+        parts = urlsplit(args.url)
+        report("-", *run_load(parts.hostname, parts.port or 80,
+                              args.concurrency, args.duration))
+        return
+
+    for workers in args.workers:
+        process, port = start_server(workers, args.threads)
+        try:
+            report(str(workers), *run_load("127.0.0.1", port,
+                                           args.concurrency, args.duration))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Measure the sentiment service's cold start.
+
+Each run starts a fresh interpreter and times (a) importing scoring and
+classifying one text and (b) importing app, which is what a new gunicorn
+master does. Both are measured with the prebuilt lexicon artifact and with
+the text-lexicon fallback. Medians are printed; with --budget the script
+exits non-zero when the artifact cold start is slower than the budget, so
+it can guard against regressions in CI.
+
+Usage (from this directory):
+    python measure_startup.py [--runs 5] [--budget 1.5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROBES = {
+    "first classify": (
+        "import time; start = time.perf_counter(); import scoring; "
+        "scoring.classify('Great service'); "
+        "print(time.perf_counter() - start)"),
+    "import app": (
+        "import time; start = time.perf_counter(); import app; "
+        "print(time.perf_counter() - start)"),
+}
+
+
+def measure(probe, runs, artifact):
+    env = dict(os.environ)
+    if not artifact:
+        # A path that does not exist forces the text-lexicon fallback
+        env["VADER_LEXICON_ARTIFACT"] = os.devnull + ".missing"
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", probe], cwd=SERVICE_DIR,
+                                env=env, check=True, capture_output=True,
+                                text=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float,
+                        help="fail if the artifact 'import app' median "
+                             "exceeds this many seconds")
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVICE_DIR)
+    from scoring import LEXICON_ARTIFACT, load_lexicon_artifact
+    if load_lexicon_artifact() is None:
+        raise SystemExit(f"No usable {LEXICON_ARTIFACT}; "
+                         "run build_lexicon.py first")
+
+    print(f"{'probe':<16} {'artifact s':>11} {'text lexicon s':>15}")
+    results = {}
+    for name, probe in PROBES.items():
+        results[name] = measure(probe, args.runs, artifact=True)
+        fallback = measure(probe, args.runs, artifact=False)
+        print(f"{name:<16} {results[name]:>11.3f} {fallback:>15.3f}")
+
+    if args.budget is not None and results["import app"] > args.budget:
+        raise SystemExit(f"Cold start {results['import app']:.3f}s exceeds "
+                         f"the {args.budget:.3f}s budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""VADER scoring shared by the Flask service and Django's in-process mode.
+
+``classify`` applies the service's pos/neg/neu decision rule to NLTK's
+``SentimentIntensityAnalyzer`` scores. The analyzer is built once per
+process, on first use, from the prebuilt lexicon artifact written by
+build_lexicon.py; without it the shipped text lexicon is parsed instead.
+"""
+import hashlib
+import os
+import pickle
+import threading
+
+# The VADER lexicon ships with the service as sentiment/vader_lexicon.zip,
+# laid out like an nltk_data directory.
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEXICON_SOURCE = os.path.join(SERVICE_DIR, 'sentiment', 'vader_lexicon.zip')
+LEXICON_ARTIFACT = os.environ.get(
+    'VADER_LEXICON_ARTIFACT',
+    os.path.join(SERVICE_DIR, 'sentiment', 'vader_lexicon.pickle'))
+ARTIFACT_FORMAT = 1
+
+_analyzer = None
+_batch_scorer = None
+_analyzer_lock = threading.Lock()
+
+
+def source_digest(path=LEXICON_SOURCE):
+    with open(path, 'rb') as source:
+        return hashlib.sha256(source.read()).hexdigest()
+
+
+def load_lexicon_artifact(path=LEXICON_ARTIFACT):
+    """Return the prebuilt ``{word: valence}`` dict, or None if unusable.
+
+    The artifact is ignored when missing, of another format, or built from
+    a different vader_lexicon.zip than the one shipped next to it.
+    """
+    try:
+        with open(path, 'rb') as artifact:
+            data = pickle.load(artifact)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if not isinstance(data, dict) or data.get('format') != ARTIFACT_FORMAT:
+        return None
+    if (os.path.exists(LEXICON_SOURCE)
+            and data.get('source_sha256') != source_digest()):
+        return None
+    return data['lexicon']
+
+
+def _analyzer_from_source():
+    import nltk
+    from nltk.sentiment import SentimentIntensityAnalyzer
+
+    if SERVICE_DIR not in nltk.data.path:
+        nltk.data.path.append(SERVICE_DIR)
+    try:
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        nltk.download('vader_lexicon')
+    return SentimentIntensityAnalyzer()
+
+
+def _analyzer_from_lexicon(lexicon):
+    from nltk.sentiment.vader import (SentimentIntensityAnalyzer,
+                                      VaderConstants)
+
+    class PrebuiltLexiconAnalyzer(SentimentIntensityAnalyzer):
+        """VADER over an already parsed ``{word: valence}`` lexicon.
+
+        The base ``__init__`` would load and parse the text lexicon; this
+        one sets up the same attributes from the prebuilt dict instead.
+        """
+
+        def __init__(self, lexicon):
+            self.lexicon_file = None
+            self.lexicon = lexicon
+            self.constants = VaderConstants()
+
+        def make_lex_dict(self):
+            return self.lexicon
+
+    return PrebuiltLexiconAnalyzer(lexicon)
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                lexicon = load_lexicon_artifact()
+                if lexicon is None:
+                    _analyzer = _analyzer_from_source()
+                else:
+                    _analyzer = _analyzer_from_lexicon(lexicon)
+    return _analyzer
+
+
+def get_batch_scorer():
+    global _batch_scorer
+    if _batch_scorer is None:
+        # numpy is only needed by the batch endpoint
+        from batch_scorer import BatchScorer
+        analyzer = get_analyzer()
+        with _analyzer_lock:
+            if _batch_scorer is None:
+                _batch_scorer = BatchScorer(analyzer)
+    return _batch_scorer
+
+
+def label_from_scores(scores):
+    pos = float(scores['pos'])
+    neg = float(scores['neg'])
+    neu = float(scores['neu'])
+    res = "positive"
+    if (neg > pos and neg > neu):
+        res = "negative"
+    elif (neu > neg and neu > pos):
+        res = "neutral"
+    return res
+
+
+def has_text(text):
+    """False for missing, non-string and blank texts.
+
+    VADER scores those all zeros, which the decision rule would read as
+    positive; they are labelled neutral without being scored.
+    """
+    return isinstance(text, str) and bool(text.strip())
+
+
+def classify(text):
+    if not has_text(text):
+        return "neutral"
+    return label_from_scores(get_analyzer().polarity_scores(text))
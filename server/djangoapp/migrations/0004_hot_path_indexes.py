@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoapp', '0003_rename_zip_code_dealer_zip_remove_dealer_lat_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carmodel',
+            index=models.Index(fields=['dealer_id'], name='carmodel_dealer_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealer',
+            index=models.Index(fields=['state', 'id'], name='dealer_state_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['dealer', 'id'], name='review_dealer_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['dealer', 'sentiment'], name='review_dealer_sentiment_idx'),
+        ),
+    ]
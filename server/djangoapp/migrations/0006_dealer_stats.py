@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models import Count, Max, Q
+
+
+def build_stats(apps, schema_editor):
+    Dealer = apps.get_model('djangoapp', 'Dealer')
+    DealerStats = apps.get_model('djangoapp', 'DealerStats')
+    rows = Dealer.objects.order_by().values('id').annotate(
+        review_count=Count('review'),
+        positive_count=Count('review', filter=Q(review__sentiment='positive')),
+        neutral_count=Count('review', filter=Q(review__sentiment='neutral')),
+        negative_count=Count('review', filter=Q(review__sentiment='negative')),
+        pending_count=Count('review', filter=Q(review__sentiment='pending')),
+        purchase_count=Count('review', filter=Q(review__purchase=True)),
+        latest_review_at=Max('review__created_at'),
+    )
+    DealerStats.objects.bulk_create(
+        [DealerStats(dealer_id=row.pop('id'), **row) for row in rows],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoapp', '0005_sentiment_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealerStats',
+            fields=[
+                ('dealer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='djangoapp.dealer')),
+                ('review_count', models.IntegerField(default=0)),
+                ('positive_count', models.IntegerField(default=0)),
+                ('neutral_count', models.IntegerField(default=0)),
+                ('negative_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('purchase_count', models.IntegerField(default=0)),
+                ('latest_review_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'dealer stats',
+            },
+        ),
+        # Added without a default so existing rows are not all stamped with
+        # the time this migration runs: reviews older than the column keep
+        # NULL, which latest_review_at ignores
+        migrations.AddField(
+            model_name='review',
+            name='created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='created_at',
+            field=models.DateTimeField(blank=True, null=True,
+                                       default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
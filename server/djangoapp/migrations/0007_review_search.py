@@ -0,0 +1,68 @@
+from django.db import migrations
+
+FTS_TABLE = 'djangoapp_review_fts'
+SEARCH_VECTOR = ("to_tsvector('english', "
+                 "coalesce(name, '') || ' ' || review)")
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, review, content='djangoapp_review', content_rowid='id',
+        tokenize='porter unicode61')""",
+    f"""CREATE TRIGGER djangoapp_review_fts_insert
+        AFTER INSERT ON djangoapp_review BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, review)
+        VALUES (new.id, new.name, new.review);
+    END""",
+    f"""CREATE TRIGGER djangoapp_review_fts_delete
+        AFTER DELETE ON djangoapp_review BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, review)
+        VALUES ('delete', old.id, old.name, old.review);
+    END""",
+    f"""CREATE TRIGGER djangoapp_review_fts_update
+        AFTER UPDATE OF id, name, review ON djangoapp_review BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, review)
+        VALUES ('delete', old.id, old.name, old.review);
+        INSERT INTO {FTS_TABLE}(rowid, name, review)
+        VALUES (new.id, new.name, new.review);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS djangoapp_review_fts_update",
+    "DROP TRIGGER IF EXISTS djangoapp_review_fts_delete",
+    "DROP TRIGGER IF EXISTS djangoapp_review_fts_insert",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+POSTGRESQL_FORWARD = [
+    f"CREATE INDEX review_search_idx ON djangoapp_review "
+    f"USING GIN ({SEARCH_VECTOR})",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS review_search_idx",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoapp', '0006_dealer_stats'),
+    ]
+
+    # The text index lives outside Django's model state; other database
+    # backends get no index and search falls back to LIKE.
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD,
+                 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD,
+                 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
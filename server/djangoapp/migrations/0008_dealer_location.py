@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:35
+
+import csv
+import gzip
+import os
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Frozen copy of database/data/zip_centroids.csv, vendored next to this
+# migration, and of geo.locate_zip's lookup, so the backfill does not change
+# when the app's table or code does.
+ZIP_CENTROIDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  '0008_zip_centroids.csv.gz')
+
+
+def zip_centroids():
+    by_zip = {}
+    with gzip.open(ZIP_CENTROIDS_FILE, 'rt', newline='') as source:
+        for row in csv.DictReader(source):
+            by_zip[row['zip']] = (float(row['lat']), float(row['long']))
+    sums = defaultdict(lambda: [0.0, 0.0, 0])
+    for code, (lat, long) in by_zip.items():
+        total = sums[code[:3]]
+        total[0] += lat
+        total[1] += long
+        total[2] += 1
+    by_prefix = {prefix: (lat / count, long / count)
+                 for prefix, (lat, long, count) in sums.items()}
+    return by_zip, by_prefix
+
+
+def locate_zip(code, by_zip, by_prefix):
+    code = str(code or '').strip()[:5]
+    if len(code) != 5 or not code.isdigit():
+        return None
+    return by_zip.get(code) or by_prefix.get(code[:3])
+
+
+def locate_dealers(apps, schema_editor):
+    Dealer = apps.get_model('djangoapp', 'Dealer')
+    by_zip, by_prefix = zip_centroids()
+    dealers = []
+    for dealer in Dealer.objects.filter(lat__isnull=True).only('id', 'zip'):
+        location = locate_zip(dealer.zip, by_zip, by_prefix)
+        if location:
+            dealer.lat, dealer.long = location
+            dealers.append(dealer)
+    Dealer.objects.bulk_update(dealers, ['lat', 'long'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoapp', '0007_review_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealer',
+            name='lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dealer',
+            name='long',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(locate_dealers, migrations.RunPython.noop),
+    ]
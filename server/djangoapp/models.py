@@ -1,6 +1,7 @@
 # Uncomment the following imports before adding the Model code
 
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 
@@ -14,7 +15,16 @@ class Dealer(models.Model):
     address = models.CharField(max_length=300)
     zip = models.CharField(max_length=10)
     short_name = models.CharField(max_length=100, blank=True, null=True)
-    
+    # Filled in from the zip-code centroid table when not given (geo.py)
+    lat = models.FloatField(blank=True, null=True)
+    long = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # get_dealerships filters on state and pages by id
+            models.Index(fields=['state', 'id'], name='dealer_state_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.full_name} - {self.city}, {self.state}"
 
@@ -30,11 +40,78 @@ class Review(models.Model):
     car_model = models.CharField(max_length=100, blank=True, null=True)
     car_year = models.IntegerField(blank=True, null=True)
     sentiment = models.CharField(max_length=20, default='neutral')
-    
+    # NULL for reviews written before creation times were recorded
+    created_at = models.DateTimeField(default=timezone.now, blank=True,
+                                      null=True)
+
+    class Meta:
+        indexes = [
+            # Reviews of a dealer, ordered/paged by id
+            models.Index(fields=['dealer', 'id'],
+                         name='review_dealer_id_idx'),
+            # Per-dealer sentiment breakdowns
+            models.Index(fields=['dealer', 'sentiment'],
+                         name='review_dealer_sentiment_idx'),
+        ]
+
     def __str__(self):
         return f"Review by {self.name} for {self.dealer.full_name}"
 
 
+# Review aggregates of a dealer, kept up to date by djangoapp/dealer_stats.py
+class DealerStats(models.Model):
+    dealer = models.OneToOneField(Dealer, on_delete=models.CASCADE,
+                                  primary_key=True, related_name='stats')
+    review_count = models.IntegerField(default=0)
+    positive_count = models.IntegerField(default=0)
+    neutral_count = models.IntegerField(default=0)
+    negative_count = models.IntegerField(default=0)
+    # Reviews still waiting for sentiment analysis
+    pending_count = models.IntegerField(default=0)
+    purchase_count = models.IntegerField(default=0)
+    latest_review_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = 'dealer stats'
+
+    def __str__(self):
+        return f"Stats for dealer {self.dealer_id}"
+
+
+# Queued sentiment analysis for a review saved with sentiment='pending'
+class SentimentJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DEAD = 'dead'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DEAD, 'Dead'),
+    ]
+    review = models.OneToOneField(Review, on_delete=models.CASCADE,
+                                  related_name='sentiment_job')
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.IntegerField(default=0)
+    # Not retried before this time (retry backoff)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Claim held by a worker; a lapsed lease makes the job claimable again
+    locked_by = models.CharField(max_length=32, blank=True, default='')
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim due jobs by status and run_after
+            models.Index(fields=['status', 'run_after'],
+                         name='sentimentjob_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Sentiment job for review {self.review_id} ({self.status})"
+
+
 # Car Make model
 class CarMake(models.Model):
     name = models.CharField(max_length=100)
@@ -83,5 +160,10 @@ class CarModel(models.Model):
         max_digits=10, decimal_places=2, blank=True, null=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['dealer_id'], name='carmodel_dealer_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.car_make.name} {self.name}"
@@ -0,0 +1,77 @@
+"""Keyset (cursor) pagination for the djangoapp list endpoints.
+
+Pages are ordered by primary key and a cursor only records the last id that
+was returned, so fetching page N is a ``WHERE id > cursor LIMIT n`` range
+scan that costs the same as the first page (no OFFSET).
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(last_id):
+    raw = json.dumps({"id": last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))['id']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidPageRequest("Invalid cursor")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise InvalidPageRequest("Invalid cursor")
+    return last_id
+
+
+def get_page_request(request):
+    """Read ``?limit=&cursor=`` from the request.
+
+    Returns ``None`` when neither parameter is given (the endpoint then
+    returns the full list as before), otherwise a ``(limit, after_id)``
+    tuple. Raises ``InvalidPageRequest`` on malformed values.
+    """
+    limit = request.GET.get('limit')
+    cursor = request.GET.get('cursor')
+    if limit is None and cursor is None:
+        return None
+
+    if limit is None:
+        limit = settings.API_PAGE_SIZE_DEFAULT
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise InvalidPageRequest("Invalid limit")
+        if limit < 1:
+            raise InvalidPageRequest("Invalid limit")
+        limit = min(limit, settings.API_PAGE_SIZE_MAX)
+
+    after_id = decode_cursor(cursor) if cursor else None
+    return limit, after_id
+
+
+def paginate(queryset, page):
+    """Fetch one page of ``queryset`` and the cursor for the next one.
+
+    ``page`` is the tuple returned by ``get_page_request``. ``queryset`` is a
+    ``values_list()`` projection whose first column is the id. One extra
+    row is fetched to find out whether another page exists; ``next`` is
+    ``None`` on the last page.
+    """
+    limit, after_id = page
+    queryset = queryset.order_by('id')
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][0])
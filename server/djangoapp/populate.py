@@ -1,5 +1,43 @@
+import threading
+import zlib
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .cache import bump_generation
 from .models import CarMake, CarModel
 
+# Serializes seeding between threads of one process; the database lock in
+# seed_catalog covers other processes.
+_seed_lock = threading.Lock()
+SEED_LOCK_ID = zlib.crc32(b'djangoapp.populate.seed_catalog')
+
+
+def _lock_catalog():
+    """Hold a database-wide seeding lock until the transaction ends."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEED_LOCK_ID])
+    else:
+        # A no-op UPDATE takes SQLite's write lock, which serializes
+        # writers, so a second seeder waits and then sees the rows.
+        CarMake.objects.filter(pk=-1).update(name=F('name'))
+
+
+def seed_catalog():
+    """Seed the car catalog unless it has rows; return True if it seeded.
+
+    Safe to run from several threads or processes at once.
+    """
+    with _seed_lock, transaction.atomic():
+        _lock_catalog()
+        if CarMake.objects.exists():
+            return False
+        initiate()
+        # bulk_create sends no post_save, so retire cached catalog ETags
+        bump_generation('cars')
+        return True
+
 
 def initiate():
     car_make_data = [
@@ -9,14 +47,14 @@ def initiate():
         {"name": "Kia", "description": "Great cars. Korean technology"},
         {"name": "Toyota", "description": "Great cars. Japanese technology"},
     ]
-    car_make_instances = []
-    for data in car_make_data:
-        car_make_instances.append(
-            CarMake.objects.create(
-                name=data['name'],
-                description=data['description']
-            )
-        )
+    CarMake.objects.bulk_create(
+        [CarMake(name=data['name'], description=data['description'])
+         for data in car_make_data]
+    )
+    # Re-read so the makes have primary keys on every database backend
+    makes = {make.name: make for make in CarMake.objects.filter(
+        name__in=[data['name'] for data in car_make_data])}
+    car_make_instances = [makes[data['name']] for data in car_make_data]
     # Create CarModel instances with the corresponding CarMake instances
     car_model_data = [
         {"name": "Pathfinder", "type": "SUV", "year": 2023,
@@ -51,11 +89,13 @@ def initiate():
          "dealer_id": 15, "car_make": car_make_instances[4]},
         # Add more CarModel instances as needed
     ]
-    for data in car_model_data:
-        CarModel.objects.create(
+    CarModel.objects.bulk_create([
+        CarModel(
             name=data['name'],
             car_make=data['car_make'],
             type=data['type'],
             year=data['year'],
             dealer_id=data['dealer_id']
         )
+        for data in car_model_data
+    ])
@@ -1,9 +1,21 @@
 # Uncomment the imports below before you add the function code
 import requests
+import copy
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode
 from dotenv import load_dotenv
 import json
 
+from django.conf import settings
+
+from .cache import get_cache
+from .circuit_breaker import get_breaker
+from .http_client import ServiceClient
+from .sentiment_cache import SentimentCache
+from .single_flight import SingleFlight
+
 load_dotenv()
 
 backend_url = os.getenv(
@@ -12,14 +24,76 @@ sentiment_analyzer_url = os.getenv(
     'sentiment_analyzer_url',
     default="http://localhost:5050/")
 
+# Circuit breaker settings shared by both backends: a breaker opens when at
+# least breaker_minimum_calls calls in the last breaker_window seconds
+# failed at breaker_failure_rate or more, and tries again after
+# breaker_reset_timeout seconds.
+breaker_options = {
+    'failure_rate': float(os.getenv('breaker_failure_rate', 0.5)),
+    'window': float(os.getenv('breaker_window', 30)),
+    'minimum_calls': int(os.getenv('breaker_minimum_calls', 10)),
+    'reset_timeout': float(os.getenv('breaker_reset_timeout', 15)),
+}
+
+# Pooled keep-alive clients, one per backend service. Timeouts are
+# (connect, read) seconds; retries only apply to idempotent requests.
+dealer_client = ServiceClient(
+    backend_url,
+    connect_timeout=float(os.getenv('backend_connect_timeout', 3.05)),
+    read_timeout=float(os.getenv('backend_read_timeout', 5)),
+    retries=int(os.getenv('backend_retries', 2)),
+    pool_size=int(os.getenv('http_pool_size', 10)),
+    breaker=get_breaker('dealer', **breaker_options),
+)
+sentiment_client = ServiceClient(
+    sentiment_analyzer_url,
+    connect_timeout=float(os.getenv('sentiment_connect_timeout', 3.05)),
+    read_timeout=float(os.getenv('sentiment_read_timeout', 5)),
+    retries=int(os.getenv('sentiment_retries', 1)),
+    pool_size=int(os.getenv('http_pool_size', 10)),
+    breaker=get_breaker('sentiment', **breaker_options),
+)
+
+# "http" calls the sentiment microservice; "local" runs the same VADER
+# scorer inside this worker (needs nltk, see microservices/requirements.txt)
+sentiment_engine = os.getenv('sentiment_engine', 'http').lower()
+
+# Texts sent per /analyze/batch call (the service accepts up to 1000)
+sentiment_batch_size = int(os.getenv('sentiment_batch_size', 100))
+
+# Labels already computed for a given text. Bump sentiment_model_version
+# whenever the analyzer or its decision rule changes.
+sentiment_cache = SentimentCache(
+    version=os.getenv('sentiment_model_version', 'vader-1'),
+    maxsize=int(os.getenv('sentiment_cache_size', 10000)),
+    timeout=int(os.getenv('sentiment_cache_timeout', 7 * 24 * 3600)),
+)
+
+# Identical outbound calls made at the same time share one round trip. With
+# single_flight_shared=true they are also coalesced across processes through
+# the Django cache.
+outbound_flights = SingleFlight(
+    shared=os.getenv('single_flight_shared', 'false').lower() in
+    ('1', 'true', 'yes'))
+
+
+class SentimentServiceError(Exception):
+    """The sentiment engine could not label some of the texts."""
+
 
 def get_request(endpoint, **kwargs):
-    request_url = backend_url + endpoint
+    key = ('GET', endpoint, tuple(sorted(kwargs.items())))
+    result, shared = outbound_flights.do(key, _get_request, endpoint, kwargs)
+    # Callers annotate the records they get back, so each needs its own copy
+    return copy.deepcopy(result) if shared else result
+
+
+def _get_request(endpoint, kwargs):
     network_exception = False
     try:
-        # Call get method of requests library with URL and parameters
-        response = requests.get(request_url, headers={'Content-Type':
-                                'application/json'}, params=kwargs)
+        # Call get method of the pooled dealer service client
+        response = dealer_client.get(endpoint, headers={'Content-Type':
+                                     'application/json'}, params=kwargs)
     except Exception:
         # If any exception occurs
         print("Network exception occurred")
@@ -33,12 +107,118 @@ def get_request(endpoint, **kwargs):
     return {"status_code": status_code, "message": json_data}
 
 
+# Background refreshes of stale remote responses
+remote_refresh_executor = ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix='remote-refresh')
+# Longest a refresh may hold its cross-process lock
+REMOTE_REFRESH_LOCK_TIMEOUT = 30
+
+
+def _remote_ttl(endpoint):
+    matches = [prefix for prefix in settings.REMOTE_CACHE_TTLS
+               if endpoint.startswith(prefix)]
+    if not matches:
+        return None
+    return settings.REMOTE_CACHE_TTLS[max(matches, key=len)]
+
+
+def _remote_key(endpoint, kwargs):
+    query = urlencode(sorted(kwargs.items()))
+    return f"djangoapp:remote:{quote(endpoint, safe='')}:{quote(query)}"
+
+
+def _fetch_and_store(key, endpoint, kwargs):
+    result = get_request(endpoint, **kwargs)
+    if result["status_code"] == 200:
+        lifetime = max(settings.REMOTE_CACHE_STALE_WHILE_REVALIDATE,
+                       settings.REMOTE_CACHE_STALE_IF_ERROR)
+        get_cache().set(key, {"fetched_at": time.time(), "result": result},
+                        _remote_ttl(endpoint) + lifetime)
+    return result
+
+
+def _refresh(key, endpoint, kwargs):
+    try:
+        _fetch_and_store(key, endpoint, kwargs)
+    finally:
+        get_cache().delete(key + ':refresh')
+
+
+def cached_get_request(endpoint, **kwargs):
+    """``get_request`` behind a read-through cache (see REMOTE_CACHE_*).
+
+    Fresh entries are served from the cache. Stale ones are served at once
+    while a single background refresh (one per key across all processes)
+    fetches a new copy. Past that window the service is called inline, and
+    if it fails the last good response is served until it is too old.
+    Failed responses are never cached.
+    """
+    ttl = _remote_ttl(endpoint)
+    if ttl is None:
+        return get_request(endpoint, **kwargs)
+    cache = get_cache()
+    key = _remote_key(endpoint, kwargs)
+    entry = cache.get(key)
+    if entry is None:
+        return _fetch_and_store(key, endpoint, kwargs)
+
+    age = time.time() - entry["fetched_at"]
+    if age < ttl:
+        return entry["result"]
+    if age < ttl + settings.REMOTE_CACHE_STALE_WHILE_REVALIDATE:
+        if cache.add(key + ':refresh', 1, REMOTE_REFRESH_LOCK_TIMEOUT):
+            remote_refresh_executor.submit(_refresh, key, endpoint, kwargs)
+        return entry["result"]
+
+    result = _fetch_and_store(key, endpoint, kwargs)
+    if (result["status_code"] != 200
+            and age < ttl + settings.REMOTE_CACHE_STALE_IF_ERROR):
+        print(f"Serving stale {endpoint} ({age:.0f}s old): "
+              "dealer service unavailable")
+        return entry["result"]
+    return result
+
+
+def _local_classify():
+    # Imported lazily so nltk is only required in "local" mode
+    from .microservices.scoring import classify
+    return classify
+
+
+def _has_text(text):
+    # VADER scores empty text all zeros, which its decision rule reads as
+    # positive; reviews without text are neutral instead
+    return isinstance(text, str) and bool(text.strip())
+
+
 def analyze_review_sentiments(text):
-    request_url = sentiment_analyzer_url + "analyze/" + text
+    if not _has_text(text):
+        return {"sentiment": "neutral"}
+    cached = sentiment_cache.get(text)
+    if cached is not None:
+        return {"sentiment": cached}
+    if sentiment_engine == "local":
+        try:
+            sentiment = _local_classify()(text)
+        except Exception as err:
+            print(f"Local sentiment analysis failed: {err}")
+            return {"sentiment": "neutral"}
+        sentiment_cache.set(text, sentiment)
+        return {"sentiment": sentiment}
+    result, shared = outbound_flights.do(('analyze', text), _analyze_remote,
+                                         text)
+    return dict(result) if shared else result
+
+
+def _analyze_remote(text):
     try:
-        # Call get method of requests library with URL and parameters
-        response = requests.get(request_url, timeout=5)
-        return response.json()
+        # Call get method of the pooled sentiment service client
+        response = sentiment_client.get("analyze/" + text)
+        result = response.json()
+        # Only real answers are cached, never the neutral fallbacks below
+        if response.status_code == 200 and 'sentiment' in result:
+            sentiment_cache.set(text, result['sentiment'])
+        return result
     except requests.exceptions.ConnectionError:
         print(f"Connection error: Sentiment analyzer not available at {sentiment_analyzer_url}")
         # Return neutral sentiment as fallback
@@ -52,10 +232,63 @@ def analyze_review_sentiments(text):
         return {"sentiment": "neutral"}
 
 
+def analyze_review_sentiments_batch(texts, chunk_size=None, strict=False):
+    """Classify many texts with one /analyze/batch call per chunk.
+
+    Returns one ``{"sentiment": ...}`` dict per input text, in order. Cached
+    and duplicate texts are not sent again. A chunk that fails falls back to
+    neutral, like ``analyze_review_sentiments``, unless ``strict`` is set,
+    in which case ``SentimentServiceError`` is raised so the caller can
+    retry later.
+    """
+    chunk_size = chunk_size or sentiment_batch_size
+    # Reviews without text (missing, null or blank) are neutral and are not
+    # sent; the None placeholders fall through to the neutral default below
+    texts = [text if _has_text(text) else None for text in texts]
+    scored = [text for text in texts if text is not None]
+    known = sentiment_cache.get_many(scored)
+    pending = list(dict.fromkeys(text for text in scored if text not in known))
+    if sentiment_engine == "local" and pending:
+        try:
+            classify = _local_classify()
+            labels = {text: classify(text) for text in pending}
+        except Exception as err:
+            if strict:
+                raise SentimentServiceError(str(err)) from err
+            print(f"Local sentiment analysis failed: {err}")
+            labels = {}
+        sentiment_cache.set_many(labels)
+        known.update(labels)
+        pending = []
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        try:
+            sentiments, _ = outbound_flights.do(
+                ('analyze/batch', tuple(chunk)), _post_batch, chunk)
+        except Exception as err:
+            if strict:
+                raise SentimentServiceError(str(err)) from err
+            print(f"Batch sentiment analysis failed: {err}")
+            continue
+        labels = {text: sentiment['sentiment']
+                  for text, sentiment in zip(chunk, sentiments)}
+        sentiment_cache.set_many(labels)
+        known.update(labels)
+    return [{"sentiment": known.get(text, "neutral")} for text in texts]
+
+
+def _post_batch(chunk):
+    response = sentiment_client.post("analyze/batch", json=chunk)
+    response.raise_for_status()
+    sentiments = response.json()
+    if len(sentiments) != len(chunk):
+        raise ValueError("Batch response length mismatch")
+    return sentiments
+
+
 def post_review(data_dict):
-    request_url = backend_url + "/insert_review"
     try:
-        response = requests.post(request_url, json=data_dict, timeout=5)
+        response = dealer_client.post("/insert_review", json=data_dict)
         print(response.json())
         return response.json()
     except requests.exceptions.ConnectionError:
@@ -0,0 +1,93 @@
+"""Full-text search over review texts and reviewer names.
+
+The index is created by migration 0007 and kept in sync by the database
+itself, so it also covers bulk writes that send no signals:
+
+* SQLite: ``djangoapp_review_fts``, an FTS5 table over ``djangoapp_review``
+  (external content, porter stemming) maintained by triggers and ranked
+  with ``bm25()``.
+* PostgreSQL: a GIN index on ``SEARCH_VECTOR``, an expression over the
+  review row itself, ranked with ``ts_rank()``.
+
+Other backends fall back to a ``LIKE`` scan in id order.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Review
+
+FTS_TABLE = 'djangoapp_review_fts'
+SEARCH_CONFIG = 'english'
+SEARCH_VECTOR = (f"to_tsvector('{SEARCH_CONFIG}', "
+                 "coalesce(name, '') || ' ' || review)")
+
+# The longest query accepted, in words
+MAX_TERMS = 16
+
+
+def terms(text):
+    return re.findall(r'\w+', text or '')[:MAX_TERMS]
+
+
+def _fts_query(words):
+    # Quoted so user input is never read as FTS5 syntax; every word must
+    # match and the last one may be a prefix (search-as-you-type)
+    phrases = [f'"{word}"' for word in words]
+    phrases[-1] += '*'
+    return ' '.join(phrases)
+
+
+def _matches(words):
+    """SQL selecting the ids of matching reviews, or None (no index)."""
+    if connection.vendor == 'sqlite':
+        return (f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [_fts_query(words)])
+    if connection.vendor == 'postgresql':
+        return (f"SELECT id FROM djangoapp_review WHERE {SEARCH_VECTOR} "
+                f"@@ plainto_tsquery('{SEARCH_CONFIG}', %s)",
+                [' '.join(words)])
+    return None
+
+
+def _like(words):
+    condition = Q()
+    for word in words:
+        condition &= Q(review__icontains=word) | Q(name__icontains=word)
+    return condition
+
+
+def filter_reviews(queryset, text):
+    """Restrict a Review queryset to the reviews matching ``text``."""
+    words = terms(text)
+    if not words:
+        return queryset.none()
+    matches = _matches(words)
+    if matches is None:
+        return queryset.filter(_like(words))
+    return queryset.filter(id__in=RawSQL(*matches))
+
+
+def ranked_ids(text, limit):
+    """Ids of the best ``limit`` matches for ``text``, best first."""
+    words = terms(text)
+    if not words:
+        return []
+    if connection.vendor == 'sqlite':
+        sql = (f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+               f"ORDER BY bm25({FTS_TABLE}), rowid LIMIT %s")
+        params = [_fts_query(words), limit]
+    elif connection.vendor == 'postgresql':
+        sql = (f"SELECT id FROM djangoapp_review, "
+               f"plainto_tsquery('{SEARCH_CONFIG}', %s) query "
+               f"WHERE {SEARCH_VECTOR} @@ query "
+               f"ORDER BY ts_rank({SEARCH_VECTOR}, query) DESC, id LIMIT %s")
+        params = [' '.join(words), limit]
+    else:
+        return list(Review.objects.filter(_like(words)).order_by('id')
+                    .values_list('id', flat=True)[:limit])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
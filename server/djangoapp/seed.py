@@ -0,0 +1,223 @@
+"""Bulk loading of the seed datasets in server/database/data.
+
+The JSON files are streamed record by record (they are shaped like
+``{"dealerships": [{...}, ...]}``) and written with ``bulk_create`` in
+batches. Dealers and reviews carry their own ids and are upserted on them,
+so loading the same files again updates rows instead of duplicating them.
+Cars have no id and are matched on (make, model, year, dealer) instead.
+"""
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection
+
+from . import dealer_stats, geo
+from .cache import bump_generation
+from .models import CarMake, CarModel, Dealer, Review
+
+READ_SIZE = 64 * 1024
+
+# car_records.json body types -> CarModel.CAR_TYPES
+BODY_TYPES = {
+    'sedan': 'SEDAN',
+    'suv': 'SUV',
+    'wagon': 'WAGON',
+    'coupe': 'COUPE',
+    'convertible': 'CONVERTIBLE',
+    'hatchback': 'HATCHBACK',
+    'truck': 'TRUCK',
+    'pickup': 'TRUCK',
+    # No minivan type; a wagon is the closest choice
+    'minivan': 'WAGON',
+}
+
+
+def iter_json_array(path, key):
+    """Yield the items of the top-level ``key`` list of a JSON file.
+
+    Only the current item and one read buffer are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as source:
+        buffer = ''
+        start = -1
+        marker = json.dumps(key)
+        while start < 0:
+            chunk = source.read(READ_SIZE)
+            if not chunk:
+                raise ValueError(f"{path} has no {marker} list")
+            buffer += chunk
+            found = buffer.find(marker)
+            if found >= 0:
+                start = buffer.find('[', found + len(marker))
+        position = start + 1
+        eof = False
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                if position >= len(buffer):
+                    raise ValueError("need more data")
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise ValueError(f"{path}: truncated {marker} list")
+                chunk = source.read(READ_SIZE)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_date(value):
+    """Convert the datasets' MM/DD/YYYY dates; blank or bad values -> None."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%m/%d/%Y').date()
+    except ValueError:
+        return None
+
+
+def _location(item):
+    if item.get('lat') is not None and item.get('long') is not None:
+        return item['lat'], item['long']
+    return geo.locate_zip(item['zip']) or (None, None)
+
+
+def reset_sequences(*models):
+    """Move the id sequences of ``models`` past the ids loaded explicitly.
+
+    Rows inserted with their own ids leave a PostgreSQL sequence behind, so
+    the next ORM insert would reuse a taken id. No-op on SQLite.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def load_dealers(path, batch_size):
+    count = 0
+    for batch in batched(iter_json_array(path, 'dealerships'), batch_size):
+        dealers = []
+        for item in batch:
+            lat, long = _location(item)
+            dealers.append(Dealer(
+                id=item['id'], full_name=item['full_name'],
+                short_name=item.get('short_name'), city=item['city'],
+                state=item['state'], address=item['address'],
+                zip=item['zip'], lat=lat, long=long))
+        Dealer.objects.bulk_create(
+            dealers, update_conflicts=True, unique_fields=['id'],
+            update_fields=['full_name', 'short_name', 'city', 'state',
+                           'address', 'zip', 'lat', 'long'],
+        )
+        count += len(batch)
+    reset_sequences(Dealer)
+    # bulk_create does not send post_save, so drop cached dealer lists here
+    bump_generation('dealers')
+    return count
+
+
+def load_reviews(path, batch_size):
+    """Upsert reviews; reviews of dealers not in the database are skipped.
+
+    Returns ``(loaded, skipped)``.
+    """
+    dealer_ids = set(Dealer.objects.values_list('id', flat=True))
+    reviewed = set()
+    loaded = skipped = 0
+    for batch in batched(iter_json_array(path, 'reviews'), batch_size):
+        reviews = []
+        for item in batch:
+            if item['dealership'] not in dealer_ids:
+                skipped += 1
+                continue
+            reviews.append(Review(
+                id=item['id'], dealer_id=item['dealership'],
+                name=item['name'], review=item['review'],
+                purchase=bool(item.get('purchase')),
+                purchase_date=parse_date(item.get('purchase_date')),
+                car_make=item.get('car_make'),
+                car_model=item.get('car_model'),
+                car_year=item.get('car_year'),
+            ))
+        # Reviews moved to another dealer change the old dealer's stats too
+        reviewed.update(Review.objects.filter(
+            id__in=[review.id for review in reviews]
+        ).values_list('dealer_id', flat=True))
+        # sentiment is left alone so reruns keep computed labels
+        Review.objects.bulk_create(
+            reviews, update_conflicts=True, unique_fields=['id'],
+            update_fields=['dealer', 'name', 'review', 'purchase',
+                           'purchase_date', 'car_make', 'car_model',
+                           'car_year'],
+        )
+        loaded += len(reviews)
+        reviewed.update(review.dealer_id for review in reviews)
+    reset_sequences(Review)
+    # bulk_create sends no signals either; recount the dealers touched
+    dealer_stats.rebuild(reviewed)
+    bump_generation('reviews')
+    return loaded, skipped
+
+
+def load_cars(path, batch_size):
+    """Create missing makes and models; returns the car records read."""
+    makes = {make.name.lower(): make for make in CarMake.objects.all()}
+    existing = {
+        (make_id, name, year, dealer_id): (pk, car_type)
+        for pk, make_id, name, year, dealer_id, car_type
+        in CarModel.objects.values_list('id', 'car_make_id', 'name', 'year',
+                                        'dealer_id', 'type')
+    }
+    count = 0
+    for batch in batched(iter_json_array(path, 'cars'), batch_size):
+        new_makes = {item['make'].lower(): item['make'] for item in batch
+                     if item['make'].lower() not in makes}
+        if new_makes:
+            CarMake.objects.bulk_create(
+                [CarMake(name=name, description='') for name
+                 in new_makes.values()])
+            # Re-read so the makes have primary keys on every backend
+            for make in CarMake.objects.filter(
+                    name__in=new_makes.values()):
+                makes.setdefault(make.name.lower(), make)
+
+        created = []
+        changed = []
+        for item in batch:
+            make = makes[item['make'].lower()]
+            car_type = BODY_TYPES.get(item['bodyType'].lower(), 'SUV')
+            key = (make.id, item['model'], item['year'], item['dealer_id'])
+            if key in existing:
+                pk, current_type = existing[key]
+                # pk is None for a duplicate record created in this run
+                if pk is not None and current_type != car_type:
+                    changed.append(CarModel(id=pk, type=car_type))
+                    existing[key] = (pk, car_type)
+                continue
+            existing[key] = (None, car_type)
+            created.append(CarModel(car_make=make, name=item['model'],
+                                    type=car_type, year=item['year'],
+                                    dealer_id=item['dealer_id']))
+        CarModel.objects.bulk_create(created)
+        CarModel.objects.bulk_update(changed, ['type'])
+        count += len(batch)
+    bump_generation('cars')
+    return count
@@ -0,0 +1,115 @@
+"""Two-tier cache for sentiment analysis results.
+
+Results are keyed by a SHA-256 of the review text plus a model version tag,
+so changing the analyzer invalidates old labels. Tier 1 is a bounded LRU in
+each worker process; tier 2 is the shared Django cache, so labels computed
+by one gunicorn worker are reused by all of them.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .cache import get_cache
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SentimentCache:
+    def __init__(self, version, maxsize=10000, timeout=None):
+        self.version = version
+        self.timeout = timeout
+        self.local = LRUCache(maxsize)
+        self._counts = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+        self._counts_lock = threading.Lock()
+
+    def key(self, text):
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"sentiment:{self.version}:{digest}"
+
+    def _count(self, name, amount=1):
+        if amount:
+            with self._counts_lock:
+                self._counts[name] += amount
+
+    def get_many(self, texts):
+        """Return ``{text: sentiment}`` for every text found in either tier."""
+        found = {}
+        missing = {}
+        for text in set(texts):
+            key = self.key(text)
+            sentiment = self.local.get(key)
+            if sentiment is None:
+                missing[key] = text
+            else:
+                found[text] = sentiment
+        self._count("l1_hits", len(found))
+
+        if missing:
+            shared = get_cache().get_many(list(missing))
+            for key, sentiment in shared.items():
+                self.local.set(key, sentiment)
+                found[missing[key]] = sentiment
+            self._count("l2_hits", len(shared))
+            self._count("misses", len(missing) - len(shared))
+        return found
+
+    def get(self, text):
+        return self.get_many([text]).get(text)
+
+    def set_many(self, results):
+        """Store ``{text: sentiment}`` in both tiers."""
+        entries = {self.key(text): sentiment
+                   for text, sentiment in results.items()}
+        for key, sentiment in entries.items():
+            self.local.set(key, sentiment)
+        get_cache().set_many(entries, self.timeout)
+
+    def set(self, text, sentiment):
+        self.set_many({text: sentiment})
+
+    def stats(self):
+        with self._counts_lock:
+            stats = dict(self._counts)
+        stats["l1_size"] = len(self.local)
+        stats["version"] = self.version
+        return stats
+
+    def clear(self):
+        """Drop the in-process tier and reset the counters."""
+        self.local.clear()
+        with self._counts_lock:
+            for name in self._counts:
+                self._counts[name] = 0
@@ -0,0 +1,257 @@
+"""Background sentiment analysis for new reviews.
+
+``add_review`` saves a Review with ``sentiment='pending'`` plus a
+``SentimentJob`` row and returns at once. Worker threads (started from
+wsgi.py through ``start_workers``) claim due jobs in batches, label the
+review texts with one batched sentiment call and write the labels back.
+
+A failed batch is retried with exponential backoff; a job that keeps
+failing is marked dead and its review falls back to neutral, which is what
+``add_review`` used to store when the analyzer was down. Workers in several
+gunicorn processes can drain the same table: jobs are claimed with a
+conditional UPDATE, so each claim goes to exactly one worker, and a claim
+whose lease lapses (worker killed mid-batch) becomes claimable again.
+"""
+import logging
+import random
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from . import dealer_stats
+from .cache import bump_generation
+from .models import Review, SentimentJob
+from .restapis import SentimentServiceError, analyze_review_sentiments_batch
+
+logger = logging.getLogger(__name__)
+
+# Review.sentiment while its job is queued
+PENDING_SENTIMENT = 'pending'
+# Review.sentiment once its job is dead
+FALLBACK_SENTIMENT = 'neutral'
+
+
+def enqueue(review):
+    job = SentimentJob.objects.create(review=review)
+    transaction.on_commit(notify)
+    return job
+
+
+def _due(now):
+    return (Q(status=SentimentJob.PENDING, run_after__lte=now)
+            | Q(status=SentimentJob.RUNNING, locked_until__lt=now))
+
+
+def claim_batch(limit=None):
+    """Atomically claim up to ``limit`` due jobs for this worker."""
+    limit = limit or settings.SENTIMENT_JOB_BATCH_SIZE
+    now = timezone.now()
+    ids = list(SentimentJob.objects.filter(_due(now))
+               .order_by('run_after', 'id')
+               .values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # The due condition is checked again by the UPDATE itself, so jobs
+    # another worker claimed in the meantime are left alone.
+    claimed = SentimentJob.objects.filter(_due(now), id__in=ids).update(
+        status=SentimentJob.RUNNING,
+        locked_by=token,
+        locked_until=now + timedelta(seconds=settings.SENTIMENT_JOB_LEASE),
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return []
+    return list(SentimentJob.objects.filter(locked_by=token)
+                .select_related('review').order_by('id'))
+
+
+def retry_delay(attempts):
+    """Seconds to wait before attempt ``attempts + 1`` (jittered)."""
+    delay = min(settings.SENTIMENT_JOB_RETRY_DELAY * 2 ** (attempts - 1),
+                settings.SENTIMENT_JOB_MAX_RETRY_DELAY)
+    return random.uniform(delay / 2, delay)
+
+
+def process_batch(jobs):
+    """Label the reviews of claimed ``jobs``; retry or bury on failure."""
+    if not jobs:
+        return
+    try:
+        results = analyze_review_sentiments_batch(
+            [job.review.review for job in jobs], strict=True)
+    except SentimentServiceError as err:
+        logger.warning(f"Sentiment batch of {len(jobs)} failed: {err}")
+        _retry_or_bury(jobs, str(err))
+        return
+
+    review_ids = defaultdict(list)
+    for job, result in zip(jobs, results):
+        review_ids[result['sentiment']].append(job.review_id)
+    with transaction.atomic():
+        for sentiment, ids in review_ids.items():
+            _label_pending(ids, sentiment)
+        SentimentJob.objects.filter(
+            id__in=[job.id for job in jobs], locked_by=jobs[0].locked_by
+        ).delete()
+    # QuerySet.update sends no signals; new labels change review responses
+    bump_generation('reviews')
+
+
+def _label_pending(review_ids, sentiment):
+    """Set the sentiment of those reviews that are still pending."""
+    # Leave reviews whose sentiment was set by hand meanwhile
+    rows = list(Review.objects.select_for_update().filter(
+        id__in=review_ids, sentiment=PENDING_SENTIMENT
+    ).values_list('id', 'dealer_id'))
+    Review.objects.filter(
+        id__in=[review_id for review_id, _ in rows]
+    ).update(sentiment=sentiment)
+    # QuerySet.update sends no signals, so move the counters here
+    dealer_stats.sentiments_changed(
+        (dealer_id, PENDING_SENTIMENT, sentiment) for _, dealer_id in rows)
+
+
+def _retry_or_bury(jobs, error):
+    now = timezone.now()
+    error = error[:1000]
+    dead = [job for job in jobs
+            if job.attempts >= settings.SENTIMENT_JOB_MAX_ATTEMPTS]
+    retry = defaultdict(list)
+    for job in jobs:
+        if job.attempts < settings.SENTIMENT_JOB_MAX_ATTEMPTS:
+            retry[job.attempts].append(job.id)
+    token = jobs[0].locked_by
+    with transaction.atomic():
+        for attempts, ids in retry.items():
+            SentimentJob.objects.filter(id__in=ids, locked_by=token).update(
+                status=SentimentJob.PENDING,
+                run_after=now + timedelta(seconds=retry_delay(attempts)),
+                locked_by='', locked_until=None, last_error=error,
+            )
+        if dead:
+            SentimentJob.objects.filter(
+                id__in=[job.id for job in dead], locked_by=token
+            ).update(status=SentimentJob.DEAD, locked_by='',
+                     locked_until=None, last_error=error)
+            _label_pending([job.review_id for job in dead],
+                           FALLBACK_SENTIMENT)
+    if dead:
+        bump_generation('reviews')
+
+
+def run_once(limit=None):
+    """Claim and process one batch; return how many jobs were claimed."""
+    jobs = claim_batch(limit)
+    process_batch(jobs)
+    return len(jobs)
+
+
+def drain(limit=None):
+    """Process batches until no job is due; return the jobs claimed."""
+    total = 0
+    while True:
+        claimed = run_once(limit)
+        if not claimed:
+            return total
+        total += claimed
+
+
+def requeue_dead():
+    """Give dead jobs a fresh set of attempts; return how many."""
+    with transaction.atomic():
+        dead = SentimentJob.objects.filter(status=SentimentJob.DEAD)
+        reviews = Review.objects.filter(id__in=dead.values('review_id'))
+        dealer_ids = set(reviews.values_list('dealer_id', flat=True))
+        reviews.update(sentiment=PENDING_SENTIMENT)
+        count = dead.update(status=SentimentJob.PENDING, attempts=0,
+                            run_after=timezone.now(), last_error='')
+        dealer_stats.rebuild(dealer_ids)
+    bump_generation('reviews')
+    transaction.on_commit(notify)
+    return count
+
+
+def backlog():
+    """Job counts by status and the age of the oldest unfinished job."""
+    now = timezone.now()
+    counts = dict(SentimentJob.objects.order_by()
+                  .values_list('status').annotate(count=Count('id')))
+    oldest = SentimentJob.objects.exclude(
+        status=SentimentJob.DEAD
+    ).aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        "pending": counts.get(SentimentJob.PENDING, 0),
+        "running": counts.get(SentimentJob.RUNNING, 0),
+        "dead": counts.get(SentimentJob.DEAD, 0),
+        "due": SentimentJob.objects.filter(_due(now)).count(),
+        "oldest_age_seconds": (
+            round((now - oldest).total_seconds(), 1) if oldest else None),
+    }
+
+
+class WorkerPool:
+    def __init__(self, size, poll_interval):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for number in range(self.size):
+            thread = threading.Thread(target=self._run, daemon=True,
+                                      name=f"sentiment-worker-{number}")
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                claimed = run_once()
+            except Exception:
+                logger.exception("Sentiment worker failed")
+                claimed = 0
+            if not claimed:
+                # Sleep until a new review is queued or the poll interval
+                # passes (retries become due without a notification)
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_workers():
+    """Start this process's worker pool (once; no-op if disabled)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and settings.SENTIMENT_WORKERS > 0:
+            _pool = WorkerPool(settings.SENTIMENT_WORKERS,
+                               settings.SENTIMENT_JOB_POLL_INTERVAL)
+            _pool.start()
+    return _pool
+
+
+def notify():
+    """Wake this process's workers, if any, to pick up new jobs."""
+    if _pool is not None:
+        _pool.notify()
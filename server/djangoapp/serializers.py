@@ -0,0 +1,85 @@
+"""Column projections for the djangoapp JSON endpoints.
+
+Each projection selects only the columns an endpoint returns with
+``values_list()`` and zips the row tuples straight into the output schema,
+so no model instances are built on the read paths. Derived fields (such as
+the ``short_name or full_name`` fallback) are computed in SQL.
+"""
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
+
+
+class Projection:
+    """Map output keys to model columns or SQL expressions.
+
+    ``fields`` is a sequence of ``(output_key, column_or_expression)``
+    pairs. Projections used with keyset pagination must list the primary
+    key first, since ``paginate`` reads it from ``row[0]``.
+    """
+
+    def __init__(self, fields):
+        self.keys = tuple(key for key, _ in fields)
+        self.columns = []
+        self.annotations = {}
+        for key, source in fields:
+            if isinstance(source, str):
+                self.columns.append(source)
+            else:
+                alias = f"_{key}"
+                self.annotations[alias] = source
+                self.columns.append(alias)
+
+    def apply(self, queryset):
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values_list(*self.columns)
+
+    def to_dict(self, row):
+        return dict(zip(self.keys, row))
+
+    def to_dicts(self, rows):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+
+DEALER_FIELDS = [
+    ("id", "id"),
+    ("full_name", "full_name"),
+    ("city", "city"),
+    ("state", "state"),
+    ("address", "address"),
+    ("zip", "zip"),
+    # Same as `dealer.short_name or dealer.full_name`: NULL and '' fall back
+    ("short_name", Coalesce(NullIf(F("short_name"), Value("")),
+                            F("full_name"))),
+]
+DEALER = Projection(DEALER_FIELDS)
+
+# get_dealer_details reads the dealer and its DealerStats row in one query
+DEALER_STATS_FIELDS = ("review_count", "positive_count", "neutral_count",
+                       "negative_count", "pending_count", "purchase_count",
+                       "latest_review_at")
+DEALER_DETAILS = Projection(DEALER_FIELDS + [
+    (field, f"stats__{field}") for field in DEALER_STATS_FIELDS])
+
+# purchase_date stays a date; DjangoJSONEncoder writes it in ISO format
+REVIEW_FIELDS = [
+    ("id", "id"),
+    ("name", "name"),
+    ("review", "review"),
+    ("purchase", "purchase"),
+    ("purchase_date", "purchase_date"),
+    ("car_make", "car_make"),
+    ("car_model", "car_model"),
+    ("car_year", "car_year"),
+    ("sentiment", "sentiment"),
+]
+REVIEW = Projection(REVIEW_FIELDS)
+
+# Search results span dealers, so they also say whose review it is
+REVIEW_SEARCH = Projection(REVIEW_FIELDS + [("dealer_id", "dealer_id")])
+
+CAR = Projection([
+    ("CarModel", "name"),
+    ("CarMake", "car_make__name"),
+])
@@ -0,0 +1,65 @@
+"""Session persistence that only writes when it has to.
+
+With ``SESSION_SAVE_EVERY_REQUEST`` every request that carries a session
+cookie rewrites its ``django_session`` row just to push the expiry forward.
+The stores here stamp each saved session with the time it was written, and
+``ThrottledSessionMiddleware`` saves a session that was not modified only
+once less than ``SESSION_REFRESH_WINDOW`` seconds of its lifetime are left.
+Sessions still expire ``SESSION_COOKIE_AGE`` after the last save, so
+activity keeps extending them, at most one write per
+``SESSION_COOKIE_AGE - SESSION_REFRESH_WINDOW`` seconds instead of one per
+request.
+
+Engines (``SESSION_ENGINE``):
+
+* ``djangoapp.sessions.db``: sessions in the database.
+* ``djangoapp.sessions.cached_db``: sessions read from the cache and
+  written through to the database, so reads rarely touch the database and
+  nothing is lost if the cache is flushed.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+# Session key holding the Unix time of the last save
+SAVED_AT_KEY = '_saved_at'
+
+
+class ThrottledSessionMixin:
+    def save(self, must_create=False):
+        self._get_session(no_load=must_create)[SAVED_AT_KEY] = int(
+            time.time())
+        super().save(must_create)
+
+    def needs_refresh(self):
+        """True if the stored session is due for an expiry refresh."""
+        data = self._get_session()
+        if not data:
+            return False
+        saved_at = data.get(SAVED_AT_KEY)
+        if saved_at is None:
+            # Saved before throttling (or by another engine): stamp it now
+            return True
+        remaining = self.get_session_cookie_age() - (time.time() - saved_at)
+        return remaining < settings.SESSION_REFRESH_WINDOW
+
+
+class ThrottledSessionMiddleware(SessionMiddleware):
+    """``SessionMiddleware`` that re-saves unmodified sessions sparingly.
+
+    Use it with ``SESSION_SAVE_EVERY_REQUEST = False`` and one of the
+    engines above; with other engines it behaves like ``SessionMiddleware``.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if (isinstance(session, ThrottledSessionMixin)
+                and not session.modified
+                and settings.SESSION_COOKIE_NAME in request.COOKIES):
+            # Checking must not add "Vary: Cookie" to responses that never
+            # used the session themselves
+            accessed = session.accessed
+            session.modified = session.needs_refresh()
+            session.accessed = accessed
+        return super().process_response(request, response)
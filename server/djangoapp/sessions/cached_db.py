@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import cached_db
+
+from . import ThrottledSessionMixin
+
+
+class SessionStore(ThrottledSessionMixin, cached_db.SessionStore):
+    pass
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import db
+
+from . import ThrottledSessionMixin
+
+
+class SessionStore(ThrottledSessionMixin, db.SessionStore):
+    pass
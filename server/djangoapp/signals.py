@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import dealer_stats, geo, tokens
+from .cache import bump_generation
+from .models import CarMake, CarModel, Dealer, Review
+
+
+# Place dealers saved without coordinates at their zip's centroid, and
+# re-place them when their zip is edited without new coordinates
+@receiver(pre_save, sender=Dealer)
+def locate_dealer(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if (not instance._state.adding
+            and (update_fields is None or 'zip' in update_fields)):
+        stored = Dealer.objects.filter(pk=instance.pk).values(
+            'zip', 'lat', 'long').first()
+        if (stored and stored['zip'] != instance.zip
+                and (instance.lat, instance.long)
+                == (stored['lat'], stored['long'])):
+            instance.lat = instance.long = None
+    if instance.lat is None or instance.long is None:
+        location = geo.locate_zip(instance.zip)
+        if location:
+            instance.lat, instance.long = location
+
+
+# Drop a user's cached token record when they change (password, is_active)
+@receiver([post_save, post_delete], sender=User)
+def forget_token_user(sender, instance, **kwargs):
+    tokens.user_cache.delete(instance.pk)
+
+
+# Invalidate cached dealer responses whenever a dealer changes
+@receiver([post_save, post_delete], sender=Dealer)
+def invalidate_dealers(sender, **kwargs):
+    bump_generation('dealers')
+
+
+# Reviews and the car catalog are versioned for conditional GETs
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_reviews(sender, **kwargs):
+    bump_generation('reviews')
+
+
+# Keep DealerStats in step with individual review writes
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, raw=False, **kwargs):
+    instance._stats_previous = None
+    if not raw and not instance._state.adding:
+        previous = Review.objects.filter(pk=instance.pk).values(
+            'dealer_id', 'sentiment', 'purchase', 'created_at').first()
+        instance._stats_previous = previous
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        dealer_stats.review_saved(
+            instance, getattr(instance, '_stats_previous', None))
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    dealer_stats.review_deleted(dealer_stats.review_state(instance))
+
+
+@receiver([post_save, post_delete], sender=CarMake)
+@receiver([post_save, post_delete], sender=CarModel)
+def invalidate_cars(sender, **kwargs):
+    bump_generation('cars')
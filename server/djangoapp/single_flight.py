@@ -0,0 +1,102 @@
+"""Coalescing of identical concurrent calls ("single flight").
+
+While a call for a key is in flight, other callers asking for the same key
+wait for it and share its result (or its exception) instead of repeating
+the work. Nothing is kept once the call returns; this is not a cache.
+
+With ``shared=True`` the first caller also takes an ``add``-based lock in
+the Django cache, so callers in other processes wait for the result it
+publishes there instead of making the same call. If the lock holder fails
+or dies, waiters make the call themselves.
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from .cache import get_cache
+
+# How long a cross-process leader may hold its lock, how often waiters in
+# other processes poll for its result and how long that result is kept
+# for them.
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+RESULT_TIMEOUT = 10
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.duplicates = 0
+
+
+class SingleFlight:
+    def __init__(self, shared=False, lock_timeout=LOCK_TIMEOUT,
+                 poll_interval=POLL_INTERVAL):
+        self.shared = shared
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Return ``(value, shared)`` of ``func(*args, **kwargs)``.
+
+        ``shared`` is true when the value went to more than one caller, who
+        should then copy it before mutating it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.duplicates += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value, shared = self._run(key, func, args, kwargs)
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, shared or call.duplicates > 0
+
+    def _run(self, key, func, args, kwargs):
+        if not self.shared:
+            return func(*args, **kwargs), False
+
+        cache = get_cache()
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        lock_key = f"djangoapp:flight:{digest}"
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, self.lock_timeout):
+            try:
+                value = func(*args, **kwargs)
+                cache.set(f"{lock_key}:{token}", (value,), RESULT_TIMEOUT)
+            finally:
+                cache.delete(lock_key)
+            return value, False
+
+        # Another process is making this call; wait for what it publishes
+        owner = cache.get(lock_key)
+        deadline = time.monotonic() + self.lock_timeout
+        while owner is not None and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            # Read the lock first: the result is stored before its release
+            released = cache.get(lock_key) != owner
+            stored = cache.get(f"{lock_key}:{owner}")
+            if stored is not None:
+                return stored[0], True
+            if released:
+                break
+        return func(*args, **kwargs), False
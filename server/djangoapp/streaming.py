@@ -0,0 +1,51 @@
+"""Incremental JSON encoding for large list responses.
+
+``stream_envelope`` emits the same ``{"status": 200, "<key>": [...]}`` body
+that ``JsonResponse`` would produce, but one batch of items at a time, so a
+worker never holds the whole list (or its serialized string) in memory.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+# Flush to the client once this many bytes of items have been encoded
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def wants_stream(request):
+    return request.GET.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def stream_envelope(key, items, status=200):
+    encoder = DjangoJSONEncoder()
+    yield '{"status": %d, %s: [' % (status, json.dumps(key))
+    buffer = []
+    buffered = 0
+    separator = ''
+    for item in items:
+        chunk = separator + encoder.encode(item)
+        separator = ', '
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    buffer.append(']}')
+    yield ''.join(buffer)
+
+
+def iterate(queryset):
+    """Read ``queryset`` in chunks without caching the full result set."""
+    return queryset.iterator(chunk_size=settings.API_STREAM_CHUNK_SIZE)
+
+
+def streaming_json_response(key, rows, to_dict):
+    """Stream ``rows`` as a JSON envelope, serializing them lazily."""
+    return StreamingHttpResponse(
+        stream_envelope(key, (to_dict(row) for row in rows)),
+        content_type='application/json'
+    )
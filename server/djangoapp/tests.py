@@ -1,7 +1,59 @@
-from django.test import TestCase, Client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import (TestCase, TransactionTestCase, Client,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from .models import CarMake, CarModel
+from urllib3.util.retry import Retry
+from .cache import bump_generation, get_cache, get_or_build
+from .circuit_breaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker,
+                              CircuitOpenError, all_breakers)
+from .models import (CarMake, CarModel, Dealer, DealerStats, Review,
+                     SentimentJob)
+from .streaming import stream_envelope
+from . import (catalog, dealer_stats, geo, restapis, search, seed,
+               sentiment_jobs, serializers, tokens)
+from .http_client import JitteredRetry, ServiceClient
+from .single_flight import SingleFlight
+import importlib.util
+import io
 import json
+import math
+import os
+import runpy
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+
+def as_other_worker():
+    """Reach the shared generation store through a second cache instance,
+    the way another worker process would."""
+    return override_settings(
+        CACHES=dict(settings.CACHES,
+                    other_worker=settings.CACHES['generations']),
+        DJANGOAPP_GENERATION_CACHE_ALIAS='other_worker')
+
+
+def import_service_module(name):
+    """Import a module of the sentiment microservice, which runs from its
+    own directory and imports its modules without a package prefix."""
+    service_dir = str(settings.BASE_DIR / 'djangoapp' / 'microservices')
+    if service_dir not in sys.path:
+        sys.path.append(service_dir)
+    return importlib.import_module(name)
+
+
+def reset_breakers():
+    for breaker in all_breakers().values():
+        breaker.reset()
 
 
 class DjangoAppTestCase(TestCase):
@@ -215,3 +267,1918 @@ class ModelValidationTestCase(TestCase):
                 car_model.full_clean()
                 car_model.save()
                 self.assertEqual(car_model.type, car_type)
+
+
+class DealersCacheTestCase(TestCase):
+    """Test the versioned response cache behind get_dealerships"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.dealer = Dealer.objects.create(
+            full_name="Holdlamis Car Dealership",
+            city="El Paso",
+            state="Texas",
+            address="3 Nova Court",
+            zip="88563",
+            short_name="Holdlamis"
+        )
+        Dealer.objects.create(
+            full_name="Temp Car Dealership",
+            city="Minneapolis",
+            state="Minnesota",
+            address="6337 Butternut Crossing",
+            zip="55402"
+        )
+
+    def test_second_request_is_served_from_cache(self):
+        """Test a repeated request does not hit the database"""
+        first = self.client.get('/djangoapp/get_dealers/Texas')
+        with self.assertNumQueries(0):
+            second = self.client.get('/djangoapp/get_dealers/Texas')
+        self.assertEqual(first.content, second.content)
+        data = json.loads(second.content)
+        self.assertEqual(data['status'], 200)
+        self.assertEqual(len(data['dealers']), 1)
+        self.assertEqual(data['dealers'][0]['short_name'], "Holdlamis")
+
+    def test_states_are_cached_separately(self):
+        """Test each state gets its own cache entry"""
+        texas = json.loads(self.client.get('/djangoapp/get_dealers/Texas')
+                           .content)
+        everyone = json.loads(self.client.get('/djangoapp/get_dealers/')
+                              .content)
+        self.assertEqual(len(texas['dealers']), 1)
+        self.assertEqual(len(everyone['dealers']), 2)
+        self.assertEqual(everyone['dealers'][1]['short_name'],
+                         "Temp Car Dealership")
+
+    def test_dealer_save_invalidates_cache(self):
+        """Test saving or deleting a dealer bumps the cache generation"""
+        self.client.get('/djangoapp/get_dealers/Texas')
+        self.dealer.city = "Austin"
+        self.dealer.save()
+        data = json.loads(self.client.get('/djangoapp/get_dealers/Texas')
+                          .content)
+        self.assertEqual(data['dealers'][0]['city'], "Austin")
+
+        self.dealer.delete()
+        data = json.loads(self.client.get('/djangoapp/get_dealers/Texas')
+                          .content)
+        self.assertEqual(data['dealers'], [])
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test a write in one worker invalidates another worker's cache"""
+        with tempfile.TemporaryDirectory() as shared:
+            workers = {}
+            for worker in ('a', 'b'):
+                # Private response caches, one generation store on disk
+                workers[f'responses-{worker}'] = {
+                    'BACKEND': 'django.core.cache.backends.locmem.'
+                               'LocMemCache',
+                    'LOCATION': f'worker-{worker}'}
+                workers[f'generations-{worker}'] = {
+                    'BACKEND': 'django.core.cache.backends.filebased.'
+                               'FileBasedCache',
+                    'LOCATION': shared, 'TIMEOUT': None}
+
+            def as_worker(worker):
+                return override_settings(
+                    DJANGOAPP_CACHE_ALIAS=f'responses-{worker}',
+                    DJANGOAPP_GENERATION_CACHE_ALIAS=f'generations-{worker}')
+
+            with override_settings(CACHES=workers):
+                with as_worker('b'):
+                    self.client.get('/djangoapp/get_dealers/Texas')
+                with as_worker('a'):
+                    self.dealer.city = "Austin"
+                    self.dealer.save()
+                with as_worker('b'):
+                    data = json.loads(
+                        self.client.get('/djangoapp/get_dealers/Texas')
+                        .content)
+        self.assertEqual(data['dealers'][0]['city'], "Austin")
+
+    def test_concurrent_misses_build_once(self):
+        """Test a burst of misses for one key runs the builder once"""
+        calls = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.05)
+            return b"payload"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    get_or_build('djangoapp:test:stampede', builder)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b"payload"] * 10)
+
+
+class CursorPaginationTestCase(TestCase):
+    """Test keyset pagination on the dealer and review list endpoints"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.dealers = [
+            Dealer.objects.create(
+                full_name=f"Dealer {i}", city="Austin", state="Texas",
+                address=f"{i} Main St", zip="73301"
+            )
+            for i in range(5)
+        ]
+        self.dealer = self.dealers[0]
+        for i in range(7):
+            Review.objects.create(
+                dealer=self.dealer, name=f"Reviewer {i}",
+                review="Great service", sentiment="positive"
+            )
+
+    def collect_pages(self, url, key, limit):
+        ids, cursor, pages = [], None, 0
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            data = json.loads(self.client.get(url, params).content)
+            ids.extend(item['id'] for item in data[key])
+            pages += 1
+            cursor = data['next']
+            if cursor is None:
+                return ids, pages
+
+    def test_dealer_pages_cover_all_rows_in_order(self):
+        """Test following next cursors returns every dealer once, in order"""
+        ids, pages = self.collect_pages('/djangoapp/get_dealers/Texas',
+                                        'dealers', 2)
+        self.assertEqual(ids, sorted(d.id for d in self.dealers))
+        self.assertEqual(pages, 3)
+
+    def test_review_pages_cover_all_rows_in_order(self):
+        """Test following next cursors returns every review once, in order"""
+        url = f'/djangoapp/reviews/dealer/{self.dealer.id}'
+        ids, pages = self.collect_pages(url, 'reviews', 3)
+        expected = list(Review.objects.filter(dealer=self.dealer)
+                        .order_by('id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_queries_do_not_use_offset(self):
+        """Test deep pages are fetched with a keyset range, not OFFSET"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        url = f'/djangoapp/reviews/dealer/{self.dealer.id}'
+        first = json.loads(self.client.get(url, {'limit': 3}).content)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'limit': 3, 'cursor': first['next']})
+        for query in ctx.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_unpaginated_response_is_unchanged(self):
+        """Test the envelope has no next key without limit/cursor"""
+        data = json.loads(self.client.get(
+            f'/djangoapp/reviews/dealer/{self.dealer.id}').content)
+        self.assertNotIn('next', data)
+        self.assertEqual(len(data['reviews']), 7)
+
+    def test_invalid_cursor_is_rejected(self):
+        """Test malformed paging parameters return 400"""
+        url = f'/djangoapp/reviews/dealer/{self.dealer.id}'
+        for params in ({'cursor': 'not-a-cursor'}, {'limit': 'x'},
+                       {'limit': 0}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+
+
+class StreamingResponseTestCase(TestCase):
+    """Test the ?stream=1 mode of the dealer and review list endpoints"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.dealer = Dealer.objects.create(
+            full_name="Holdlamis Car Dealership", city="El Paso",
+            state="Texas", address="3 Nova Court", zip="88563"
+        )
+        Review.objects.bulk_create([
+            Review(dealer=self.dealer, name=f"Reviewer {i}",
+                   review=f"Review number {i}", purchase=bool(i % 2),
+                   sentiment="neutral")
+            for i in range(25)
+        ])
+
+    def test_streamed_reviews_match_buffered_response(self):
+        """Test the streamed body decodes to the same envelope"""
+        url = f'/djangoapp/reviews/dealer/{self.dealer.id}'
+        buffered = json.loads(self.client.get(url).content)
+        response = self.client.get(url, {'stream': '1'})
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(streamed, buffered)
+        self.assertEqual(len(streamed['reviews']), 25)
+
+    def test_streamed_dealers_match_buffered_response(self):
+        """Test streaming also works for the dealer list"""
+        buffered = json.loads(self.client.get('/djangoapp/get_dealers/')
+                              .content)
+        response = self.client.get('/djangoapp/get_dealers/',
+                                   {'stream': 'true'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)),
+                         buffered)
+
+    def test_stream_envelope_handles_empty_and_large_lists(self):
+        """Test the encoder emits valid JSON and flushes in several chunks"""
+        self.assertEqual(json.loads(''.join(stream_envelope('reviews', []))),
+                         {"status": 200, "reviews": []})
+        items = ({"id": i, "review": "x" * 1000} for i in range(200))
+        chunks = list(stream_envelope('reviews', items))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(len(json.loads(''.join(chunks))['reviews']), 200)
+
+
+class ProjectionSerializationTestCase(TestCase):
+    """Test the values()-based read paths of the djangoapp views"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.dealer = Dealer.objects.create(
+            full_name="Temp Car Dealership", city="Minneapolis",
+            state="Minnesota", address="6337 Butternut Crossing",
+            zip="55402", short_name=""
+        )
+        self.review = Review.objects.create(
+            dealer=self.dealer, name="Berkly Shepley",
+            review="Total grid-enabled service-desk", purchase=True,
+            purchase_date="2020-07-11", car_make="Audi", car_model="A6",
+            car_year=2010, sentiment="positive"
+        )
+
+    def test_dealer_reviews_use_one_query(self):
+        """Test reviews of a dealer are fetched in a single query"""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'/djangoapp/reviews/dealer/{self.dealer.id}')
+        data = json.loads(response.content)
+        self.assertEqual(data['reviews'], [{
+            "id": self.review.id,
+            "name": "Berkly Shepley",
+            "review": "Total grid-enabled service-desk",
+            "purchase": True,
+            "purchase_date": "2020-07-11",
+            "car_make": "Audi",
+            "car_model": "A6",
+            "car_year": 2010,
+            "sentiment": "positive"
+        }])
+
+    def test_dealer_without_reviews_returns_empty_list(self):
+        """Test a known dealer with no reviews is not sent to the fallback"""
+        other = Dealer.objects.create(
+            full_name="Empty Dealership", city="Austin", state="Texas",
+            address="1 Main St", zip="73301"
+        )
+        data = json.loads(self.client.get(
+            f'/djangoapp/reviews/dealer/{other.id}').content)
+        self.assertEqual(data, {"status": 200, "reviews": []})
+
+    def test_short_name_falls_back_to_full_name_in_sql(self):
+        """Test empty and NULL short names fall back to the full name"""
+        Dealer.objects.create(
+            full_name="Null Short Name Dealership", city="Austin",
+            state="Texas", address="1 Main St", zip="73301"
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/djangoapp/dealer/{self.dealer.id}')
+        dealer = json.loads(response.content)['dealer']
+        self.assertEqual(dealer['short_name'], "Temp Car Dealership")
+
+        dealers = json.loads(self.client.get('/djangoapp/get_dealers/Texas')
+                             .content)['dealers']
+        self.assertEqual(dealers[0]['short_name'],
+                         "Null Short Name Dealership")
+
+    def test_get_cars_returns_make_model_pairs(self):
+        """Test the car projection maps to the CarModels schema"""
+        make = CarMake.objects.create(name="Kia", description="Korean")
+        CarModel.objects.create(car_make=make, dealer_id=1, name="Sorrento")
+        data = json.loads(self.client.get('/djangoapp/get_cars').content)
+        self.assertEqual(data['CarModels'],
+                         [{"CarModel": "Sorrento", "CarMake": "Kia"}])
+
+
+class QueryPlanTestCase(TestCase):
+    """Test the hot lookup paths are served by indexes, not table scans.
+
+    Runs on SQLite by default; the PostgreSQL variant runs when the suite is
+    started with --settings=djangoproj.production_settings and DATABASE_URL.
+    """
+
+    def hot_queries(self):
+        return {
+            'dealers_by_state': serializers.DEALER.apply(
+                Dealer.objects.filter(state="Texas")).order_by('id'),
+            'dealer_reviews': serializers.REVIEW.apply(
+                Review.objects.filter(dealer_id=1)).order_by('id'),
+            'dealer_reviews_page': serializers.REVIEW.apply(
+                Review.objects.filter(dealer_id=1, id__gt=10)
+            ).order_by('id')[:51],
+            'dealer_sentiment': Review.objects.filter(
+                dealer_id=1, sentiment="positive").values('id'),
+            'dealer_cars': CarModel.objects.filter(dealer_id=1).values('id'),
+        }
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite query plans")
+    def test_sqlite_plans_use_indexes(self):
+        """Test SQLite searches an index and does not sort in a temp table"""
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                self.assertIn("USING", plan)
+                self.assertNotIn("SCAN djangoapp_", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    @skipUnless(connection.vendor == 'postgresql', "PostgreSQL query plans")
+    def test_postgresql_plans_use_indexes(self):
+        """Test PostgreSQL can answer every hot query from an index"""
+        with connection.cursor() as cursor:
+            # Empty test tables always favour a seq scan; forbid it to check
+            # that a usable index exists.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                self.assertIn("Index", plan)
+                self.assertNotIn("Seq Scan", plan)
+
+
+class _StubServiceHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 handler that records client connections and requests"""
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        self.server.connections += 1
+        super().handle()
+
+    def respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self.server.requests.append((self.command, self.path))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = b'{"sentiment": "positive"}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = respond
+    do_POST = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledHTTPClientTestCase(TestCase):
+    """Test the shared keep-alive clients used by restapis"""
+
+    def setUp(self):
+        restapis.sentiment_cache.clear()
+        reset_breakers()
+        get_cache().clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                          _StubServiceHandler)
+        self.server.connections = 0
+        self.server.requests = []
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        host, port = self.server.server_address
+        self.client = ServiceClient(f"http://{host}:{port}/",
+                                    backoff_factor=0)
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        """Test consecutive calls share one keep-alive connection"""
+        for _ in range(5):
+            self.assertEqual(self.client.get("analyze/great").status_code,
+                             200)
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_idempotent_calls_are_retried(self):
+        """Test GETs are retried on 503 while POSTs are not"""
+        self.server.statuses = [503, 200]
+        self.assertEqual(self.client.get("analyze/great").status_code, 200)
+        self.assertEqual(len(self.server.requests), 2)
+
+        self.server.statuses = [503, 200]
+        self.assertEqual(self.client.post("insert_review", json={})
+                         .status_code, 503)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_backoff_is_jittered_and_bounded(self):
+        """Test the retry sleep stays between zero and the full backoff"""
+        retry = JitteredRetry(total=5, backoff_factor=1)
+        for _ in range(3):
+            retry = retry.increment(method='GET', url='/')
+        full = Retry.get_backoff_time(retry)
+        self.assertGreater(full, 0)
+        for _ in range(20):
+            self.assertTrue(0 <= retry.get_backoff_time() <= full)
+
+    def test_restapis_pass_configured_timeouts(self):
+        """Test restapis calls go through the pooled clients with timeouts"""
+        response = mock.Mock(status_code=200, text='[]')
+        response.json.return_value = {"sentiment": "positive"}
+        with mock.patch.object(restapis.dealer_client.session, 'get',
+                               return_value=response) as get:
+            restapis.get_request("/fetchDealers")
+        self.assertEqual(get.call_args.kwargs['timeout'],
+                         restapis.dealer_client.timeout)
+        with mock.patch.object(restapis.sentiment_client.session, 'get',
+                               return_value=response) as get:
+            self.assertEqual(restapis.analyze_review_sentiments("great"),
+                             {"sentiment": "positive"})
+        self.assertEqual(get.call_args.kwargs['timeout'],
+                         restapis.sentiment_client.timeout)
+
+
+class BatchSentimentTestCase(TestCase):
+    """Test batched sentiment analysis for the remote review fallback"""
+
+    def setUp(self):
+        get_cache().clear()
+        restapis.sentiment_cache.clear()
+        reset_breakers()
+
+    def batch_response(self, *args, **kwargs):
+        texts = kwargs['json']
+        response = mock.Mock(status_code=200)
+        response.json.return_value = [
+            {"sentiment": "positive" if "great" in text else "negative"}
+            for text in texts
+        ]
+        return response
+
+    def test_large_lists_are_chunked(self):
+        """Test texts are sent in chunks and results keep input order"""
+        texts = [f"great car {i}" if i % 2 else f"bad car {i}"
+                 for i in range(250)]
+        with mock.patch.object(restapis.sentiment_client.session, 'post',
+                               side_effect=self.batch_response) as post:
+            results = restapis.analyze_review_sentiments_batch(
+                texts, chunk_size=100)
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual([len(c.kwargs['json']) for c in post.call_args_list],
+                         [100, 100, 50])
+        self.assertEqual(len(results), 250)
+        self.assertEqual(results[1], {"sentiment": "positive"})
+        self.assertEqual(results[248], {"sentiment": "negative"})
+
+    def test_missing_texts_do_not_fail_the_batch(self):
+        """Test reviews without text are neutral and are not sent"""
+        with mock.patch.object(restapis.sentiment_client.session, 'post',
+                               side_effect=self.batch_response) as post:
+            results = restapis.analyze_review_sentiments_batch(
+                [None, "great car", 7, "   "])
+        self.assertEqual(post.call_args.kwargs['json'], ["great car"])
+        self.assertEqual([r["sentiment"] for r in results],
+                         ["neutral", "positive", "neutral", "neutral"])
+
+    def test_blank_text_is_neutral_without_a_call(self):
+        """Test a single blank review is not sent to the service"""
+        with mock.patch.object(restapis.sentiment_client.session,
+                               'get') as get:
+            self.assertEqual(restapis.analyze_review_sentiments(""),
+                             {"sentiment": "neutral"})
+        get.assert_not_called()
+
+    def test_failed_chunk_falls_back_to_neutral(self):
+        """Test a failing service yields neutral sentiments"""
+        with mock.patch.object(restapis.sentiment_client.session, 'post',
+                               side_effect=ConnectionError("down")):
+            results = restapis.analyze_review_sentiments_batch(["a", "b"])
+        self.assertEqual(results, [{"sentiment": "neutral"}] * 2)
+
+    def test_strict_mode_raises_instead_of_neutral(self):
+        """Test strict callers see failures so they can retry"""
+        with mock.patch.object(restapis.sentiment_client.session, 'post',
+                               side_effect=ConnectionError("down")):
+            with self.assertRaises(restapis.SentimentServiceError):
+                restapis.analyze_review_sentiments_batch(["a", "b"],
+                                                         strict=True)
+
+    def test_remote_fallback_uses_one_batch_call(self):
+        """Test unknown dealers classify remote reviews in one round trip"""
+        remote = {"status_code": 200, "message": [
+            {"id": 1, "review": "great service"},
+            {"id": 2, "review": "rude staff"},
+        ]}
+        with mock.patch('djangoapp.views.cached_get_request',
+                        return_value=remote), \
+                mock.patch.object(restapis.sentiment_client.session, 'post',
+                                  side_effect=self.batch_response) as post, \
+                mock.patch.object(restapis.sentiment_client.session,
+                                  'get') as get:
+            response = self.client.get('/djangoapp/reviews/dealer/999')
+        data = json.loads(response.content)
+        self.assertEqual(post.call_count, 1)
+        get.assert_not_called()
+        self.assertEqual([r['sentiment'] for r in data['reviews']],
+                         ["positive", "negative"])
+
+
+class SentimentCacheTestCase(TestCase):
+    """Test the two-tier sentiment result cache"""
+
+    def setUp(self):
+        get_cache().clear()
+        restapis.sentiment_cache.clear()
+        reset_breakers()
+        self.response = mock.Mock(status_code=200)
+        self.response.json.return_value = {"sentiment": "positive"}
+
+    def test_repeated_text_skips_the_service(self):
+        """Test a text is only sent to the analyzer once"""
+        with mock.patch.object(restapis.sentiment_client.session, 'get',
+                               return_value=self.response) as get:
+            for _ in range(3):
+                self.assertEqual(
+                    restapis.analyze_review_sentiments("great car"),
+                    {"sentiment": "positive"})
+        self.assertEqual(get.call_count, 1)
+        stats = restapis.sentiment_cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["l1_hits"], 2)
+
+    def test_shared_tier_serves_other_workers(self):
+        """Test a cold in-process tier is refilled from the Django cache"""
+        restapis.sentiment_cache.set("great car", "positive")
+        # Simulate another worker: empty local LRU, same shared cache
+        restapis.sentiment_cache.local.clear()
+        with mock.patch.object(restapis.sentiment_client.session,
+                               'get') as get:
+            result = restapis.analyze_review_sentiments("great car")
+        get.assert_not_called()
+        self.assertEqual(result, {"sentiment": "positive"})
+        self.assertEqual(restapis.sentiment_cache.stats()["l2_hits"], 1)
+
+    def test_fallbacks_are_not_cached(self):
+        """Test the neutral fallback of a failed call is not remembered"""
+        with mock.patch.object(restapis.sentiment_client.session, 'get',
+                               side_effect=ConnectionError("down")):
+            restapis.analyze_review_sentiments("great car")
+        self.assertIsNone(restapis.sentiment_cache.get("great car"))
+
+    def test_model_version_is_part_of_the_key(self):
+        """Test changing the version tag misses earlier results"""
+        from .sentiment_cache import SentimentCache
+        old = SentimentCache(version="vader-1")
+        new = SentimentCache(version="vader-2")
+        old.set("great car", "positive")
+        self.assertNotEqual(old.key("great car"), new.key("great car"))
+        self.assertIsNone(new.get("great car"))
+
+    def test_batch_only_sends_unknown_texts(self):
+        """Test batches skip cached and duplicate texts"""
+        restapis.sentiment_cache.set("great car", "positive")
+
+        def reply(*args, **kwargs):
+            response = mock.Mock(status_code=200)
+            response.json.return_value = [{"sentiment": "negative"}
+                                          for _ in kwargs['json']]
+            return response
+
+        with mock.patch.object(restapis.sentiment_client.session, 'post',
+                               side_effect=reply) as post:
+            results = restapis.analyze_review_sentiments_batch(
+                ["great car", "bad car", "bad car"])
+        self.assertEqual(post.call_args.kwargs['json'], ["bad car"])
+        self.assertEqual([r["sentiment"] for r in results],
+                         ["positive", "negative", "negative"])
+
+    def test_lru_is_bounded(self):
+        """Test the in-process tier evicts the least recently used entry"""
+        from .sentiment_cache import LRUCache
+        lru = LRUCache(2)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), 1)
+
+
+@skipUnless(importlib.util.find_spec('nltk'), "nltk is not installed")
+class LocalSentimentEngineTestCase(TestCase):
+    """Test the in-process sentiment engine mode of restapis"""
+
+    def setUp(self):
+        get_cache().clear()
+        restapis.sentiment_cache.clear()
+        reset_breakers()
+        patcher = mock.patch.object(restapis, 'sentiment_engine', 'local')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_text_is_classified_in_process(self):
+        """Test local mode makes no HTTP call"""
+        with mock.patch.object(restapis.sentiment_client.session,
+                               'get') as get:
+            self.assertEqual(
+                restapis.analyze_review_sentiments("I love this car"),
+                {"sentiment": "positive"})
+            self.assertEqual(
+                restapis.analyze_review_sentiments("Terrible, awful service"),
+                {"sentiment": "negative"})
+        get.assert_not_called()
+
+    def test_batch_is_classified_in_process(self):
+        """Test local mode also covers the batched call"""
+        with mock.patch.object(restapis.sentiment_client.session,
+                               'post') as post:
+            results = restapis.analyze_review_sentiments_batch(
+                ["I love this car", "The car is blue"])
+        post.assert_not_called()
+        self.assertEqual([r["sentiment"] for r in results],
+                         ["positive", "neutral"])
+
+    def test_matches_service_decision_rule(self):
+        """Test local labels follow the service's pos/neg/neu rule"""
+        from .microservices import scoring
+        analyzer = scoring.get_analyzer()
+        for text in ["Great cars and friendly staff", "Rude and slow",
+                     "Total grid-enabled service-desk", "not bad at all"]:
+            with self.subTest(text=text):
+                scores = analyzer.polarity_scores(text)
+                expected = "positive"
+                if scores['neg'] > scores['pos'] and \
+                        scores['neg'] > scores['neu']:
+                    expected = "negative"
+                elif scores['neu'] > scores['neg'] and \
+                        scores['neu'] > scores['pos']:
+                    expected = "neutral"
+                self.assertEqual(
+                    restapis.analyze_review_sentiments(text)["sentiment"],
+                    expected)
+
+    def test_prebuilt_lexicon_artifact(self):
+        """Test the lexicon artifact loads and stale ones are ignored"""
+        import os
+        import pickle
+        import tempfile
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        from .microservices import scoring
+        scoring._analyzer_from_source()  # puts the shipped zip on the path
+        lexicon = SentimentIntensityAnalyzer().lexicon
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'vader_lexicon.pickle')
+
+            def write(digest, fmt=scoring.ARTIFACT_FORMAT):
+                with open(path, 'wb') as artifact:
+                    pickle.dump({'format': fmt, 'source_sha256': digest,
+                                 'lexicon': lexicon}, artifact)
+
+            write(scoring.source_digest())
+            self.assertEqual(scoring.load_lexicon_artifact(path), lexicon)
+            analyzer = scoring._analyzer_from_lexicon(
+                scoring.load_lexicon_artifact(path))
+            self.assertIsInstance(analyzer, SentimentIntensityAnalyzer)
+            self.assertIs(analyzer.make_lex_dict(), analyzer.lexicon)
+            self.assertEqual(
+                analyzer.polarity_scores("Not bad at all"),
+                SentimentIntensityAnalyzer().polarity_scores("Not bad at all"))
+            write("stale")
+            self.assertIsNone(scoring.load_lexicon_artifact(path))
+            write(scoring.source_digest(), fmt=0)
+            self.assertIsNone(scoring.load_lexicon_artifact(path))
+        self.assertIsNone(scoring.load_lexicon_artifact(path))
+
+
+@skipUnless(importlib.util.find_spec('nltk')
+            and importlib.util.find_spec('flask')
+            and importlib.util.find_spec('numpy'),
+            "the sentiment service's requirements are not installed")
+class SentimentServiceTestCase(TestCase):
+    """Test the Flask sentiment microservice"""
+
+    def setUp(self):
+        self.app = import_service_module('app')
+        self.client = self.app.app.test_client()
+
+    def test_gunicorn_limits_are_explicit(self):
+        """Test the gunicorn config bounds queued and concurrent requests"""
+        path = settings.BASE_DIR / 'djangoapp' / 'microservices' / \
+            'gunicorn.conf.py'
+        with mock.patch.dict(os.environ, {'GUNICORN_THREADS': '4'}):
+            os.environ.pop('MAX_CONCURRENT_REQUESTS', None)
+            config = runpy.run_path(str(path))
+            self.assertEqual(os.environ['MAX_CONCURRENT_REQUESTS'], '4')
+        self.assertEqual(config['backlog'], 64)
+        self.assertEqual(config['worker_connections'], 16)
+
+    def test_batch_tolerates_missing_texts(self):
+        """Test null, non-string and blank texts are labelled neutral"""
+        texts = [None, "I love this car", 42, "Terrible, awful service",
+                 "   "]
+        response = self.client.post('/analyze/batch', json=texts)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["sentiment"] for r in response.get_json()],
+                         ["neutral", self.app.classify("I love this car"),
+                          "neutral",
+                          self.app.classify("Terrible, awful service"),
+                          "neutral"])
+        self.assertEqual(self.app.classify(""), "neutral")
+        self.assertEqual(self.client.post('/analyze/batch',
+                                          json={"texts": "x"}).status_code,
+                         400)
+
+    def test_full_worker_answers_503(self):
+        """Test a request finding every slot taken is turned away"""
+        slots = threading.BoundedSemaphore(1)
+        with mock.patch.multiple(self.app, _slots=slots,
+                                 MAX_CONCURRENT_REQUESTS=1,
+                                 MAX_QUEUE_WAIT=0.01):
+            self.assertEqual(self.client.get('/').status_code, 200)
+            slots.acquire()  # one request in flight
+            response = self.client.get('/')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '1')
+            slots.release()
+            self.assertEqual(self.client.get('/').status_code, 200)
+
+
+class SentimentJobTestCase(TestCase):
+    """Test asynchronous sentiment analysis of new reviews"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='reviewer',
+                                             password='testpass123')
+        self.dealer = Dealer.objects.create(
+            full_name="Queue Motors", city="Austin", state="Texas",
+            address="1 Main St", zip="73301")
+        patcher = mock.patch.object(sentiment_jobs,
+                                    'analyze_review_sentiments_batch')
+        self.analyze = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_review(self, text):
+        self.client.force_login(self.user)
+        return self.client.post(
+            '/djangoapp/add_review',
+            json.dumps({"dealership": self.dealer.id, "review": text}),
+            content_type='application/json')
+
+    def test_add_review_does_not_wait_for_sentiment(self):
+        """Test the review is saved as pending with a queued job"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.add_review("Great service")
+        self.assertEqual(json.loads(response.content)["status"], 200)
+        self.analyze.assert_not_called()
+        review = Review.objects.get(dealer=self.dealer)
+        self.assertEqual(review.sentiment, "pending")
+        self.assertEqual(review.sentiment_job.status, SentimentJob.PENDING)
+
+    def test_worker_labels_reviews_in_one_batch(self):
+        """Test one batched call labels every claimed review"""
+        self.add_review("Great service")
+        self.add_review("Awful service")
+        self.analyze.return_value = [{"sentiment": "positive"},
+                                     {"sentiment": "negative"}]
+        self.assertEqual(sentiment_jobs.drain(), 2)
+        self.analyze.assert_called_once_with(
+            ["Great service", "Awful service"], strict=True)
+        self.assertEqual(
+            list(Review.objects.order_by('id')
+                 .values_list('sentiment', flat=True)),
+            ["positive", "negative"])
+        self.assertFalse(SentimentJob.objects.exists())
+
+    def test_failed_batch_is_retried_with_backoff(self):
+        """Test a failure schedules a later retry"""
+        self.add_review("Great service")
+        self.analyze.side_effect = restapis.SentimentServiceError("down")
+        self.assertEqual(sentiment_jobs.run_once(), 1)
+        job = SentimentJob.objects.get()
+        self.assertEqual(job.status, SentimentJob.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, "down")
+        self.assertEqual(job.locked_by, "")
+        # Not due again until the backoff has passed
+        self.assertEqual(sentiment_jobs.run_once(), 0)
+        self.assertEqual(Review.objects.get().sentiment, "pending")
+
+    def test_exhausted_job_is_dead_lettered_and_requeued(self):
+        """Test dead jobs fall back to neutral and can be requeued"""
+        self.add_review("Great service")
+        self.analyze.side_effect = restapis.SentimentServiceError("down")
+        with self.settings(SENTIMENT_JOB_MAX_ATTEMPTS=2,
+                           SENTIMENT_JOB_RETRY_DELAY=0):
+            self.assertEqual(sentiment_jobs.drain(), 2)
+        self.assertEqual(SentimentJob.objects.get().status,
+                         SentimentJob.DEAD)
+        self.assertEqual(Review.objects.get().sentiment, "neutral")
+        self.assertEqual(sentiment_jobs.backlog()["dead"], 1)
+
+        self.assertEqual(sentiment_jobs.requeue_dead(), 1)
+        self.analyze.side_effect = None
+        self.analyze.return_value = [{"sentiment": "positive"}]
+        sentiment_jobs.drain()
+        self.assertEqual(Review.objects.get().sentiment, "positive")
+        self.assertFalse(SentimentJob.objects.exists())
+
+    def test_claims_do_not_overlap(self):
+        """Test a claimed job is not claimed again until its lease lapses"""
+        self.add_review("Great service")
+        first = sentiment_jobs.claim_batch()
+        self.assertEqual(len(first), 1)
+        self.assertEqual(sentiment_jobs.claim_batch(), [])
+        SentimentJob.objects.update(
+            locked_until=first[0].locked_until - timedelta(days=1))
+        second = sentiment_jobs.claim_batch()
+        self.assertEqual([job.id for job in second], [first[0].id])
+        self.assertNotEqual(second[0].locked_by, first[0].locked_by)
+        self.assertEqual(second[0].attempts, 2)
+
+    def test_backlog_endpoint(self):
+        """Test the backlog endpoint reports queued jobs to staff only"""
+        self.add_review("Great service")
+        response = self.client.get('/djangoapp/sentiment/backlog')
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        data = json.loads(
+            self.client.get('/djangoapp/sentiment/backlog').content)
+        self.assertEqual(data["backlog"]["pending"], 1)
+        self.assertEqual(data["backlog"]["due"], 1)
+        self.assertIsNotNone(data["backlog"]["oldest_age_seconds"])
+
+
+class SeedDataTestCase(TestCase):
+    """Test the load_seed_data bulk loader"""
+
+    data_dir = settings.BASE_DIR / 'database' / 'data'
+
+    def load(self, *args):
+        out = io.StringIO()
+        call_command('load_seed_data', *args, stdout=out)
+        return out.getvalue()
+
+    def test_loads_all_datasets(self):
+        """Test dealers, reviews and cars are loaded with rows/sec"""
+        output = self.load('--batch-size', '7')
+        with open(self.data_dir / 'dealerships.json') as source:
+            dealers = json.load(source)['dealerships']
+        self.assertEqual(Dealer.objects.count(), len(dealers))
+        self.assertEqual(Review.objects.count(), 50)
+        self.assertTrue(CarModel.objects.filter(type='TRUCK').exists())
+        self.assertIn("rows/s", output)
+        review = Review.objects.get(id=1)
+        self.assertEqual(review.purchase_date, date(2020, 7, 11))
+        self.assertEqual(review.dealer_id, 15)
+        # bulk_create skips signals; the loader recounts dealer stats
+        self.assertEqual(DealerStats.objects.get(dealer_id=15).review_count,
+                         Review.objects.filter(dealer_id=15).count())
+
+    def test_rerun_upserts(self):
+        """Test loading twice updates rows instead of duplicating them"""
+        self.load()
+        Dealer.objects.filter(id=1).update(full_name="Renamed")
+        Review.objects.filter(id=1).update(sentiment="positive")
+        counts = (Dealer.objects.count(), Review.objects.count(),
+                  CarMake.objects.count(), CarModel.objects.count())
+        self.load()
+        self.assertEqual((Dealer.objects.count(), Review.objects.count(),
+                          CarMake.objects.count(), CarModel.objects.count()),
+                         counts)
+        self.assertEqual(Dealer.objects.get(id=1).full_name,
+                         "Holdlamis Car Dealership")
+        # Computed sentiment survives a reload
+        self.assertEqual(Review.objects.get(id=1).sentiment, "positive")
+
+    def test_orm_inserts_after_load(self):
+        """Test new rows get fresh ids after ids were loaded explicitly"""
+        self.load('--only', 'dealers', '--only', 'reviews')
+        dealer = Dealer.objects.create(
+            full_name="New Motors", city="Austin", state="Texas",
+            address="1 Main St", zip="73301")
+        review = Review.objects.create(dealer=dealer, name="New",
+                                       review="Great")
+        self.assertGreater(review.id, 50)
+        self.assertEqual(Review.objects.count(), 51)
+
+    def test_reviews_of_unknown_dealers_are_skipped(self):
+        """Test reviews without their dealer are reported, not inserted"""
+        output = self.load('--only', 'reviews')
+        self.assertEqual(Review.objects.count(), 0)
+        self.assertIn("50 skipped", output)
+
+    def test_stream_matches_json_load(self):
+        """Test the streaming reader across tiny read buffers"""
+        path = self.data_dir / 'car_records.json'
+        with open(path) as source:
+            expected = json.load(source)['cars']
+        with mock.patch.object(seed, 'READ_SIZE', 7):
+            self.assertEqual(list(seed.iter_json_array(path, 'cars')),
+                             expected)
+
+    def test_parse_date(self):
+        """Test MM/DD/YYYY conversion and bad values"""
+        self.assertEqual(seed.parse_date("09/17/2020"),
+                         date(2020, 9, 17))
+        self.assertIsNone(seed.parse_date(""))
+        self.assertIsNone(seed.parse_date("2020-09-17"))
+
+
+class CatalogSeedingTestCase(TransactionTestCase):
+    """Test catalog seeding is idempotent and out of the request path"""
+
+    def run_in_parallel(self, target, count=8):
+        barrier = threading.Barrier(count)
+        results = []
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                results.append(target())
+            except Exception as err:
+                errors.append(err)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_get_cars_is_one_query(self):
+        """Test get_cars issues exactly one query and never seeds"""
+        with self.assertNumQueries(1):
+            response = Client().get('/djangoapp/get_cars')
+        self.assertEqual(json.loads(response.content), {"CarModels": []})
+        self.assertFalse(CarMake.objects.exists())
+
+    def test_parallel_first_requests(self):
+        """Test parallel first requests neither seed nor fail"""
+        statuses = self.run_in_parallel(
+            lambda: Client().get('/djangoapp/get_cars').status_code)
+        self.assertEqual(statuses, [200] * 8)
+        self.assertFalse(CarMake.objects.exists())
+
+    def test_parallel_seeding_runs_once(self):
+        """Test concurrent seeders create the catalog exactly once"""
+        from .populate import seed_catalog
+        seeded = self.run_in_parallel(seed_catalog)
+        self.assertEqual(seeded.count(True), 1)
+        self.assertEqual(CarMake.objects.count(), 5)
+        self.assertEqual(CarModel.objects.count(), 15)
+
+        out = io.StringIO()
+        call_command('populate_db', stdout=out)
+        self.assertIn("nothing to do", out.getvalue())
+        self.assertEqual(CarMake.objects.count(), 5)
+
+
+class ConditionalGetTestCase(TestCase):
+    """Test ETag / Last-Modified revalidation of the read endpoints"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.dealer = Dealer.objects.create(
+            full_name="Etag Motors", city="Austin", state="Texas",
+            address="1 Main St", zip="73301")
+        Review.objects.create(dealer=self.dealer, name="A", review="Fine")
+        make = CarMake.objects.create(name="Kia", description="Korean")
+        CarModel.objects.create(car_make=make, dealer_id=self.dealer.id,
+                                name="Soul", type="SUV", year=2023)
+        self.urls = [
+            '/djangoapp/get_dealers/',
+            '/djangoapp/get_dealers/Texas',
+            f'/djangoapp/dealer/{self.dealer.id}',
+            f'/djangoapp/reviews/dealer/{self.dealer.id}',
+            '/djangoapp/get_cars',
+        ]
+
+    def test_304_runs_no_queries(self):
+        """Test a matching If-None-Match is answered without the ORM"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertIn('no-cache', first['Cache-Control'])
+                with self.assertNumQueries(0):
+                    second = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second.content, b'')
+                with self.assertNumQueries(0):
+                    third = self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+                self.assertEqual(third.status_code, 304)
+
+    def test_writes_change_only_affected_etags(self):
+        """Test a write invalidates the endpoints that read that table"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Review.objects.create(dealer=self.dealer, name="B", review="Good")
+        changed = {url for url in self.urls
+                   if self.client.get(url)['ETag'] != etags[url]}
+        # Dealer details embed the dealer's review aggregates
+        self.assertEqual(
+            changed, {f'/djangoapp/reviews/dealer/{self.dealer.id}',
+                      f'/djangoapp/dealer/{self.dealer.id}'})
+
+        response = self.client.get(
+            '/djangoapp/get_cars',
+            HTTP_IF_NONE_MATCH=etags['/djangoapp/get_cars'])
+        self.assertEqual(response.status_code, 304)
+        self.dealer.save()
+        response = self.client.get(
+            '/djangoapp/get_dealers/',
+            HTTP_IF_NONE_MATCH=etags['/djangoapp/get_dealers/'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_validators_with_per_process_generations(self):
+        """Test a LocMemCache for the counters turns validation off"""
+        etag = self.client.get(self.urls[0])['ETag']
+        with override_settings(CACHES=dict(settings.CACHES, generations={
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'generations'})):
+            response = self.client.get(self.urls[0],
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_remote_fallback_is_not_validated(self):
+        """Test remote-service data gets no ETag"""
+        with mock.patch('djangoapp.views.cached_get_request',
+                        return_value={"status_code": 200, "message": {}}):
+            response = self.client.get('/djangoapp/dealer/9999')
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+class RemoteReadThroughCacheTestCase(TestCase):
+    """Test the stale-while-revalidate cache around get_request"""
+
+    endpoint = '/fetchDealer/7'
+
+    def setUp(self):
+        get_cache().clear()
+        self.responses = [{"status_code": 200, "message": {"id": 7}}]
+        patcher = mock.patch.object(restapis, 'get_request',
+                                    side_effect=self.fetch)
+        self.get_request = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Run background refreshes inline, but record them
+        patcher = mock.patch.object(
+            restapis.remote_refresh_executor, 'submit',
+            side_effect=lambda fn, *args: fn(*args))
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, endpoint, **kwargs):
+        return self.responses[0]
+
+    def age_entry(self, seconds):
+        key = restapis._remote_key(self.endpoint, {})
+        entry = get_cache().get(key)
+        entry["fetched_at"] -= seconds
+        get_cache().set(key, entry)
+
+    def test_fresh_entries_are_served_from_cache(self):
+        """Test the service is called once within the TTL"""
+        first = restapis.cached_get_request(self.endpoint)
+        second = restapis.cached_get_request(self.endpoint)
+        self.assertEqual(first, second)
+        self.assertEqual(self.get_request.call_count, 1)
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        """Test stale data is returned and refreshed in the background"""
+        restapis.cached_get_request(self.endpoint)
+        self.age_entry(301)
+        self.responses[0] = {"status_code": 200, "message": {"id": 8}}
+        with mock.patch.object(restapis.remote_refresh_executor,
+                               'submit') as submit:
+            stale = restapis.cached_get_request(self.endpoint)
+            again = restapis.cached_get_request(self.endpoint)
+        self.assertEqual(stale["message"], {"id": 7})
+        self.assertEqual(again["message"], {"id": 7})
+        # Only one refresh is scheduled while its lock is held
+        self.assertEqual(submit.call_count, 1)
+        submit.call_args[0][0](*submit.call_args[0][1:])
+        self.assertEqual(
+            restapis.cached_get_request(self.endpoint)["message"], {"id": 8})
+
+    def test_stale_if_error(self):
+        """Test an old entry is served when the service is down"""
+        restapis.cached_get_request(self.endpoint)
+        self.age_entry(3600)
+        self.responses[0] = {"status_code": 500, "message": {}}
+        result = restapis.cached_get_request(self.endpoint)
+        self.assertEqual(result["message"], {"id": 7})
+        self.assertEqual(self.get_request.call_count, 2)
+
+        self.age_entry(2 * 24 * 3600)
+        self.assertEqual(
+            restapis.cached_get_request(self.endpoint)["status_code"], 500)
+
+    def test_failures_are_not_cached(self):
+        """Test an error response is fetched again next time"""
+        self.responses[0] = {"status_code": 500, "message": {}}
+        restapis.cached_get_request(self.endpoint)
+        restapis.cached_get_request(self.endpoint)
+        self.assertEqual(self.get_request.call_count, 2)
+
+    def test_per_endpoint_ttls(self):
+        """Test the longest matching endpoint prefix picks the TTL"""
+        self.assertEqual(restapis._remote_ttl('/fetchDealers/Texas'), 300)
+        self.assertEqual(restapis._remote_ttl('/fetchReviews/dealer/3'), 60)
+        self.assertIsNone(restapis._remote_ttl('/insert_review'))
+
+
+class CircuitBreakerTestCase(TestCase):
+    """Test the per-backend circuit breakers"""
+
+    def setUp(self):
+        reset_breakers()
+        self.now = 0.0
+        self.breaker = CircuitBreaker('test', failure_rate=0.5, window=10,
+                                      minimum_calls=4, reset_timeout=5,
+                                      clock=lambda: self.now)
+
+    def fail(self):
+        def boom():
+            raise ConnectionError("down")
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(boom)
+
+    def test_opens_on_failure_rate_and_fails_fast(self):
+        """Test the breaker opens once the window's failure rate is hit"""
+        self.breaker.call(lambda: "ok")
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.state, CLOSED)  # only 3 calls
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        called = mock.Mock()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(called)
+        called.assert_not_called()
+
+    def test_old_failures_leave_the_window(self):
+        """Test failures older than the window no longer count"""
+        for _ in range(3):
+            self.fail()
+        self.now = 11
+        self.breaker.call(lambda: "ok")
+        self.fail()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.snapshot()["calls"], 2)
+
+    def test_half_open_trial(self):
+        """Test a trial call after the reset timeout closes or re-opens"""
+        for _ in range(4):
+            self.fail()
+        self.now = 5
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now = 10
+        self.assertTrue(self.breaker.allow())
+        # Only one trial at a time while half-open
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_open_breaker_uses_existing_fallbacks(self):
+        """Test restapis fails fast to its neutral fallback"""
+        breaker = restapis.sentiment_client.breaker
+        with mock.patch.object(restapis.sentiment_client.session, 'get',
+                               side_effect=ConnectionError("down")):
+            for _ in range(breaker.minimum_calls):
+                restapis.analyze_review_sentiments(f"text {_}")
+        self.assertEqual(breaker.state, OPEN)
+        with mock.patch.object(restapis.sentiment_client.session,
+                               'get') as get:
+            self.assertEqual(restapis.analyze_review_sentiments("new"),
+                             {"sentiment": "neutral"})
+        get.assert_not_called()
+
+        data = json.loads(
+            Client().get('/djangoapp/health/backends').content)
+        self.assertEqual(data["backends"]["sentiment"]["state"], OPEN)
+        self.assertEqual(data["backends"]["dealer"]["state"], CLOSED)
+
+    def test_server_errors_count_as_failures(self):
+        """Test 5xx responses trip the breaker like exceptions do"""
+        response = mock.Mock(status_code=503)
+        for _ in range(4):
+            self.breaker.call(lambda: response,
+                              is_failure=lambda r: r.status_code >= 500)
+        self.assertEqual(self.breaker.state, OPEN)
+
+
+class SingleFlightTestCase(TestCase):
+    """Test coalescing of identical concurrent outbound calls"""
+
+    def setUp(self):
+        reset_breakers()
+        get_cache().clear()
+        self.release = threading.Event()
+
+    def wait_for_waiters(self, flights, key, count):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            calls = [flight._calls.get(key) for flight in flights]
+            if sum(call.duplicates + 1 for call in calls if call) >= count:
+                return
+            time.sleep(0.01)
+        self.fail("callers did not join the flight")
+
+    def run_threads(self, count, target):
+        results = [None] * count
+
+        def run(index):
+            results[index] = target(index)
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_concurrent_get_requests_make_one_backend_call(self):
+        """Test N threads fetching the same endpoint share one call"""
+        def slow_get(*args, **kwargs):
+            self.release.wait(5)
+            return mock.Mock(status_code=200, text=json.dumps(
+                [{"id": 1, "review": "great"}]))
+
+        endpoint = "/fetchReviews/dealer/15"
+        key = ('GET', endpoint, ())
+        with mock.patch.object(restapis.dealer_client.session, 'get',
+                               side_effect=slow_get) as get:
+            threads, results = self.run_threads(
+                12, lambda i: restapis.get_request(endpoint))
+            self.wait_for_waiters([restapis.outbound_flights], key, 12)
+            self.release.set()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(get.call_count, 1)
+
+            # Finished calls are not reused
+            restapis.get_request(endpoint)
+            self.assertEqual(get.call_count, 2)
+        self.assertTrue(all(result == results[0] for result in results))
+        # Each caller gets its own copy to annotate
+        self.assertEqual(len({id(result["message"][0])
+                              for result in results}), 12)
+
+    def test_errors_reach_every_waiter(self):
+        """Test an exception is raised in all coalesced callers"""
+        flight = SingleFlight()
+        calls = []
+
+        def fail():
+            calls.append(1)
+            self.release.wait(5)
+            raise ValueError("backend down")
+
+        def call(index):
+            try:
+                flight.do('key', fail)
+            except ValueError as err:
+                return str(err)
+
+        threads, results = self.run_threads(5, call)
+        self.wait_for_waiters([flight], 'key', 5)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["backend down"] * 5)
+
+    def test_shared_flights_coalesce_across_processes(self):
+        """Test flights sharing the cache make one call between them"""
+        # Two groups stand in for two worker processes
+        flights = [SingleFlight(shared=True, poll_interval=0.01)
+                   for _ in range(2)]
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            self.release.wait(5)
+            return {"dealers": [1, 2]}
+
+        # Set once the second group's leader polls for the first's result
+        polling = threading.Event()
+
+        def sleep(seconds):
+            polling.set()
+            time.sleep(seconds)
+
+        first = self.run_threads(3, lambda i: flights[0].do('k', fetch))
+        self.wait_for_waiters(flights[:1], 'k', 3)
+        with mock.patch('djangoapp.single_flight.time', wraps=time) as clock:
+            clock.sleep.side_effect = sleep
+            second = self.run_threads(
+                3, lambda i: flights[1].do('k', fetch))
+            self.wait_for_waiters(flights, 'k', 6)
+            self.assertTrue(polling.wait(5))
+            self.release.set()
+            for thread in first[0] + second[0]:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([value for value, _ in first[1] + second[1]],
+                         [{"dealers": [1, 2]}] * 6)
+        self.assertTrue(all(shared for _, shared in second[1]))
+
+
+class DealerStatsTestCase(TestCase):
+    """Test the incrementally maintained dealer review aggregates"""
+
+    def setUp(self):
+        self.dealer = Dealer.objects.create(
+            full_name="Stats Motors", city="Austin", state="Texas",
+            address="1 Main St", zip="73301")
+        self.other = Dealer.objects.create(
+            full_name="Other Motors", city="Dallas", state="Texas",
+            address="2 Main St", zip="75201")
+
+    def review(self, dealer=None, **fields):
+        fields.setdefault('sentiment', 'positive')
+        return Review.objects.create(dealer=dealer or self.dealer, name="A",
+                                     review="text", **fields)
+
+    def stored(self, dealer):
+        return dealer_stats.to_dict(
+            DealerStats.objects.filter(dealer=dealer).values().get())
+
+    def rebuilt(self, dealer):
+        dealer_stats.rebuild([dealer.id])
+        return self.stored(dealer)
+
+    def test_counters_follow_review_writes(self):
+        """Test creates, edits, moves and deletes adjust the counters"""
+        first = self.review(purchase=True)
+        second = self.review(sentiment='negative')
+        stats = self.stored(self.dealer)
+        self.assertEqual(stats["review_count"], 2)
+        self.assertEqual(stats["sentiments"], {"positive": 1, "neutral": 0,
+                                               "negative": 1, "pending": 0})
+        self.assertEqual(stats["purchase_ratio"], 0.5)
+        self.assertEqual(stats["latest_review_at"], second.created_at)
+
+        first.sentiment = 'neutral'
+        first.purchase = False
+        first.save()
+        second.dealer = self.other
+        second.save()
+        self.review(dealer=self.other, sentiment='pending')
+        expected = self.stored(self.dealer)
+        self.assertEqual(expected["sentiments"]["neutral"], 1)
+        self.assertEqual(expected["latest_review_at"], first.created_at)
+        self.assertEqual(expected, self.rebuilt(self.dealer))
+        self.assertEqual(self.stored(self.other), self.rebuilt(self.other))
+
+        first.delete()
+        stats = self.stored(self.dealer)
+        self.assertEqual(stats["review_count"], 0)
+        self.assertIsNone(stats["latest_review_at"])
+        self.assertIsNone(stats["purchase_ratio"])
+
+    def test_undated_reviews_are_counted(self):
+        """Test legacy reviews without created_at count but are not latest"""
+        dated = self.review()
+        self.review(created_at=None)
+        stats = self.stored(self.dealer)
+        self.assertEqual(stats["review_count"], 2)
+        self.assertEqual(stats["latest_review_at"], dated.created_at)
+        self.assertEqual(self.rebuilt(self.dealer), stats)
+
+    def test_async_sentiment_moves_pending_reviews(self):
+        """Test the sentiment workers' bulk updates keep counters right"""
+        for _ in range(2):
+            sentiment_jobs.enqueue(self.review(sentiment='pending'))
+        with mock.patch.object(
+                sentiment_jobs, 'analyze_review_sentiments_batch',
+                return_value=[{"sentiment": "positive"},
+                              {"sentiment": "negative"}]):
+            sentiment_jobs.drain()
+        stats = self.stored(self.dealer)
+        self.assertEqual(stats["sentiments"], {"positive": 1, "neutral": 0,
+                                               "negative": 1, "pending": 0})
+        self.assertEqual(stats, self.rebuilt(self.dealer))
+
+    def test_dealer_pages_read_stats_without_scanning_reviews(self):
+        """Test details and the stats endpoint serve the stored row"""
+        self.review()
+        with self.assertNumQueries(1):
+            details = json.loads(
+                self.client.get(f'/djangoapp/dealer/{self.dealer.id}')
+                .content)
+        self.assertEqual(details["stats"]["review_count"], 1)
+        response = self.client.get(f'/djangoapp/dealer/{self.dealer.id}/stats')
+        self.assertEqual(json.loads(response.content)["stats"],
+                         details["stats"])
+        response = self.client.get('/djangoapp/dealer/9999/stats')
+        self.assertEqual(response.status_code, 404)
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test the rebuild command recomputes counters from reviews"""
+        self.review(purchase=True)
+        self.review(sentiment='negative')
+        expected = self.stored(self.dealer)
+        DealerStats.objects.update(review_count=42, negative_count=0)
+        out = io.StringIO()
+        call_command('rebuild_dealer_stats', stdout=out)
+        self.assertIn("2 dealers", out.getvalue())
+        self.assertEqual(self.stored(self.dealer), expected)
+
+    def test_rebuild_creates_missing_rows(self):
+        """Test reviews written without signals are counted by rebuild"""
+        Review.objects.bulk_create([
+            Review(dealer=self.dealer, name="B", review="x",
+                   sentiment='neutral')])
+        dealer_stats.rebuild([self.dealer.id])
+        self.assertEqual(self.stored(self.dealer)["review_count"], 1)
+        # Deleting the dealer removes its stats with it
+        self.dealer.delete()
+        self.assertFalse(DealerStats.objects.filter(
+            dealer_id=self.dealer.id).exists())
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'),
+            "needs a full-text index")
+class ReviewSearchTestCase(TestCase):
+    """Test ranked full-text review search"""
+
+    def setUp(self):
+        self.dealer = Dealer.objects.create(
+            full_name="Search Motors", city="Austin", state="Texas",
+            address="1 Main St", zip="73301")
+        self.best = self.review("Brake Fan", "The brakes, the brakes! "
+                                "New brake pads and a brake flush")
+        self.other = self.review("Jo", "Friendly staff, checked my brakes")
+        self.sedan = self.review("Sam", "Great price on a used sedan")
+
+    def review(self, name, text):
+        return Review.objects.create(dealer=self.dealer, name=name,
+                                     review=text)
+
+    def search(self, query, **params):
+        response = self.client.get('/djangoapp/reviews/search',
+                                   {"q": query, **params})
+        return response, json.loads(response.content)
+
+    def ids(self, query, **params):
+        return [review["id"] for review in self.search(query, **params)[1]
+                .get("reviews", [])]
+
+    def test_results_are_ranked_and_stemmed(self):
+        """Test stemmed matches come back best first"""
+        response, data = self.search("brake")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["id"] for r in data["reviews"]],
+                         [self.best.id, self.other.id])
+        self.assertEqual(data["reviews"][0]["dealer_id"], self.dealer.id)
+        self.assertEqual(self.ids("brake", limit=1), [self.best.id])
+        # Every word must match; names are searched and the last word
+        # may be a prefix
+        self.assertEqual(self.ids("friendly brakes"), [self.other.id])
+        self.assertEqual(self.ids("sam sed"), [self.sedan.id])
+
+    def test_index_follows_every_kind_of_write(self):
+        """Test saves, bulk writes and deletes reach the index"""
+        self.other.review = "Friendly staff"
+        self.other.save()
+        Review.objects.bulk_create([
+            Review(dealer=self.dealer, name="Bulk", review="Squeaky brakes")])
+        Review.objects.filter(name="Sam").update(review="Brake recall")
+        self.best.delete()
+        found = {r["name"] for r in self.search("brake")[1]["reviews"]}
+        self.assertEqual(found, {"Bulk", "Sam"})
+
+    def test_bad_queries(self):
+        """Test empty, malformed and FTS-syntax queries are handled"""
+        self.assertEqual(self.search("")[0].status_code, 400)
+        self.assertEqual(self.search("  ?! ")[0].status_code, 400)
+        self.assertEqual(self.search("brake", limit="x")[0].status_code,
+                         400)
+        self.assertEqual(self.ids('brake" OR NEAR(sedan'), [])
+        self.assertEqual(self.ids("nothing-matches-this"), [])
+
+    def test_admin_search_uses_the_index(self):
+        """Test the admin's review search goes through the text index"""
+        from django.contrib import admin as django_admin
+        model_admin = django_admin.site._registry[Review]
+        queryset, duplicates = model_admin.get_search_results(
+            None, Review.objects.all(), "brakes")
+        self.assertFalse(duplicates)
+        self.assertEqual(set(queryset), {self.best, self.other})
+        self.assertNotIn("LIKE", str(
+            search.filter_reviews(Review.objects.all(), "brakes").query))
+        queryset, _ = model_admin.get_search_results(
+            None, Review.objects.all(), "Search Motors")
+        self.assertEqual(queryset.count(), 3)
+
+
+class NearestDealerTestCase(TestCase):
+    """Test dealer coordinates and the nearest-dealer index"""
+
+    def dealer(self, name, zip_code, **location):
+        return Dealer.objects.create(
+            full_name=name, city="City", state="Texas", address="1 Main St",
+            zip=zip_code, **location)
+
+    def near(self, **params):
+        response = self.client.get('/djangoapp/dealers/near', params)
+        return response, json.loads(response.content)
+
+    def test_zip_centroids(self):
+        """Test exact zips, 3-digit prefix fallback and bad input"""
+        self.assertEqual(geo.locate_zip("88563"), (31.7588, -106.4866))
+        self.assertIsNotNone(geo.locate_zip("88500"))
+        self.assertIsNone(geo.locate_zip("00000"))
+        self.assertIsNone(geo.locate_zip("abc"))
+        dealer = self.dealer("Placed", "88563")
+        self.assertEqual((dealer.lat, dealer.long), (31.7588, -106.4866))
+
+    def test_zip_edit_moves_dealer(self):
+        """Test editing the zip re-places the dealer unless coordinates
+        are given with it"""
+        dealer = self.dealer("Moving", "88563")
+        dealer.zip = "02101"
+        dealer.save()
+        dealer.refresh_from_db()
+        self.assertEqual((dealer.lat, dealer.long), geo.locate_zip("02101"))
+        dealer.zip, dealer.lat, dealer.long = "88563", 10.0, 20.0
+        dealer.save()
+        dealer.refresh_from_db()
+        self.assertEqual((dealer.lat, dealer.long), (10.0, 20.0))
+        # A zip that cannot be placed leaves no stale coordinates behind
+        dealer.zip = "00000"
+        dealer.save()
+        dealer.refresh_from_db()
+        self.assertIsNone(dealer.lat)
+
+    def test_kd_tree_matches_a_full_scan(self):
+        """Test k-nearest and radius answers equal brute force"""
+        import random
+        rng = random.Random(7)
+        points = [(geo._unit_vector(rng.uniform(25, 49),
+                                    rng.uniform(-124, -67)), i)
+                  for i in range(300)]
+        tree = geo.KDTree(points)
+        for _ in range(50):
+            query = geo._unit_vector(rng.uniform(25, 49),
+                                     rng.uniform(-124, -67))
+            expected = sorted((math.dist(point, query), item)
+                              for point, item in points)
+            found = tree.nearest(query, 7)
+            self.assertEqual([item for _, item in found],
+                             [item for _, item in expected[:7]])
+            limit = geo._chord(300)
+            self.assertEqual(
+                [item for _, item in tree.nearest(query, 300, limit)],
+                [item for distance, item in expected if distance <= limit])
+
+    def test_nearest_endpoint(self):
+        """Test results are ordered by distance and limited by k/radius"""
+        el_paso = self.dealer("El Paso", "88563")
+        austin = self.dealer("Austin", "73301", lat=30.27, long=-97.74)
+        self.dealer("Boston", "02101", lat=42.36, long=-71.06)
+        response, data = self.near(zip="88563", k=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([d["id"] for d in data["dealers"]],
+                         [el_paso.id, austin.id])
+        self.assertEqual(data["dealers"][0]["distance"], 0.0)
+        self.assertAlmostEqual(data["dealers"][1]["distance"], 527.9,
+                               delta=0.1)
+        _, data = self.near(zip="88563", radius=100)
+        self.assertEqual([d["id"] for d in data["dealers"]], [el_paso.id])
+        self.assertEqual(self.near(zip="1")[0].status_code, 400)
+        self.assertEqual(self.near(zip="88563", k=0)[0].status_code, 400)
+        self.assertEqual(self.near(zip="88563", radius="x")[0].status_code,
+                         400)
+
+    def test_index_follows_dealer_changes(self):
+        """Test dealer writes rebuild the in-memory index"""
+        far = self.dealer("Boston", "02101", lat=42.36, long=-71.06)
+        _, data = self.near(zip="88563", k=1)
+        self.assertEqual(data["dealers"][0]["id"], far.id)
+        close = self.dealer("El Paso", "88563")
+        _, data = self.near(zip="88563", k=1)
+        self.assertEqual(data["dealers"][0]["id"], close.id)
+        close.delete()
+        _, data = self.near(zip="88563", k=1)
+        self.assertEqual(data["dealers"][0]["id"], far.id)
+
+    def test_index_follows_other_workers(self):
+        """Test a dealer write in another process rebuilds the index"""
+        far = self.dealer("Boston", "02101", lat=42.36, long=-71.06)
+        _, data = self.near(zip="88563", k=1)
+        self.assertEqual(data["dealers"][0]["id"], far.id)
+        # Written and announced by another worker: no signal runs here
+        Dealer.objects.filter(pk=far.pk).update(lat=31.7588, long=-106.4866)
+        with as_other_worker():
+            bump_generation('dealers')
+        _, data = self.near(zip="88563", k=1)
+        self.assertEqual(data["dealers"][0]["distance"], 0.0)
+
+    def test_seed_loader_stores_coordinates(self):
+        """Test bulk-loaded dealers keep their coordinates"""
+        seed.load_dealers(
+            settings.BASE_DIR / 'database' / 'data' / 'dealerships.json', 20)
+        dealer = Dealer.objects.get(id=1)
+        self.assertEqual((dealer.lat, dealer.long), (31.6948, -106.3))
+        _, data = self.near(zip=dealer.zip, k=1)
+        self.assertEqual(data["dealers"][0]["id"], 1)
+
+
+class CarSearchTestCase(TestCase):
+    """Test faceted car catalog search"""
+
+    def setUp(self):
+        nissan = CarMake.objects.create(name="NISSAN", description="")
+        audi = CarMake.objects.create(name="Audi", description="")
+        self.cars = [
+            CarModel.objects.create(
+                car_make=make, name=name, type=car_type, year=year,
+                dealer_id=1, fuel_type=fuel, transmission="Automatic",
+                price=price)
+            for make, name, car_type, year, fuel, price in [
+                (nissan, "Pathfinder", "SUV", 2019, "Gasoline", 30000),
+                (nissan, "Leaf", "HATCHBACK", 2022, "Electric", 28000),
+                (nissan, "Titan", "TRUCK", 2021, "Diesel", None),
+                (audi, "A4", "SEDAN", 2020, "Gasoline", 41000),
+                (audi, "Q5", "SUV", 2023, "Gasoline", 47000),
+            ]
+        ]
+
+    def search(self, **params):
+        response = self.client.get('/djangoapp/cars/search', params)
+        return response, json.loads(response.content)
+
+    def test_filters_and_facet_counts(self):
+        """Test filters combine and facets ignore their own filter"""
+        response, data = self.search(car_make="nissan", fuel_type="Gasoline")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["cars"][0]["name"], "Pathfinder")
+        self.assertEqual(data["cars"][0]["price"], 30000.0)
+        # Makes are counted with the fuel filter only, fuels with the make
+        self.assertEqual(data["facets"]["car_make"], {"Audi": 2, "NISSAN": 1})
+        self.assertEqual(data["facets"]["fuel_type"],
+                         {"Diesel": 1, "Electric": 1, "Gasoline": 1})
+        self.assertEqual(data["facets"]["type"], {"SUV": 1})
+
+        _, data = self.search(type="SUV,sedan", year_min=2020)
+        self.assertEqual([car["name"] for car in data["cars"]], ["A4", "Q5"])
+        _, data = self.search(price_min=29000, price_max=45000)
+        self.assertEqual([car["name"] for car in data["cars"]],
+                         ["Pathfinder", "A4"])
+        self.assertEqual(data["price"], {"min": 30000.0, "max": 41000.0})
+        self.assertEqual(self.search(year_min="new")[0].status_code, 400)
+
+    def test_counts_match_the_database(self):
+        """Test every facet count equals the equivalent GROUP BY"""
+        from django.db.models import Count
+        _, data = self.search()
+        self.assertEqual(data["count"], CarModel.objects.count())
+        expected = dict(CarModel.objects.values_list('type').annotate(
+            n=Count('id')))
+        self.assertEqual(data["facets"]["type"], expected)
+
+    def test_pages_and_refresh(self):
+        """Test cursor pages and that catalog writes refresh the snapshot"""
+        _, first = self.search(limit=2)
+        _, second = self.search(limit=2, cursor=first["next"])
+        _, last = self.search(limit=2, cursor=second["next"])
+        names = [car["name"] for page in (first, second, last)
+                 for car in page["cars"]]
+        self.assertEqual(len(names), 5)
+        self.assertIsNone(last["next"])
+
+        # Served from memory once the snapshot is built
+        with self.assertNumQueries(0):
+            self.search(car_make="Audi")
+        self.cars[0].fuel_type = "Hybrid"
+        self.cars[0].save()
+        _, data = self.search(fuel_type="hybrid")
+        self.assertEqual([car["name"] for car in data["cars"]],
+                         ["Pathfinder"])
+        self.assertIs(catalog.get_snapshot(), catalog.get_snapshot())
+
+    def test_snapshot_follows_other_workers(self):
+        """Test a catalog write in another process refreshes the snapshot"""
+        self.search()
+        CarModel.objects.filter(pk=self.cars[0].pk).update(
+            fuel_type="Hybrid")
+        with as_other_worker():
+            bump_generation('cars')
+        _, data = self.search(fuel_type="hybrid")
+        self.assertEqual([car["name"] for car in data["cars"]],
+                         ["Pathfinder"])
+
+
+class ThrottledSessionTestCase(TestCase):
+    """Test that unmodified sessions are only re-saved near expiry"""
+
+    def setUp(self):
+        User.objects.create_user(username='driver', password='testpass123')
+
+    def login(self):
+        response = self.client.post(
+            '/djangoapp/login',
+            json.dumps({"userName": "driver", "password": "testpass123"}),
+            content_type='application/json')
+        self.assertEqual(json.loads(response.content)["status"],
+                         "Authenticated")
+
+    def session_queries(self, requests=20):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                response = self.client.get('/djangoapp/get_dealers/')
+                self.assertEqual(response.status_code, 200)
+        statements = [query['sql'].split()[0] for query in queries
+                      if 'django_session' in query['sql']]
+        return (sum(statement in ('INSERT', 'UPDATE')
+                    for statement in statements),
+                statements.count('SELECT'))
+
+    def test_reads_do_not_rewrite_the_session(self):
+        """Test logged-in GETs write nothing until the refresh window"""
+        self.login()
+        writes, reads = self.session_queries()
+        self.assertEqual(writes, 0)
+        self.assertEqual(reads, 20)
+
+        # Once less than the window is left, one request refreshes it
+        later = time.time() + (settings.SESSION_COOKIE_AGE
+                               - settings.SESSION_REFRESH_WINDOW + 60)
+        with mock.patch('djangoapp.sessions.time.time', return_value=later):
+            writes, _ = self.session_queries()
+        self.assertEqual(writes, 1)
+
+    def test_api_responses_do_not_vary_on_cookie(self):
+        """Test the refresh check leaves the Vary header alone"""
+        self.login()
+        response = self.client.get('/djangoapp/get_dealers/')
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_sessions_saved_before_throttling_are_stamped(self):
+        """Test a session without a save time is refreshed once"""
+        self.login()
+        session = self.client.session
+        from django.contrib.sessions.models import Session
+        data = session.load()
+        del data["_saved_at"]
+        Session.objects.filter(session_key=session.session_key).update(
+            session_data=session.encode(data))
+        self.assertEqual(self.session_queries(3)[0], 1)
+
+    @override_settings(SESSION_ENGINE='djangoapp.sessions.cached_db')
+    def test_cached_db_engine_skips_the_database(self):
+        """Test the cache-backed store reads from the cache only"""
+        self.login()
+        self.assertEqual(self.session_queries(), (0, 0))
+        # Written through: the row survives a cache flush
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        from django.contrib.sessions.models import Session
+        self.assertTrue(Session.objects.filter(
+            session_key=self.client.session.session_key).exists())
+
+    def test_cached_sessions_use_a_shared_cache(self):
+        """Test cached sessions are not kept in a per-process cache"""
+        self.assertNotIsInstance(caches[settings.SESSION_CACHE_ALIAS],
+                                 LocMemCache)
+
+
+@override_settings(API_TOKEN_AUTH=True)
+class TokenAuthTestCase(TestCase):
+    """Test stateless signed-token authentication"""
+
+    def setUp(self):
+        tokens.user_cache.clear()
+        self.user = User.objects.create_user(username='tokenuser',
+                                             password='testpass123')
+        self.dealer = Dealer.objects.create(
+            full_name="Token Motors", city="Austin", state="Texas",
+            address="1 Main St", zip="73301")
+
+    def login(self):
+        response = Client().post(
+            '/djangoapp/login',
+            json.dumps({"userName": "tokenuser", "password": "testpass123"}),
+            content_type='application/json')
+        return json.loads(response.content)
+
+    def add_review(self, token):
+        # A fresh client: no session cookie, only the bearer token
+        response = Client().post(
+            '/djangoapp/add_review',
+            json.dumps({"dealership": self.dealer.id, "review": "Nice"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f"Bearer {token}")
+        return json.loads(response.content)["status"]
+
+    def test_token_authorizes_without_sessions(self):
+        """Test add_review accepts a token without session or user reads"""
+        data = self.login()
+        self.assertEqual(data["expiresIn"], settings.API_TOKEN_MAX_AGE)
+        self.assertEqual(self.add_review(data["token"]), 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.add_review(data["token"]), 200)
+        tables = " ".join(query["sql"] for query in queries)
+        self.assertNotIn("django_session", tables)
+        # The user record comes from the in-process cache
+        self.assertNotIn('"auth_user"', tables)
+        self.assertEqual(Review.objects.filter(name="tokenuser").count(), 2)
+
+    def test_invalid_tokens_are_anonymous(self):
+        """Test tampered, expired and outdated tokens are refused"""
+        token = self.login()["token"]
+        self.assertEqual(self.add_review(token[:-2] + "xx"), 403)
+        with override_settings(API_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.add_review(token), 403)
+        self.user.set_password("changed-pass-456")
+        self.user.save()
+        self.assertEqual(self.add_review(token), 403)
+
+    def test_logout_revokes_tokens(self):
+        """Test tokens issued before a logout are refused after it"""
+        token = self.login()["token"]
+        self.assertEqual(self.add_review(token), 200)
+        Client().get('/djangoapp/logout',
+                     HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(self.add_review(token), 403)
+        self.assertEqual(self.add_review(self.login()["token"]), 200)
+
+    def test_registration_issues_a_token(self):
+        """Test sign-up returns a working token"""
+        response = Client().post(
+            '/djangoapp/register',
+            json.dumps({"userName": "newbie", "password": "pw-123456",
+                        "firstName": "N", "lastName": "B",
+                        "email": "n@example.com"}),
+            content_type='application/json')
+        token = json.loads(response.content)["token"]
+        self.assertEqual(tokens.authenticate(token).username, "newbie")
+
+    def test_tokens_are_off_by_default(self):
+        """Test the mode is opt-in"""
+        token = tokens.issue(self.user)
+        with override_settings(API_TOKEN_AUTH=False):
+            self.assertNotIn("token", self.login())
+            self.assertEqual(self.add_review(token), 403)
+
+    def test_user_writes_evict_only_that_user(self):
+        """Test other users' logins keep a user's cached token record"""
+        token = self.login()["token"]
+        self.assertEqual(tokens.authenticate(token), self.user)
+        User.objects.create_user(username='other', password='pw-123456')
+        # Updates the other user's last_login
+        self.assertTrue(Client().login(username='other',
+                                       password='pw-123456'))
+        with self.assertNumQueries(0):
+            self.assertEqual(tokens.authenticate(token), self.user)
+        self.user.save()
+        self.assertIsNone(tokens.user_cache.get(self.user.pk))
+
+    def test_production_settings_keep_app_middleware(self):
+        """Test production MIDDLEWARE includes the app's middleware"""
+        production = importlib.import_module('djangoproj.production_settings')
+        middleware = production.MIDDLEWARE
+        for name in ('djangoapp.sessions.ThrottledSessionMiddleware',
+                     'djangoapp.tokens.TokenAuthenticationMiddleware',
+                     'whitenoise.middleware.WhiteNoiseMiddleware'):
+            self.assertIn(name, middleware)
+        auth = 'django.contrib.auth.middleware.AuthenticationMiddleware'
+        self.assertLess(middleware.index(auth), middleware.index(
+            'djangoapp.tokens.TokenAuthenticationMiddleware'))
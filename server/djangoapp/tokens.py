@@ -0,0 +1,107 @@
+"""Stateless signed-token authentication for the JSON API.
+
+With ``API_TOKEN_AUTH`` on, ``login_user`` and ``registration`` also return
+a token: the user id and a fragment of the user's session auth hash, signed
+with ``SECRET_KEY`` and timestamped (``django.core.signing``). Clients send
+it as ``Authorization: Bearer <token>`` and ``TokenAuthenticationMiddleware``
+verifies the signature and age without touching the database or
+``django_session``.
+
+Users are then taken from a small in-process cache, so only the first
+request per user and process (or after ``API_TOKEN_USER_CACHE_TIMEOUT``)
+reads ``auth_user``. Changing a password invalidates the user's tokens;
+inactive users are refused. A user write evicts that user from this
+process's cache at once and from other processes' caches within the
+timeout.
+
+Logging out revokes all of the user's tokens issued until then: the time of
+the logout is kept for ``API_TOKEN_MAX_AGE`` in the cache shared by all
+workers (older tokens have expired by then anyway), and tokens issued
+before it are refused. Should that cache entry be lost early, say to a
+cache flush, the revoked tokens are accepted again until they expire.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+
+from .cache import get_generation_cache
+from .sentiment_cache import LRUCache
+
+SALT = 'djangoapp.api-token'
+# Characters of the session auth hash bound into a token
+HASH_PREFIX = 16
+
+user_cache = LRUCache(maxsize=1024)
+
+
+def issue(user):
+    """A new token for ``user``."""
+    return signing.dumps(
+        {"u": user.pk, "h": user.get_session_auth_hash()[:HASH_PREFIX],
+         "i": time.time()},
+        salt=SALT, compress=False)
+
+
+def _revoked_key(user_id):
+    return f"djangoapp:token-revoked:{user_id}"
+
+
+def revoke_tokens(user):
+    """Refuse every token issued to ``user`` so far."""
+    get_generation_cache().set(_revoked_key(user.pk), time.time(),
+                               settings.API_TOKEN_MAX_AGE)
+
+
+def _cached_user(user_id):
+    entry = user_cache.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    user = get_user_model().objects.filter(pk=user_id).first()
+    user_cache.set(user_id, (
+        time.monotonic() + settings.API_TOKEN_USER_CACHE_TIMEOUT, user))
+    return user
+
+
+def authenticate(token):
+    """The active user ``token`` was issued to, or None if it is invalid."""
+    try:
+        payload = signing.loads(token, salt=SALT,
+                                max_age=settings.API_TOKEN_MAX_AGE)
+    except signing.BadSignature:  # also covers expired tokens
+        return None
+    revoked = get_generation_cache().get(_revoked_key(payload.get("u")))
+    if revoked is not None and payload.get("i", 0) <= revoked:
+        return None
+    user = _cached_user(payload.get("u"))
+    if (user is None or not user.is_active
+            or user.get_session_auth_hash()[:HASH_PREFIX] != payload.get("h")):
+        return None
+    return user
+
+
+def token_response_fields(user):
+    """Fields to add to a login/registration response, if tokens are on."""
+    if not settings.API_TOKEN_AUTH:
+        return {}
+    return {"token": issue(user), "expiresIn": settings.API_TOKEN_MAX_AGE}
+
+
+class TokenAuthenticationMiddleware:
+    """Set ``request.user`` from an ``Authorization: Bearer`` token.
+
+    Goes after ``AuthenticationMiddleware``. Requests without a bearer
+    token keep the session user; a bad token makes the request anonymous.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if settings.API_TOKEN_AUTH and header.startswith('Bearer '):
+            request.user = (authenticate(header[len('Bearer '):].strip())
+                            or AnonymousUser())
+        return self.get_response(request)
@@ -18,21 +18,44 @@ urlpatterns = [
     # path for get_cars
     path(route='get_cars', view=views.get_cars, name='getcars'),
 
+    # path for faceted car catalog search
+    path(route='cars/search', view=views.search_cars, name='search_cars'),
+
     # path for get_dealers
     path(route='get_dealers/', view=views.get_dealerships,
          name='get_dealers'),
     path(route='get_dealers/<str:state>', view=views.get_dealerships,
          name='get_dealers_by_state'),
 
+    # path for the dealers nearest to a zip code
+    path(route='dealers/near', view=views.get_nearest_dealers,
+         name='nearest_dealers'),
+
     # path for dealer details
     path(route='dealer/<int:dealer_id>', view=views.get_dealer_details,
          name='dealer_details'),
 
+    # path for a dealer's review aggregates
+    path(route='dealer/<int:dealer_id>/stats', view=views.get_dealer_stats,
+         name='dealer_stats'),
+
     # path for dealer reviews view
     path(route='reviews/dealer/<int:dealer_id>',
          view=views.get_dealer_reviews, name='dealer_reviews'),
 
+    # path for full-text review search
+    path(route='reviews/search', view=views.search_reviews,
+         name='search_reviews'),
+
     # path for add a review view
     path(route='add_review', view=views.add_review, name='add_review'),
 
+    # path for the queue of reviews awaiting sentiment analysis
+    path(route='sentiment/backlog', view=views.get_sentiment_backlog,
+         name='sentiment_backlog'),
+
+    # path for the circuit breaker state of the backend services
+    path(route='health/backends', view=views.get_backend_health,
+         name='backend_health'),
+
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -2,14 +2,27 @@
 
 from django.contrib.auth.models import User
 from django.contrib.auth import logout
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
 from django.contrib.auth import login, authenticate
+import itertools
 import logging
 import json
 from django.views.decorators.csrf import csrf_exempt
-from .models import CarMake, CarModel, Dealer, Review
-from .populate import initiate
-from .restapis import get_request, analyze_review_sentiments, post_review
+from .cache import get_or_build, versioned_key
+from .circuit_breaker import all_breakers
+from .conditional import conditional_on, uncacheable
+from .models import CarModel, Dealer, Review
+from .pagination import (InvalidPageRequest, encode_cursor, get_page_request,
+                         paginate)
+from .restapis import (cached_get_request, analyze_review_sentiments_batch,
+                       post_review)
+from . import (catalog, dealer_stats, geo, search, sentiment_jobs,
+               serializers)
+from .streaming import iterate, streaming_json_response, wants_stream
+from .tokens import revoke_tokens, token_response_fields
 
 
 # Get an instance of a logger
@@ -31,7 +44,8 @@ def login_user(request):
     if user is not None:
         # If user is valid, call login method to login current user
         login(request, user)
-        data = {"userName": username, "status": "Authenticated"}
+        data = {"userName": username, "status": "Authenticated",
+                **token_response_fields(user)}
     return JsonResponse(data)
 
 
@@ -41,6 +55,9 @@ def logout_request(request):
     try:
         if request.user.is_authenticated:
             username = request.user.username
+            if settings.API_TOKEN_AUTH:
+                # Also revokes the API tokens issued to the user so far
+                revoke_tokens(request.user)
             logout(request)  # Terminate user session
             data = {"userName": "",
                     "message": f"User {username} logged out successfully"}
@@ -91,7 +108,8 @@ def registration(request):
             )
             # Login the user and redirect to list page
             login(request, user)
-            data = {"userName": username, "status": "Authenticated"}
+            data = {"userName": username, "status": "Authenticated",
+                    **token_response_fields(user)}
             return JsonResponse(data)
         else:
             data = {"userName": username, "error": "Already Registered"}
@@ -109,26 +127,27 @@ def registration(request):
 
 # Update the `get_dealerships` render list of dealerships all by default,
 # particular state if state is passed
+@conditional_on('dealers')
 def get_dealerships(request, state="All"):
     try:
-        if state == "All":
-            dealerships = Dealer.objects.all()
-        else:
-            dealerships = Dealer.objects.filter(state=state)
-        
-        dealers_list = []
-        for dealer in dealerships:
-            dealers_list.append({
-                "id": dealer.id,
-                "full_name": dealer.full_name,
-                "city": dealer.city,
-                "state": dealer.state,
-                "address": dealer.address,
-                "zip": dealer.zip,
-                "short_name": dealer.short_name or dealer.full_name
-            })
-        
-        return JsonResponse({"status": 200, "dealers": dealers_list})
+        page = get_page_request(request)
+    except InvalidPageRequest as e:
+        return JsonResponse({"status": 400, "message": str(e)}, status=400)
+    try:
+        if page is None and wants_stream(request):
+            # Large lists bypass the cache and are encoded incrementally
+            return streaming_json_response(
+                "dealers", iterate(_dealers_queryset(state)),
+                serializers.DEALER.to_dict)
+        # Serve the serialized JSON from cache; only one request per key
+        # rebuilds it after a miss or a Dealer change.
+        page_key = page if page is not None else ("all",)
+        body = get_or_build(
+            versioned_key('dealers', state, *page_key),
+            lambda: _build_dealers_body(state, page),
+            settings.DEALERS_CACHE_TIMEOUT
+        )
+        return HttpResponse(body, content_type='application/json')
     except Exception as e:
         logger.error(f"Error getting dealerships: {str(e)}")
         # Fallback to external service if local data fails
@@ -136,73 +155,121 @@ def get_dealerships(request, state="All"):
             endpoint = "/fetchDealers"
         else:
             endpoint = "/fetchDealers/"+state
-        dealerships = get_request(endpoint)
-        return JsonResponse({"status": 200, "dealers": dealerships})
+        dealerships = cached_get_request(endpoint)
+        return uncacheable(
+            JsonResponse({"status": 200, "dealers": dealerships}))
+
+
+def _dealers_queryset(state):
+    dealerships = Dealer.objects.all()
+    if state != "All":
+        dealerships = dealerships.filter(state=state)
+    return serializers.DEALER.apply(dealerships).order_by('id')
+
+
+def _build_dealers_body(state, page=None):
+    dealerships = _dealers_queryset(state)
+    envelope = {"status": 200}
+    if page is not None:
+        dealerships, envelope["next"] = paginate(dealerships, page)
+
+    envelope["dealers"] = serializers.DEALER.to_dicts(dealerships)
+    return json.dumps(envelope, cls=DjangoJSONEncoder).encode()
 
 
 # Create a `get_dealer_details` view to render the dealer details
+@conditional_on('dealers', 'reviews')
 def get_dealer_details(request, dealer_id):
     try:
-        dealer = Dealer.objects.get(id=dealer_id)
-        dealer_data = {
-            "id": dealer.id,
-            "full_name": dealer.full_name,
-            "city": dealer.city,
-            "state": dealer.state,
-            "address": dealer.address,
-            "zip": dealer.zip,
-            "short_name": dealer.short_name or dealer.full_name
-        }
-        return JsonResponse({"status": 200, "dealer": dealer_data})
+        row = serializers.DEALER_DETAILS.apply(
+            Dealer.objects.filter(id=dealer_id)).first()
+        if row is None:
+            raise Dealer.DoesNotExist
+        dealer = serializers.DEALER_DETAILS.to_dict(row)
+        stats = {field: dealer.pop(field)
+                 for field in serializers.DEALER_STATS_FIELDS}
+        if stats["review_count"] is None:
+            # No DealerStats row yet (LEFT JOIN miss): build it now
+            stats = dealer_stats.get_stats(dealer_id)
+        else:
+            stats = dealer_stats.to_dict(stats)
+        return JsonResponse({"status": 200, "dealer": dealer,
+                             "stats": stats})
     except Dealer.DoesNotExist:
         # Fallback to external service
         if (dealer_id):
             endpoint = "/fetchDealer/"+str(dealer_id)
-            dealership = get_request(endpoint)
-            return JsonResponse({"status": 200, "dealer": dealership})
+            dealership = cached_get_request(endpoint)
+            return uncacheable(
+                JsonResponse({"status": 200, "dealer": dealership}))
         else:
             return JsonResponse({"status": 400, "message": "Bad Request"})
     except Exception as e:
         logger.error(f"Error getting dealer details: {str(e)}")
-        return JsonResponse({"status": 500, "message": "Internal Server Error"})
+        return uncacheable(JsonResponse({"status": 500,
+                                         "message": "Internal Server Error"}))
 
 
 # Create a `get_dealer_reviews` view to render the reviews of a dealer
+@conditional_on('dealers', 'reviews')
 def get_dealer_reviews(request, dealer_id):
     try:
-        dealer = Dealer.objects.get(id=dealer_id)
-        reviews = Review.objects.filter(dealer=dealer)
-        
-        reviews_list = []
-        for review in reviews:
-            reviews_list.append({
-                "id": review.id,
-                "name": review.name,
-                "review": review.review,
-                "purchase": review.purchase,
-                "purchase_date": review.purchase_date.isoformat() if review.purchase_date else None,
-                "car_make": review.car_make,
-                "car_model": review.car_model,
-                "car_year": review.car_year,
-                "sentiment": review.sentiment
-            })
-        
-        return JsonResponse({"status": 200, "reviews": reviews_list})
+        page = get_page_request(request)
+    except InvalidPageRequest as e:
+        return JsonResponse({"status": 400, "message": str(e)}, status=400)
+    try:
+        # Reviews are read in a single query; the dealer itself is only
+        # looked up when there are no rows, to tell "no reviews" apart from
+        # "unknown dealer" (which falls back to the remote service).
+        reviews = serializers.REVIEW.apply(
+            Review.objects.filter(dealer_id=dealer_id)).order_by('id')
+        if page is None and wants_stream(request):
+            rows = iterate(reviews)
+            first = next(rows, None)
+            if first is None:
+                _ensure_dealer_exists(dealer_id)
+                rows = iter(())
+            else:
+                rows = itertools.chain([first], rows)
+            return streaming_json_response(
+                "reviews", rows, serializers.REVIEW.to_dict)
+
+        envelope = {"status": 200}
+        if page is not None:
+            rows, envelope["next"] = paginate(reviews, page)
+        else:
+            rows = list(reviews)
+        if not rows:
+            _ensure_dealer_exists(dealer_id)
+
+        envelope["reviews"] = serializers.REVIEW.to_dicts(rows)
+        return JsonResponse(envelope)
     except Dealer.DoesNotExist:
         # Fallback to external service
         if (dealer_id):
             endpoint = "/fetchReviews/dealer/"+str(dealer_id)
-            reviews = get_request(endpoint)
-            for review_detail in reviews:
-                response = analyze_review_sentiments(review_detail['review'])
-                print(response)
-                review_detail['sentiment'] = response['sentiment']
-            return JsonResponse({"status": 200, "reviews": reviews})
+            response = cached_get_request(endpoint)
+            reviews = []
+            if response["status_code"] == 200:
+                reviews = response["message"]
+            # Classify all remote reviews in batched round trips
+            sentiments = analyze_review_sentiments_batch(
+                [review_detail.get('review', '') for review_detail in reviews])
+            for review_detail, sentiment in zip(reviews, sentiments):
+                review_detail['sentiment'] = sentiment['sentiment']
+            return uncacheable(
+                JsonResponse({"status": 200, "reviews": reviews}))
         else:
             return JsonResponse({"status": 400, "message": "Bad Request"})
     except Exception as e:
         logger.error(f"Error getting dealer reviews: {str(e)}")
-        return JsonResponse({"status": 500, "message": "Internal Server Error"})
+        return uncacheable(JsonResponse({"status": 500,
+                                         "message": "Internal Server Error"}))
+
+
+def _ensure_dealer_exists(dealer_id):
+    if not Dealer.objects.filter(id=dealer_id).exists():
+        raise Dealer.DoesNotExist
 
 
 # Create a `add_review` view to submit a review
@@ -216,26 +283,20 @@ def add_review(request):
             dealer_id = data.get('dealership')
             dealer = Dealer.objects.get(id=dealer_id)
             
-            # Analyze sentiment (fallback to neutral if service unavailable)
-            sentiment = "neutral"
-            try:
-                sentiment_response = analyze_review_sentiments(data.get('review', ''))
-                sentiment = sentiment_response.get('sentiment', 'neutral')
-            except Exception as e:
-                logger.warning(f"Sentiment analysis failed: {e}")
-            
-            # Create review
-            review = Review.objects.create(
-                dealer=dealer,
-                name=data.get('name', request.user.username),
-                review=data.get('review', ''),
-                purchase=data.get('purchase', False),
-                purchase_date=data.get('purchase_date'),
-                car_make=data.get('car_make'),
-                car_model=data.get('car_model'),
-                car_year=data.get('car_year'),
-                sentiment=sentiment
-            )
+            # Save right away; a background worker fills in the sentiment
+            with transaction.atomic():
+                review = Review.objects.create(
+                    dealer=dealer,
+                    name=data.get('name', request.user.username),
+                    review=data.get('review', ''),
+                    purchase=data.get('purchase', False),
+                    purchase_date=data.get('purchase_date'),
+                    car_make=data.get('car_make'),
+                    car_model=data.get('car_model'),
+                    car_year=data.get('car_year'),
+                    sentiment=sentiment_jobs.PENDING_SENTIMENT
+                )
+                sentiment_jobs.enqueue(review)
             
             return JsonResponse({"status": 200, "message": "Review added successfully"})
             
@@ -258,16 +319,145 @@ def add_review(request):
         return JsonResponse({"status": 403, "message": "Unauthorized"})
 
 
+# The catalog is seeded at deploy time ("manage.py populate_db"), so
+# this is a single query
+@conditional_on('cars')
 def get_cars(request):
-    count = CarMake.objects.filter().count()
-    print(count)
-    if (count == 0):
-        initiate()
-    car_models = CarModel.objects.select_related('car_make')
-    cars = []
-    for car_model in car_models:
-        cars.append({
-            "CarModel": car_model.name,
-            "CarMake": car_model.car_make.name
-        })
-    return JsonResponse({"CarModels": cars})
+    cars = serializers.CAR.apply(CarModel.objects.all())
+    return JsonResponse({"CarModels": serializers.CAR.to_dicts(cars)})
+
+
+def _car_filters(request):
+    filters = {}
+    for facet in catalog.FACETS:
+        values = [value.strip() for param in request.GET.getlist(facet)
+                  for value in param.split(',') if value.strip()]
+        if facet == 'year':
+            values = [int(value) for value in values]
+        filters[facet] = values
+    for bound, convert in (('year_min', int), ('year_max', int),
+                           ('price_min', float), ('price_max', float)):
+        value = request.GET.get(bound)
+        filters[bound] = convert(value) if value else None
+    return filters
+
+
+# Cars matching the ?car_make=, type=, year=, fuel_type=, transmission=
+# (comma-separated or repeated), year_min/max= and price_min/max= filters,
+# with the number of cars each facet value would give. Served from the
+# in-memory catalog snapshot, not the database.
+@conditional_on('cars')
+def search_cars(request):
+    try:
+        filters = _car_filters(request)
+        page = get_page_request(request)
+    except InvalidPageRequest as e:
+        return JsonResponse({"status": 400, "message": str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({"status": 400, "message": "Invalid filter"},
+                            status=400)
+    snapshot = catalog.get_snapshot()
+    matches, facets = snapshot.search(filters)
+    envelope = {"status": 200, "count": matches.bit_count()}
+    if page is None:
+        cars = snapshot.cars(matches)
+    else:
+        limit, after_id = page
+        cars = snapshot.cars(matches, after_id, limit + 1)
+        envelope["next"] = None
+        if len(cars) > limit:
+            cars = cars[:limit]
+            envelope["next"] = encode_cursor(cars[-1]["id"])
+    envelope["cars"] = cars
+    envelope["facets"] = facets
+    envelope["price"] = snapshot.price_bounds(matches)
+    return JsonResponse(envelope)
+
+
+# The ?k= dealers nearest to ?zip=, optionally within ?radius= miles
+@conditional_on('dealers')
+def get_nearest_dealers(request):
+    zip_code = request.GET.get('zip', '')
+    location = geo.locate_zip(zip_code)
+    if location is None:
+        # The centroid table is offline; zips newer than it (or not in it
+        # and with no known neighbour) cannot be placed
+        return JsonResponse({
+            "status": 400,
+            "message": "Unknown zip: not a 5-digit US zip code in the "
+                       "offline zip centroid table"}, status=400)
+    try:
+        k = int(request.GET.get('k', 5))
+        radius = request.GET.get('radius')
+        radius = float(radius) if radius else None
+    except ValueError:
+        k = 0
+    if k < 1 or (radius is not None and not radius > 0):
+        return JsonResponse({"status": 400,
+                             "message": "Invalid k or radius"}, status=400)
+    matches = geo.nearest(*location, min(k, settings.API_PAGE_SIZE_MAX),
+                          radius)
+    order = {dealer_id: position
+             for position, (dealer_id, _) in enumerate(matches)}
+    rows = serializers.DEALER.apply(Dealer.objects.filter(id__in=order))
+    dealers = sorted(serializers.DEALER.to_dicts(rows),
+                     key=lambda dealer: order[dealer["id"]])
+    for dealer in dealers:
+        dealer["distance"] = round(matches[order[dealer["id"]]][1], 1)
+    return JsonResponse({
+        "status": 200,
+        "origin": {"zip": zip_code, "lat": location[0],
+                   "long": location[1]},
+        "dealers": dealers,
+    })
+
+
+# Review count, sentiment distribution, purchase ratio and latest review
+# of a dealer, read from its DealerStats row
+@conditional_on('dealers', 'reviews')
+def get_dealer_stats(request, dealer_id):
+    stats = dealer_stats.get_stats(dealer_id)
+    if stats is None:
+        return JsonResponse({"status": 404, "message": "Dealer not found"},
+                            status=404)
+    return JsonResponse({"status": 200, "stats": stats})
+
+
+# Reviews matching ?q= (text or reviewer name), best match first
+@conditional_on('reviews')
+def search_reviews(request):
+    query = request.GET.get('q', '')
+    if not search.terms(query):
+        return JsonResponse({"status": 400, "message": "Missing query"},
+                            status=400)
+    try:
+        limit = int(request.GET.get('limit',
+                                    settings.API_PAGE_SIZE_DEFAULT))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return JsonResponse({"status": 400, "message": "Invalid limit"},
+                            status=400)
+    ids = search.ranked_ids(query, min(limit, settings.API_PAGE_SIZE_MAX))
+    rows = serializers.REVIEW_SEARCH.apply(Review.objects.filter(id__in=ids))
+    rank = {review_id: position for position, review_id in enumerate(ids)}
+    rows = sorted(rows, key=lambda row: rank[row[0]])
+    return JsonResponse({"status": 200,
+                         "reviews": serializers.REVIEW_SEARCH.to_dicts(rows)})
+
+
+# Queue depth of the sentiment jobs, for staff monitoring
+def get_sentiment_backlog(request):
+    if not request.user.is_staff:
+        return JsonResponse({"status": 403, "message": "Unauthorized"},
+                            status=403)
+    return JsonResponse({"status": 200,
+                         "backlog": sentiment_jobs.backlog()})
+
+
+# Circuit breaker state of each backend service, for monitoring
+def get_backend_health(request):
+    return JsonResponse({"status": 200, "backends": {
+        name: breaker.snapshot()
+        for name, breaker in sorted(all_breakers().items())
+    }})
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -75,9 +76,10 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'djangoapp.sessions.ThrottledSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'djangoapp.tokens.TokenAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -117,6 +119,76 @@ DATABASES = {
     }
 }
 
+# Cache configuration
+# Any Django cache backend can be plugged in through the environment, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://... so all gunicorn workers share one cache.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'djangoapp'),
+    },
+    # Per-table generation counters (djangoapp/cache.py) and API token
+    # revocations (djangoapp/tokens.py). Every worker process must see
+    # them, so without a configured shared CACHE_BACKEND they are kept in
+    # files on local disk; that covers the workers of one host, several
+    # hosts need Redis (or the database cache).
+    'generations': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'djangoapp-generations')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Cache aliases and TTL (seconds) used for djangoapp API responses
+DJANGOAPP_CACHE_ALIAS = 'default'
+DJANGOAPP_GENERATION_CACHE_ALIAS = 'generations'
+DEALERS_CACHE_TIMEOUT = 300
+
+# Page sizes for cursor-paginated list endpoints (?limit=&cursor=)
+API_PAGE_SIZE_DEFAULT = 50
+API_PAGE_SIZE_MAX = 500
+
+# Rows fetched per database round trip when streaming lists (?stream=1)
+API_STREAM_CHUNK_SIZE = 2000
+
+# Read-through cache for the remote dealer-service fallbacks (seconds).
+# Responses are fresh for their endpoint's TTL (longest matching prefix).
+# For REMOTE_CACHE_STALE_WHILE_REVALIDATE after that they are still served
+# while one background refresh runs; until REMOTE_CACHE_STALE_IF_ERROR they
+# are served only when the dealer service cannot be reached.
+REMOTE_CACHE_TTLS = {
+    '/fetchDealers': 300,
+    '/fetchDealer/': 300,
+    '/fetchReviews/dealer/': 60,
+}
+REMOTE_CACHE_STALE_WHILE_REVALIDATE = 600
+REMOTE_CACHE_STALE_IF_ERROR = 24 * 3600
+
+# Offline zip-code centroids (zip,lat,long CSV) used to place dealers.
+# The shipped table holds about 42,700 US zips (from the MIT-licensed
+# zipcodes package data); a newer gazetteer in the same format can be
+# dropped in.
+ZIP_CENTROIDS_FILE = BASE_DIR / 'database' / 'data' / 'zip_centroids.csv'
+
+# Background sentiment analysis of new reviews (djangoapp/sentiment_jobs.py).
+# Each web process runs SENTIMENT_WORKERS threads; 0 disables them (run
+# "manage.py sentiment_jobs --drain" instead). Delays are in seconds.
+SENTIMENT_WORKERS = int(os.environ.get('SENTIMENT_WORKERS', 1))
+SENTIMENT_JOB_BATCH_SIZE = 50
+SENTIMENT_JOB_MAX_ATTEMPTS = 5
+SENTIMENT_JOB_RETRY_DELAY = 5
+SENTIMENT_JOB_MAX_RETRY_DELAY = 600
+SENTIMENT_JOB_LEASE = 120
+SENTIMENT_JOB_POLL_INTERVAL = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.'
@@ -182,6 +254,25 @@ if os.path.exists(frontend_build_static):
     STATICFILES_DIRS.append(frontend_build_static)
 
 # Session configuration
+# Sessions are only re-saved when modified or when less than
+# SESSION_REFRESH_WINDOW seconds of their lifetime remain (see
+# djangoapp/sessions), i.e. at most one refresh write per 4 hours here.
+# SESSION_ENGINE=djangoapp.sessions.cached_db serves reads from the cache
+# and writes through to the database. That mode needs a cache every worker
+# shares, or a logout in one process leaves the session alive in the
+# others, so it uses the shared 'generations' cache, not per-process LocMem.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'djangoapp.sessions.db')
+SESSION_CACHE_ALIAS = 'generations'
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_REFRESH_WINDOW = 20 * 3600
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+
+# Stateless API tokens (djangoapp/tokens.py). When on, login and
+# registration responses include a signed token that is accepted as
+# "Authorization: Bearer <token>" for API_TOKEN_MAX_AGE seconds,
+# or until the user logs out.
+API_TOKEN_AUTH = os.environ.get('API_TOKEN_AUTH', '').lower() in (
+    '1', 'true', 'yes')
+API_TOKEN_MAX_AGE = 86400
+API_TOKEN_USER_CACHE_TIMEOUT = 300
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoproj.settings')
 
 application = get_wsgi_application()
+
+# Background workers that fill in the sentiment of newly added reviews
+from djangoapp.sentiment_jobs import start_workers  # noqa: E402
+
+start_workers()
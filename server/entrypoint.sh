@@ -3,5 +3,9 @@
 echo "Making migrations and migrating the database. "
 python manage.py makemigrations --noinput
 python manage.py migrate --noinput
+# Tables for any database-backed caches (CACHE_BACKEND); a no-op otherwise
+python manage.py createcachetable
+# Seed the car catalog once per deploy (a no-op when already seeded)
+python manage.py populate_db
 python manage.py collectstatic --noinput
 exec "$@" 
\ No newline at end of file
@@ -52,22 +52,27 @@ class ServiceManager:
                 sys.executable, "-m", "pip", "install", "-r", "requirements.txt"
             ], cwd=MICROSERVICES_DIR, check=True)
             
-            # Download NLTK data
-            import nltk
-            try:
-                nltk.data.find('vader_lexicon')
-            except LookupError:
-                print("📥 Downloading NLTK VADER lexicon...")
-                nltk.download('vader_lexicon')
+            # Compile the shipped VADER lexicon for a fast cold start
+            subprocess.run([
+                sys.executable, "build_lexicon.py"
+            ], cwd=MICROSERVICES_DIR, check=True)
             
-            # Start the Flask service
+            # Start the service under gunicorn (pre-forking workers that
+            # share the preloaded lexicon); gunicorn does not run on
+            # Windows, so fall back to the Flask development server there
             env = os.environ.copy()
-            env["FLASK_APP"] = "app.py"
-            env["FLASK_RUN_PORT"] = "5050"
-            env["FLASK_RUN_HOST"] = "0.0.0.0"
+            if os.name == "posix":
+                env["PORT"] = "5050"
+                command = [sys.executable, "-m", "gunicorn",
+                           "-c", "gunicorn.conf.py", "app:app"]
+            else:
+                env["FLASK_APP"] = "app.py"
+                env["FLASK_RUN_PORT"] = "5050"
+                env["FLASK_RUN_HOST"] = "0.0.0.0"
+                command = [sys.executable, "-m", "flask", "run"]
             
             process = subprocess.Popen(
-                [sys.executable, "-m", "flask", "run"],
+                command,
                 cwd=MICROSERVICES_DIR,
                 env=env,
                 stdout=subprocess.PIPE,